@@ -0,0 +1,245 @@
+from functools import reduce
+from math import gcd
+
+from .game_map import GameMap, get_tile_index
+from .game_state import UPGRADE_INDEX
+from .util import debug_write
+
+
+class BuildPlanner:
+    """Chooses which of a list of wanted structures and upgrades to build with the SP available
+
+    The wanted builds are added once, usually in on_game_start, each with a utility. Every turn plan() drops the
+    builds that are already on the board or cannot be made, then picks the builds with the highest total utility
+    that fit in the SP budget, and build() adds them to the turn in one batch through GameState.add_builds.
+
+    With the "knapsack" method the choice is an exact multiple choice knapsack over the locations: each location
+    either gets nothing, one of the structures wanted there, that structure and its upgrade, or the upgrade of the
+    structure already there. Ties are broken in favour of builds added earlier. With the "priority" method the builds
+    are taken in the order they were added, skipping any that no longer fit, which gives the same builds as calling
+    attempt_spawn and attempt_upgrade for each of them in turn.
+
+    Example:
+        def on_game_start(self, config):
+            self.planner = gamelib.BuildPlanner(config)
+            self.planner.add(TURRET, [[3, 12], [24, 12]], utility=4)
+            self.planner.add(WALL, [[3, 13], [24, 13]])
+            self.planner.add_upgrade([[3, 12], [24, 12]], utility=3)
+
+        def on_turn(self, turn_state):
+            game_state = gamelib.GameState(self.config, turn_state)
+            self.planner.build(game_state)
+
+    Attributes :
+        * config (JSON): The game config
+        * method (str): "knapsack" or "priority", how plan() chooses builds
+        * upgrade_type (str): The shorthand of upgrades in the config, as used in the build stack of GameState
+        * builds (list): A (unit_type, (x, y), utility) tuple for each build added, in order, where unit_type is
+          upgrade_type for upgrades
+
+    """
+    def __init__(self, config, method="knapsack"):
+        """Starts an empty planner
+
+        Args:
+            * config: The game config
+            * method: "knapsack" to maximise the total utility, or "priority" to build in the order builds were added
+
+        """
+        if method not in ("knapsack", "priority"):
+            raise ValueError("Unknown BuildPlanner method {}, expected 'knapsack' or 'priority'".format(method))
+        self.config = config
+        self.method = method
+        self.upgrade_type = config["unitInformation"][UPGRADE_INDEX]["shorthand"]
+        self.builds = []
+        self.__tiles = get_tile_index(GameMap.ARENA_SIZE)
+        self.__costs = {}
+        self.__upgrade_costs = {}
+        for unit_information in config["unitInformation"]:
+            if unit_information.get("unitCategory") == 0:
+                unit_type = unit_information["shorthand"]
+                self.__costs[unit_type] = unit_information.get("cost1", 0)
+                # Like GameState.type_cost, an upgrade without a cost of its own costs as much as the structure
+                if unit_information.get("upgrade") is not None:
+                    self.__upgrade_costs[unit_type] = unit_information["upgrade"].get("cost1", self.__costs[unit_type])
+        # Costs are counted in whole units of the largest step all of them are multiples of, 1 SP in the default config
+        self.__cost_unit = reduce(gcd, [round(cost * 100) for cost in list(self.__costs.values()) + list(self.__upgrade_costs.values())]) / 100.0 or 1.0
+        # For each location: [(x, y), spawns, upgrade], where spawns is a list of (unit_type, utility, order)
+        # with one entry per structure type and upgrade is (utility, order) or None
+        self.__locations = {}
+
+    def __check_locations(self, locations):
+        if type(locations[0]) == int:
+            locations = [locations]
+        checked = []
+        size = self.__tiles.arena_size
+        for location in locations:
+            x, y = map(int, location)
+            if 0 <= x < size and 0 <= y < size // 2 and self.__tiles.in_bounds[x * size + y]:
+                checked.append((x, y))
+            else:
+                debug_write("Warning: BuildPlanner ignored {}, which is not on your half of the board".format(location))
+        return checked
+
+    def __location(self, x, y):
+        entry = self.__locations.get((x, y))
+        if entry is None:
+            entry = [(x, y), [], None]
+            self.__locations[(x, y)] = entry
+        return entry
+
+    def add(self, unit_type, locations, utility=1.0):
+        """Adds structures to build
+
+        Args:
+            * unit_type: The structure type
+            * locations: A single location or list of locations
+            * utility: How much building each one is worth
+
+        """
+        if unit_type not in self.__costs:
+            raise ValueError("BuildPlanner can only build structures, not {}".format(unit_type))
+        for x, y in self.__check_locations(locations):
+            entry = self.__location(x, y)
+            if all(spawn[0] != unit_type for spawn in entry[1]):
+                entry[1].append((unit_type, utility, len(self.builds)))
+            self.builds.append((unit_type, (x, y), utility))
+
+    def add_upgrade(self, locations, utility=1.0):
+        """Adds upgrades to make, of the structure already at each location or of one built there by the plan
+
+        Args:
+            * locations: A single location or list of locations
+            * utility: How much each upgrade is worth
+
+        """
+        for x, y in self.__check_locations(locations):
+            entry = self.__location(x, y)
+            if entry[2] is None:
+                entry[2] = (utility, len(self.builds))
+            self.builds.append((self.upgrade_type, (x, y), utility))
+
+    def __structure_at(self, game_map, x, y):
+        """The structure at a location, False if the tile is taken by mobile units only, None if it is empty"""
+        units = game_map[x, y]
+        for unit in units:
+            if unit.stationary:
+                return unit
+        return False if units else None
+
+    def plan(self, game_state, budget=None):
+        """Chooses the builds to make this turn. Nothing is changed on the board.
+
+        Args:
+            * game_state: The GameState of the turn
+            * budget: The SP to spend, all of the SP you have if None
+
+        Returns:
+            A list of (unit_type, x, y) tuples in the order the builds were added, with each structure before its
+            upgrade and unit_type upgrade_type for upgrades, ready for GameState.add_builds
+
+        """
+        if budget is None:
+            budget = game_state.get_resource(0)
+        if self.method == "priority":
+            return self.__plan_in_order(game_state.game_map, budget)
+        return self.__plan_knapsack(game_state.game_map, budget)
+
+    def __plan_in_order(self, game_map, budget):
+        planned = {}
+        plan = []
+        for unit_type, (x, y), _ in self.builds:
+            if (x, y) in planned:
+                structure_type, upgraded = planned[(x, y)]
+            else:
+                structure = self.__structure_at(game_map, x, y)
+                structure_type, upgraded = (structure.unit_type, structure.upgraded) if structure else (structure, False)
+            if unit_type == self.upgrade_type:
+                if not structure_type or upgraded or structure_type not in self.__upgrade_costs:
+                    continue
+                cost = self.__upgrade_costs[structure_type]
+                upgraded = True
+            else:
+                if structure_type is not None:
+                    continue
+                cost = self.__costs[unit_type]
+                structure_type = unit_type
+            if cost <= budget:
+                budget -= cost
+                planned[(x, y)] = (structure_type, upgraded)
+                plan.append((unit_type, x, y))
+        return plan
+
+    def __plan_knapsack(self, game_map, budget):
+        cost_unit = self.__cost_unit
+        capacity = int(budget / cost_unit + 1e-9)
+        # Each group is the list of (weight, utility, builds) options of one location, besides building nothing
+        groups = []
+        total_weight = 0
+        tie_break = 1e-9 / (len(self.builds) + 1)
+        for (x, y), spawns, upgrade in self.__locations.values():
+            structure = self.__structure_at(game_map, x, y)
+            options = []
+            if structure is None:
+                for unit_type, utility, order in spawns:
+                    weight = round(self.__costs[unit_type] / cost_unit)
+                    utility += tie_break * (len(self.builds) - order)
+                    options.append((weight, utility, [((order, 0), (unit_type, x, y))]))
+                    if upgrade is not None and unit_type in self.__upgrade_costs:
+                        upgrade_utility, upgrade_order = upgrade
+                        options.append((weight + round(self.__upgrade_costs[unit_type] / cost_unit),
+                                        utility + upgrade_utility + tie_break * (len(self.builds) - upgrade_order),
+                                        [((order, 0), (unit_type, x, y)), ((max(order, upgrade_order), 1), (self.upgrade_type, x, y))]))
+            elif structure and upgrade is not None and not structure.upgraded and structure.unit_type in self.__upgrade_costs:
+                upgrade_utility, upgrade_order = upgrade
+                options.append((round(self.__upgrade_costs[structure.unit_type] / cost_unit),
+                                upgrade_utility + tie_break * (len(self.builds) - upgrade_order), [((upgrade_order, 1), (self.upgrade_type, x, y))]))
+            options = [option for option in options if option[0] <= capacity and option[1] > 0]
+            if options:
+                groups.append(options)
+                total_weight += max(option[0] for option in options)
+        if total_weight <= capacity:
+            # Everything fits, so each location takes its most useful option
+            chosen = [build for options in groups for build in max(options, key=lambda option: option[1])[2]]
+            chosen.sort()
+            return [build for _, build in chosen]
+
+        # best[w] is the highest utility of the groups so far using at most w, choices[g][w] the option group g took for it
+        best = [0.0] * (capacity + 1)
+        choices = []
+        for options in groups:
+            previous = best
+            best = previous[:]
+            choice = [-1] * (capacity + 1)
+            for index, (weight, utility, _) in enumerate(options):
+                for spent in range(weight, capacity + 1):
+                    value = previous[spent - weight] + utility
+                    if value > best[spent]:
+                        best[spent] = value
+                        choice[spent] = index
+            choices.append(choice)
+
+        chosen = []
+        spent = capacity
+        for options, choice in zip(reversed(groups), reversed(choices)):
+            index = choice[spent]
+            if index >= 0:
+                chosen.extend(options[index][2])
+                spent -= options[index][0]
+        chosen.sort()
+        return [build for _, build in chosen]
+
+    def build(self, game_state, budget=None):
+        """Plans the builds for the turn and adds them to game_state in one batch
+
+        Args:
+            * game_state: The GameState of the turn
+            * budget: The SP to spend, all of the SP you have if None
+
+        Returns:
+            The list of builds added, as returned by plan
+
+        """
+        plan = self.plan(game_state, budget)
+        game_state.add_builds(plan)
+        return plan
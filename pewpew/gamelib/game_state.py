@@ -1,11 +1,19 @@
 import math
 import json
 import sys
+import copy
+from contextlib import contextmanager
 
 from .navigation import ShortestPathFinder
 from .util import send_command, debug_write
 from .unit import GameUnit
 from .game_map import GameMap
+from .threat_map import ThreatMap
+from .unit_store import UnitStore
+
+# The indexes of removals and upgrades in the config's unitInformation, and in the unit lists of engine states and spawn events
+REMOVE_INDEX = 6
+UPGRADE_INDEX = 7
 
 def is_stationary(unit_type):
     """
@@ -38,7 +46,8 @@ class GameState:
         * MP (int): A constant representing the Mobile Points resource, used in the get_resource function
         * SP (int): A constant representing the SP resource, used in the get_resource function
          
-        * game_map (:obj: GameMap): The current GameMap. To retrieve a list of GameUnits at a location, use game_map[x, y]
+        * game_map (:obj: GameMap): The current GameMap. To retrieve a list of GameUnits at a location, use game_map[x, y].
+          The units are only created the first time game_map is used.
         * turn_number (int): The current turn number. Starts at 0.
         * my_health (int): Your current remaining health
         * my_time (int): The time you took to submit your previous turn
@@ -52,7 +61,8 @@ class GameState:
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string or dict): The game state at the start of this turn, either as the json string
+              sent by the engine or already decoded, as AlgoCore passes it to on_turn
 
         """
         self.serialized_string = serialized_string
@@ -73,10 +83,10 @@ class GameState:
         UNIT_TYPE_TO_INDEX[DEMOLISHER] = 4
         INTERCEPTOR = config["unitInformation"][5]["shorthand"]
         UNIT_TYPE_TO_INDEX[INTERCEPTOR] = 5
-        REMOVE = config["unitInformation"][6]["shorthand"]
-        UNIT_TYPE_TO_INDEX[REMOVE] = 6
-        UPGRADE = config["unitInformation"][7]["shorthand"]
-        UNIT_TYPE_TO_INDEX[UPGRADE] = 7
+        REMOVE = config["unitInformation"][REMOVE_INDEX]["shorthand"]
+        UNIT_TYPE_TO_INDEX[REMOVE] = REMOVE_INDEX
+        UPGRADE = config["unitInformation"][UPGRADE_INDEX]["shorthand"]
+        UNIT_TYPE_TO_INDEX[UPGRADE] = UPGRADE_INDEX
 
         ALL_UNITS = [SCOUT, DEMOLISHER, INTERCEPTOR, WALL, SUPPORT, TURRET]
         STRUCTURE_TYPES = [WALL, SUPPORT, TURRET]
@@ -89,8 +99,12 @@ class GameState:
         MP = self.MP
         SP = self.SP
 
-        self.game_map = GameMap(self.config)
+        self.__game_map = GameMap(self.config)
+        self.__parsed_units = None
         self._shortest_path_finder = ShortestPathFinder()
+        self._threat_map = None
+        self.__journal = None
+        self.__copy_units = False
         self._build_stack = []
         self._deploy_stack = []
         self._player_resources = [
@@ -98,12 +112,27 @@ class GameState:
                 {'SP': 0, 'MP': 0}]  # player 1, which is the opponent
         self.__parse_state(serialized_string)
 
+    @property
+    def game_map(self):
+        if self.__parsed_units is not None:
+            p1units, p2units = self.__parsed_units
+            self.__parsed_units = None
+            self.__create_parsed_units(p1units, 0)
+            self.__create_parsed_units(p2units, 1)
+        return self.__game_map
+
+    @game_map.setter
+    def game_map(self, game_map):
+        self.__parsed_units = None
+        self.__game_map = game_map
+
     def __parse_state(self, state_line):
         """
-        Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        Reads the resources and turn information from the serialized game state. The units are kept until game_map
+        is first used, which fills in the map so that self.game_map[x,y] is a list of GameUnits at that location.
+        state_line is the game state as a json string or an already decoded dict.
         """
-        state = json.loads(state_line)
+        state = json.loads(state_line) if isinstance(state_line, str) else state_line
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -120,11 +149,7 @@ class GameState:
             {'SP': p1_SP, 'MP': p1_MP},
             {'SP': p2_SP, 'MP': p2_MP}]
 
-        p1units = state["p1Units"]
-        p2units = state["p2Units"]
-
-        self.__create_parsed_units(p1units, 0)
-        self.__create_parsed_units(p2units, 1)
+        self.__parsed_units = (state["p1Units"], state["p2Units"])
 
     def __create_parsed_units(self, units, player_number):
         """
@@ -146,8 +171,9 @@ class GameState:
                     if self.contains_stationary_unit([x,y]):
                         self.game_map[x,y][0].upgrade()
                 else:
-                    unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+                    unit_id = uinfo[3] if len(uinfo) > 3 else None
+                    unit = GameUnit(unit_type, self.config, player_number, hp, x, y, unit_id)
+                    self.__game_map._place_unit(unit)
 
     def __resource_required(self, unit_type):
         return self.SP if is_stationary(unit_type) else self.MP
@@ -333,7 +359,7 @@ class GameState:
         stationary = is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        on_edge = self.game_map.is_on_edge(location, [self.game_map.BOTTOM_LEFT, self.game_map.BOTTOM_RIGHT])
 
         if self.enable_warnings:
             fail_reason = ""
@@ -373,22 +399,29 @@ class GameState:
       
         if type(locations[0]) == int:
             locations = [locations]
+        stationary = is_stationary(unit_type)
+        costs = self.type_cost(unit_type)
         spawned_units = 0
         for location in locations:
-            for i in range(num):
-                if self.can_spawn(unit_type, location, 1):
-                    x, y = map(int, location)
-                    costs = self.type_cost(unit_type)
-                    self.__set_resource(SP, 0 - costs[SP])
-                    self.__set_resource(MP, 0 - costs[MP])
-                    self.game_map.add_unit(unit_type, location, 0)
-                    if is_stationary(unit_type):
-                        self._build_stack.append((unit_type, x, y))
-                    else:
-                        self._deploy_stack.append((unit_type, x, y))
-                    spawned_units += 1
-                else:
-                    break
+            if not self.can_spawn(unit_type, location, 1):
+                continue
+            # Mobile units stack, so every unit that can be afforded is spawned in one step
+            count = 1 if stationary else min(num, self.number_affordable(unit_type))
+            x, y = map(int, location)
+            self.__set_resource(SP, 0 - costs[SP] * count)
+            self.__set_resource(MP, 0 - costs[MP] * count)
+            structure_hash = self.game_map.structure_hash
+            self.__record_location(x, y)
+            self.game_map.add_unit(unit_type, location, 0, count)
+            if stationary:
+                self.__update_threat_map([x, y], structure_hash)
+                self._build_stack.append((unit_type, x, y))
+            else:
+                self._deploy_stack.extend([(unit_type, x, y)] * count)
+            spawned_units += count
+            if count < num:
+                # Repeats the check that stops spawning one unit at a time, for its warning
+                self.can_spawn(unit_type, location, 1)
         return spawned_units
 
     def attempt_remove(self, locations):
@@ -441,13 +474,160 @@ class GameState:
                     if resources[SP] >= costs[SP] and resources[MP] >= costs[MP]:
                         self.__set_resource(SP, 0 - costs[SP])
                         self.__set_resource(MP, 0 - costs[MP])
-                        existing_unit.upgrade()
+                        self.__upgrade_structure(x, y, existing_unit)
                         self._build_stack.append((UPGRADE, x, y))
                         spawned_units += 1
             else:
                 self.warn("Could not upgrade a unit from {}. Location has no structures or is enemy territory.".format(location))
         return spawned_units
 
+    def __upgrade_structure(self, x, y, existing_unit):
+        """Upgrades the structure at a location on the map, without charging for it"""
+        self.__record_location(x, y)
+        if self.__copy_units:
+            # The unit may be shared with a fork or needed to roll back a trial, so upgrade a copy
+            upgraded_unit = copy.copy(existing_unit)
+            self.game_map[x, y] = [upgraded_unit if unit is existing_unit else unit for unit in self.game_map[x, y]]
+            existing_unit = upgraded_unit
+        existing_unit.upgrade()
+        self.__update_threat_map([x, y], self.game_map.structure_hash)
+
+    def add_builds(self, builds):
+        """Adds structure spawns and upgrades that were already checked to the turn in one batch.
+        Unlike attempt_spawn and attempt_upgrade, only upgrades are checked, so the spawns must be on free tiles
+        of your half and the builds must be affordable together. An upgrade of a tile with no structure, before
+        or earlier in the list, is skipped with a warning. BuildPlanner makes such lists.
+
+        Args:
+            builds: A list of (unit_type, x, y) tuples, where unit_type is a structure type or UPGRADE
+
+        Returns:
+            The number of builds added
+
+        """
+        spent = [0, 0]
+        added = []
+        for unit_type, x, y in builds:
+            if unit_type == UPGRADE:
+                existing_unit = self.contains_stationary_unit([x, y])
+                if not existing_unit:
+                    self.warn("Could not upgrade a unit from {}. Location has no structures.".format([x, y]))
+                    continue
+                costs = self.type_cost(existing_unit.unit_type, True)
+                self.__upgrade_structure(x, y, existing_unit)
+            else:
+                costs = self.type_cost(unit_type)
+                structure_hash = self.game_map.structure_hash
+                self.__record_location(x, y)
+                self.game_map.add_unit(unit_type, [x, y], 0)
+                self.__update_threat_map([x, y], structure_hash)
+            spent[SP] += costs[SP]
+            spent[MP] += costs[MP]
+            added.append((unit_type, x, y))
+        self.__set_resource(SP, 0 - spent[SP])
+        self.__set_resource(MP, 0 - spent[MP])
+        self._build_stack.extend(added)
+        return len(added)
+
+    def fork(self):
+        """Copies this GameState so hypothetical spawns, upgrades and removals can be tried on the copy.
+        Map locations are copied on write, so forking takes microseconds rather than a deepcopy.
+        The copy shares the config and pathfinding caches with this state.
+
+        Returns:
+            A new GameState that can be changed without affecting this one
+
+        """
+        forked = copy.copy(self)
+        forked.game_map = self.game_map.copy()
+        forked._player_resources = [dict(resources) for resources in self._player_resources]
+        forked._build_stack = list(self._build_stack)
+        forked._deploy_stack = list(self._deploy_stack)
+        if self._threat_map is not None:
+            forked._threat_map = self._threat_map.copy(forked.game_map)
+        forked.__journal = None
+        forked.__copy_units = True
+        self.__copy_units = True
+        return forked
+
+    @contextmanager
+    def trial(self):
+        """Undoes every attempt_spawn, attempt_upgrade and attempt_remove made inside a with block.
+        Trials can be nested. Changes made through game_map directly are not undone.
+
+        Example:
+            with game_state.trial():
+                game_state.attempt_spawn(TURRET, [13, 11])
+                score = evaluate(game_state)
+            # The turret and the SP spent on it are gone again here
+
+        """
+        if self.__journal is None:
+            self.__journal = []
+        journal_start = len(self.__journal)
+        copy_units = self.__copy_units
+        resources = [dict(resources) for resources in self._player_resources]
+        build_count = len(self._build_stack)
+        deploy_count = len(self._deploy_stack)
+        self.__copy_units = True
+        try:
+            yield self
+        finally:
+            game_map = self.game_map
+            threat_map = self._threat_map
+            threat_map_current = threat_map is not None and threat_map.structure_hash == game_map.structure_hash
+            locations = []
+            while len(self.__journal) > journal_start:
+                x, y, units = self.__journal.pop()
+                game_map[x, y] = units
+                locations.append([x, y])
+            if threat_map_current:
+                for location in locations:
+                    threat_map.update_location(location)
+            if journal_start == 0:
+                self.__journal = None
+            self.__copy_units = copy_units
+            self._player_resources = resources
+            del self._build_stack[build_count:]
+            del self._deploy_stack[deploy_count:]
+
+    def __record_location(self, x, y):
+        """Remembers the units at a location before a change, so an enclosing trial can restore them"""
+        if self.__journal is not None:
+            self.__journal.append((x, y, self.game_map[x, y]))
+
+    def get_unit_store(self):
+        """Gets a columnar UnitStore snapshot of every unit on the board, for vectorised queries with NumPy
+
+        Returns:
+            A UnitStore, or None if NumPy is not installed
+
+        """
+        try:
+            return UnitStore(self.game_map)
+        except ImportError:
+            self.warn("NumPy is not installed, so a UnitStore cannot be built")
+
+    def get_threat_map(self):
+        """Gets the ThreatMap of the current board, computing it the first time it is needed.
+        It is kept up to date by attempt_spawn and attempt_upgrade, and recomputed if structures
+        were added or removed through game_map directly.
+
+        Returns:
+            A ThreatMap with the damage per frame at every tile for each player
+
+        """
+        if self._threat_map is None:
+            self._threat_map = ThreatMap(self.game_map)
+        elif self._threat_map.structure_hash != self.game_map.structure_hash:
+            self._threat_map.rebuild()
+        return self._threat_map
+
+    def __update_threat_map(self, location, structure_hash):
+        """Updates the threat map for one changed location if it was up to date before the change"""
+        if self._threat_map is not None and self._threat_map.structure_hash == structure_hash:
+            self._threat_map.update_location(location)
+
     def get_target_edge(self, start_location):
         """Gets the target edge given a starting location
 
@@ -494,6 +674,36 @@ class GameState:
         end_points = self.game_map.get_edge_locations(target_edge)
         return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
 
+    def find_paths_to_edges(self, start_locations, target_edge=None):
+        """Gets the paths units at several locations would take.
+        Starts heading for the same edge share one pathfind, so evaluating every spawn point
+        costs about as much as a single call to find_path_to_edge.
+
+        Args:
+            start_locations: A list of locations of hypothetical units
+            target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from each start location if None.
+
+        Returns:
+            A list with the path for each start location, in the same order as start_locations.
+            Starts blocked by a structure get None.
+
+        """
+        by_edge = {}
+        for index, start_location in enumerate(start_locations):
+            if self.contains_stationary_unit(start_location) or not self.game_map.in_arena_bounds(start_location):
+                self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+                continue
+            edge = self.get_target_edge(start_location) if target_edge is None else target_edge
+            by_edge.setdefault(edge, []).append(index)
+
+        paths = [None] * len(start_locations)
+        for edge, indices in by_edge.items():
+            end_points = self.game_map.get_edge_locations(edge)
+            edge_paths = self._shortest_path_finder.navigate_multiple_starts([start_locations[i] for i in indices], end_points, self)
+            for index, path in zip(indices, edge_paths):
+                paths[index] = path
+        return paths
+
     def contains_stationary_unit(self, location):
         """Check if a location is blocked, return structures unit if it is
 
@@ -508,6 +718,8 @@ class GameState:
             self.warn('Checked for stationary unit outside of arena bounds')
             return False
         x, y = map(int, location)
+        if not self.game_map.has_structure([x, y]):
+            return False
         for unit in self.game_map[x,y]:
             if unit.stationary:
                 return unit
@@ -550,23 +762,30 @@ class GameState:
             self.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.".format(type(attacking_unit)))
             return
 
+        game_map = self.game_map
         attacker_location = [attacking_unit.x, attacking_unit.y]
-        possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.attackRange)
+        possible_locations = game_map._locations_in_range(attacker_location, attacking_unit.attackRange)
         target = None
         target_stationary = True
         target_distance = sys.maxsize
         target_health = sys.maxsize
         target_y = self.ARENA_SIZE
         target_x_distance = 0
+        attacker_player_index = attacking_unit.player_index
+        attacks_structures = attacking_unit.damage_f != 0
+        attacks_mobile_units = attacking_unit.damage_i != 0
 
         for location in possible_locations:
-            for unit in self.game_map[location]:
-                if unit.player_index == attacking_unit.player_index or (attacking_unit.damage_f == 0 and is_stationary(unit.unit_type)) or (attacking_unit.damage_i == 0 and not(is_stationary(unit.unit_type))):
+            units = game_map._units_at(location)
+            if not units:
+                continue
+            for unit in units:
+                unit_stationary = unit.stationary
+                if unit.player_index == attacker_player_index or (unit_stationary and not attacks_structures) or (not unit_stationary and not attacks_mobile_units):
                     continue
 
                 new_target = False
-                unit_stationary = unit.stationary
-                unit_distance = self.game_map.distance_between_locations(location, [attacking_unit.x, attacking_unit.y])
+                unit_distance = game_map.distance_between_locations(location, attacker_location)
                 unit_health = unit.health
                 unit_y = unit.y
                 unit_x_distance = abs(self.HALF_ARENA - 0.5 - unit.x)
@@ -635,7 +854,7 @@ class GameState:
         for unit in self.config["unitInformation"]:
             if unit.get('attackRange', 0) >= max_range:
                 max_range = unit.get('attackRange', 0)
-        possible_locations= self.game_map.get_locations_in_range(location, max_range)
+        possible_locations = self.game_map._locations_in_range(location, max_range)
         for location_unit in possible_locations:
             for unit in self.game_map[location_unit]:
                 if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.distance_between_locations(location, location_unit) <= unit.attackRange:
@@ -0,0 +1,152 @@
+import copy
+
+from .game_state import REMOVE_INDEX, UPGRADE_INDEX, GameState
+from .replay import diff_units, get_frame_units
+from .threat_map import ThreatMap
+from .unit import GameUnit
+from .util import debug_write
+
+
+class LiveBoard:
+    """Keeps the structures on the board from one turn to the next by applying action frame events
+
+    Every turn the engine sends the whole board again. A LiveBoard instead follows the spawn, upgrade, removal,
+    damage and death events of each action phase, checks the result against the next turn and hands out a
+    GameState built on the board it already has. The structure_hash, bitboards and ThreatMap of that board are
+    updated one location at a time, so they and every path cached under the structure_hash stay valid across
+    turns instead of being recomputed. If the next turn does not match, the mismatch is recorded and the board
+    is rebuilt from the turn.
+
+    Mobile units are not tracked, since none of them outlive the action phase. Shield events only affect
+    mobile units, so they are not needed either.
+
+    Example:
+        def on_game_start(self, config):
+            self.live_board = gamelib.LiveBoard(config)
+            self.live_board.subscribe(self)
+
+        def on_turn(self, turn_state):
+            game_state = self.live_board.reconcile(turn_state)
+
+    Attributes :
+        * config (JSON): The game config
+        * game_map (:obj: GameMap): The tracked structures, None before the first turn
+        * threat_map (:obj: ThreatMap): The threat of the tracked structures, kept up to date with game_map
+        * turns_kept (int): The number of turns that matched the tracked board
+        * mismatches (list): A (turn, differences) tuple for each turn that did not match, where differences is
+          a list of strings as returned by replay.diff_units
+
+    """
+    EVENT_TYPES = ["spawn", "damage", "death"]
+
+    def __init__(self, config):
+        """Starts an empty board, which is filled in by the first call to reconcile
+
+        Args:
+            * config: The game config
+
+        """
+        self.config = config
+        self.game_map = None
+        self.threat_map = None
+        self.turns_kept = 0
+        self.mismatches = []
+        self.__units = {}
+        self.__structure_types = {index: unit_information["shorthand"] for index, unit_information
+                                  in enumerate(config["unitInformation"]) if unit_information.get("unitCategory") == 0}
+
+    def subscribe(self, algo):
+        """Subscribes the board to the action frame events it needs
+
+        Args:
+            * algo: The AlgoCore to subscribe to
+
+        """
+        for event_type in self.EVENT_TYPES:
+            algo.subscribe_frame_events(event_type, lambda events, turn_info, event_type=event_type: self.apply_events(event_type, events))
+
+    def apply_events(self, event_type, events):
+        """Applies the events of one type from an action frame. Events arriving before the first turn are ignored.
+
+        Args:
+            * event_type: "spawn", "damage" or "death"
+            * events: The list of those events in the frame
+
+        """
+        if self.game_map is None:
+            return
+        if event_type == "spawn":
+            for (x, y), type_index, unit_id, player in events:
+                self.__spawn([x, y], type_index, unit_id, player - 1)
+        elif event_type == "damage":
+            for _, damage, _, unit_id, _ in events:
+                unit = self.__units.get(unit_id)
+                if unit is not None:
+                    self.__replace(unit).health -= damage
+        elif event_type == "death":
+            for event in events:
+                unit = self.__units.pop(event[2], None)
+                if unit is not None:
+                    self.game_map[unit.x, unit.y] = []
+                    self.threat_map.update_location([unit.x, unit.y])
+
+    def __spawn(self, location, type_index, unit_id, player_index):
+        x, y = location
+        units = self.game_map[x, y]
+        if type_index in (REMOVE_INDEX, UPGRADE_INDEX):
+            if units and units[0].stationary:
+                unit = self.__replace(units[0])
+                if type_index == REMOVE_INDEX:
+                    unit.pending_removal = True
+                else:
+                    # Like the engine, an upgraded structure takes the id of its upgrade and the upgraded starting health
+                    del self.__units[unit.unit_id]
+                    unit.upgrade()
+                    unit.health = unit.max_health
+                    unit.unit_id = unit_id
+                    self.__units[unit_id] = unit
+                    self.threat_map.update_location(location)
+        elif type_index in self.__structure_types:
+            self.__place(GameUnit(self.__structure_types[type_index], self.config, player_index, None, x, y, unit_id))
+
+    def __place(self, unit):
+        self.game_map[unit.x, unit.y] = [unit]
+        self.__units[unit.unit_id] = unit
+        self.threat_map.update_location([unit.x, unit.y])
+
+    def __replace(self, unit):
+        """Swaps a unit for a copy before it is changed, since GameStates handed out by reconcile share the units"""
+        changed = copy.copy(unit)
+        self.game_map[unit.x, unit.y] = [changed]
+        self.__units[unit.unit_id] = changed
+        return changed
+
+    def reconcile(self, state):
+        """Checks the tracked board against the state of a new turn and gets the GameState for that turn
+
+        Args:
+            * state: The turn state, decoded from json, as passed to on_turn
+
+        Returns:
+            A GameState for the turn, sharing the tracked board and threat map if they matched the turn
+
+        """
+        game_state = GameState(self.config, state)
+        if self.game_map is not None:
+            expected = get_frame_units(self.config, state)
+            tracked = {unit.unit_id: (unit.x, unit.y, round(unit.health, 3), unit.player_index) for unit in self.__units.values()}
+            if expected == tracked:
+                self.turns_kept += 1
+            else:
+                differences = diff_units(expected, tracked)
+                debug_write("The live board did not match turn {}, rebuilding it: {}".format(game_state.turn_number, "; ".join(differences[:3])))
+                self.mismatches.append((game_state.turn_number, differences))
+                self.game_map = None
+        if self.game_map is None:
+            self.game_map = game_state.game_map
+            self.__units = {unit.unit_id: unit for unit in self.game_map.get_all_units() if unit.stationary}
+            self.threat_map = ThreatMap(self.game_map)
+        game_state.game_map = self.game_map
+        game_state._threat_map = self.threat_map
+        # The fork copies the map and threat map, and copies units before changing them, so the turn cannot change the tracked board
+        return game_state.fork()
@@ -0,0 +1,178 @@
+from .navigation import get_path_grid
+from .unit import GameUnit
+
+
+class PlacementResult:
+    """How the paths of the pathing player look after a hypothetical placement
+
+    Attributes :
+        * unit_type (string): The type of the placed structure, None for the unchanged board
+        * location ([int, int]): Where the structure was placed, None for the unchanged board
+        * start_locations (list): The start locations the paths were found from
+        * paths (list): The path from each start location, None where the start is blocked
+        * path_lengths (list): The number of tiles in each path, 0 where the start is blocked
+        * threats (list): The damage per frame a unit would take summed over each tile of its path
+        * reaches_edge (list): For each path, True if it ends on its target edge, False if it self destructs
+
+    """
+    def __init__(self, unit_type, location, start_locations, paths, threats, reaches_edge):
+        self.unit_type = unit_type
+        self.location = location
+        self.start_locations = start_locations
+        self.paths = paths
+        self.path_lengths = [len(path) if path else 0 for path in paths]
+        self.threats = threats
+        self.reaches_edge = reaches_edge
+
+    def __repr__(self):
+        return "PlacementResult({} at {}, path lengths {}, threats {})".format(self.unit_type, self.location, self.path_lengths, self.threats)
+
+
+class PlacementEvaluator:
+    """Scores many hypothetical structure placements against one board
+
+    The distance field for each target edge is computed once. Each candidate placement is
+    applied to a copy of that field, which only repairs the tiles whose route went through the
+    new structure, and paths that never touch a changed tile are reused from the unchanged board.
+
+    Attributes :
+        * game_state (:obj: GameState): The board placements are evaluated against. It is never modified.
+        * player_index (int): The player whose mobile units walk the paths, 1 (your opponent) by default
+        * start_locations (list): The unblocked locations paths are found from
+        * baseline (:obj: PlacementResult): The paths on the unchanged board
+
+    """
+    def __init__(self, game_state, start_locations=None, player_index=1):
+        """Finds the paths on the unchanged board
+
+        Args:
+            * game_state: The current GameState
+            * start_locations: The locations to find paths from. Every edge tile of the pathing player if None.
+            * player_index: The player whose mobile units walk the paths, 0 for you 1 for the enemy
+
+        """
+        self.game_state = game_state
+        self.player_index = player_index
+        game_map = game_state.game_map
+        if start_locations is None:
+            if player_index == 1:
+                start_locations = game_map.get_edge_locations(game_map.TOP_LEFT) + game_map.get_edge_locations(game_map.TOP_RIGHT)
+            else:
+                start_locations = game_map.get_edge_locations(game_map.BOTTOM_LEFT) + game_map.get_edge_locations(game_map.BOTTOM_RIGHT)
+        self.start_locations = [list(location) for location in start_locations if game_map.in_arena_bounds(location) and not game_state.contains_stationary_unit(location)]
+
+        self._finder = game_state._shortest_path_finder
+        self._grid = get_path_grid(game_map)
+        self._threat_map = game_state.get_threat_map()
+        self._groups = {}
+        for index, location in enumerate(self.start_locations):
+            edge = game_state.get_target_edge(location)
+            if edge not in self._groups:
+                end_points = game_map.get_edge_locations(edge)
+                field = self._finder.get_distance_field(end_points, game_state).copy()
+                self._groups[edge] = (field, set(map(tuple, end_points)), [])
+            self._groups[edge][2].append(index)
+
+        paths = [None] * len(self.start_locations)
+        reaches_edge = [False] * len(self.start_locations)
+        self._influence = [None] * len(self.start_locations)
+        for field, end_set, indices in self._groups.values():
+            for index in indices:
+                path = self._finder.path_from_field(self.start_locations[index], field, game_state)
+                paths[index] = path
+                reaches_edge[index] = tuple(path[-1]) in end_set
+                self._influence[index] = self.__influence(path)
+        self.baseline = PlacementResult(None, None, self.start_locations, paths, [self.path_threat(path) for path in paths], reaches_edge)
+
+    def evaluate(self, placements):
+        """Evaluates a list of candidate placements
+
+        Args:
+            * placements: A list of [unit_type, location] pairs, for example [[TURRET, [13, 11]], [WALL, [12, 11]]]
+
+        Returns:
+            A list with a PlacementResult for each placement, or None for placements that are not possible
+
+        """
+        return [self.evaluate_placement(unit_type, location) for unit_type, location in placements]
+
+    def evaluate_placement(self, unit_type, location):
+        """Finds the paths that would result from placing one structure
+
+        Args:
+            * unit_type: The type of the structure
+            * location: Where the structure would be placed
+
+        Returns:
+            A PlacementResult, or None if the location is off the board, already holds a structure or unit_type is not a structure
+
+        """
+        from .game_state import STRUCTURE_TYPES
+        if unit_type not in STRUCTURE_TYPES:
+            self.game_state.warn("Can only evaluate placing structures, got {}".format(unit_type))
+            return
+        if not self.game_state.game_map.in_arena_bounds(location) or self.game_state.contains_stationary_unit(location):
+            return
+
+        new_unit = GameUnit(unit_type, self.game_state.config, 1 - self.player_index, None, location[0], location[1])
+        paths = list(self.baseline.paths)
+        threats = list(self.baseline.threats)
+        reaches_edge = list(self.baseline.reaches_edge)
+        for field, end_set, indices in self._groups.values():
+            placed = field.copy()
+            changed = placed.add_structure(location)
+            for index in indices:
+                if changed.isdisjoint(self._influence[index]):
+                    continue
+                path = self._finder.path_from_field(self.start_locations[index], placed, self.game_state)
+                paths[index] = path
+                threats[index] = self.path_threat(path)
+                reaches_edge[index] = path is not None and tuple(path[-1]) in end_set
+
+        if new_unit.damage_i > 0:
+            threats = [threat + self.__added_threat(path, new_unit) for path, threat in zip(paths, threats)]
+        return PlacementResult(unit_type, list(location), self.start_locations, paths, threats, reaches_edge)
+
+    def path_threat(self, path, new_unit=None):
+        """The damage per frame a unit of the pathing player would take, summed over every tile of a path
+
+        Args:
+            * path: A list of locations
+            * new_unit: An optional hypothetical GameUnit whose attacks are also counted
+
+        Returns:
+            The summed damage, 0 for a missing path
+
+        """
+        if not path:
+            return 0
+        threat = self._threat_map.get_path_damage(path, self.player_index)
+        if new_unit is not None:
+            threat += self.__added_threat(path, new_unit)
+        return threat
+
+    def tile_threat(self, location):
+        """The damage per frame existing structures deal to a unit of the pathing player at a location"""
+        return self._threat_map.get_damage(location, self.player_index)
+
+    def __added_threat(self, path, new_unit):
+        """The damage a hypothetical unit adds along a path"""
+        if not path or new_unit.damage_i <= 0:
+            return 0
+        range_squared = new_unit.attackRange ** 2
+        tiles_in_range = 0
+        for x, y in path:
+            if (x - new_unit.x) ** 2 + (y - new_unit.y) ** 2 <= range_squared:
+                tiles_in_range += 1
+        return tiles_in_range * new_unit.damage_i
+
+    def __influence(self, path):
+        """The tile IDs a path depends on: its own tiles and their neighbors"""
+        influence = set()
+        if not path:
+            return influence
+        for location in path:
+            tile = self._grid.tile_id(location)
+            influence.add(tile)
+            influence.update(self._grid.neighbors[tile])
+        return influence
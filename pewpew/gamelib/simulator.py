@@ -0,0 +1,655 @@
+import copy
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .navigation import PathingSession
+from .unit import GameUnit
+
+
+def _creation_order(unit):
+    """Sort key putting units in the order the engine created them, units without an engine id last"""
+    try:
+        return (0, int(unit.unit_id))
+    except (TypeError, ValueError):
+        return (1, 0)
+
+
+class SimulationResult:
+    """The outcome of a simulated action phase. Every list holds one value per player, 0 for you 1 for the enemy.
+
+    Attributes :
+        * frames (int): The number of frames simulated
+        * breaches (list): The number of that player's mobile units that reached their target edge
+        * breach_locations (list): The locations where that player's mobile units scored
+        * player_damage (list): The health that player lost to enemy breaches
+        * sp_gained (list): The SP that player earned from its own breaches
+        * damage_dealt (list): The damage that player's units dealt to enemy units, counting attacks and self destructs
+        * structure_damage (list): The part of damage_dealt that hit enemy structures
+        * structures_lost (list): The number of that player's structures that were destroyed
+        * units_lost (list): The number of that player's mobile units destroyed or self destructed
+        * destroyed_structures (list): The GameUnit of every structure destroyed, at its location
+
+    """
+    def __init__(self):
+        self.frames = 0
+        self.breaches = [0, 0]
+        self.breach_locations = [[], []]
+        self.player_damage = [0, 0]
+        self.sp_gained = [0, 0]
+        self.damage_dealt = [0, 0]
+        self.structure_damage = [0, 0]
+        self.structures_lost = [0, 0]
+        self.units_lost = [0, 0]
+        self.destroyed_structures = []
+
+    def __repr__(self):
+        return "SimulationResult(frames={}, breaches={}, player_damage={}, damage_dealt={}, structures_lost={}, units_lost={})".format(
+            self.frames, self.breaches, self.player_damage, self.damage_dealt, self.structures_lost, self.units_lost)
+
+
+class Simulator:
+    """Plays out the action phase of a GameState frame by frame, without touching the state itself
+
+    The simulator works on a fork of the state, so the mobile units already placed with attempt_spawn this
+    turn take part, and more can be added with add_unit. Each frame follows the order of the engine:
+
+        1. Supports shield friendly mobile units in range, once per support and unit
+        2. Mobile units move along their path every 1/speed frames. A unit that reaches its target edge
+           breaches, and one that cannot go further self destructs
+        3. Every unit attacks the target chosen by game_state.get_target, structures first. Units brought to 0
+           health can no longer be targeted but still attack this frame
+        4. Destroyed units are removed, and paths are repaired around destroyed structures
+
+    All stats come from the config, so the simulator follows whatever rules the game is configured with.
+
+    Attributes :
+        * game_state (:obj: GameState): The fork of the state being simulated. Its game_map is changed every frame.
+        * frame (int): The number of the next frame to simulate
+        * result (:obj: SimulationResult): The outcome so far
+        * session (:obj: PathingSession): Follows the path of every mobile unit
+
+    """
+    def __init__(self, game_state):
+        """Starts a simulation from a GameState
+
+        Args:
+            * game_state: The GameState the action phase starts from
+
+        """
+        self.game_state = game_state.fork()
+        self.frame = 0
+        self.result = SimulationResult()
+        game_map = self.game_state.game_map
+        self.__game_map = game_map
+        self.__size = game_map.ARENA_SIZE
+        self.__edge_tiles = [set(x * self.__size + y for x, y in edge) for edge in game_map.get_edges()]
+        self.__mobile_units = []
+        self.__attackers = []
+        self.__supports = []
+        self.__spawn_frames = {}
+        self.__periods = {}
+        self.__steps = {}
+        self.__targets = {}
+        self.__ranges = {}
+        self.__shields = {}
+        self.__shielded = set()
+        self.__dead = []
+
+        # Units are damaged in place, so work on copies rather than the units shared with game_state
+        locations = set((unit.x, unit.y) for unit in game_map.get_all_units())
+        for location in locations:
+            game_map[location] = [copy.copy(unit) for unit in game_map[location]]
+        self.session = PathingSession(self.game_state)
+        for unit in sorted(game_map.get_all_units(), key=_creation_order):
+            if unit.stationary:
+                self.__add_structure(unit)
+            else:
+                self.__add_mobile_unit(unit, None)
+
+    def add_unit(self, unit_type, locations, player_index=0, num=1, target_edge=None):
+        """Adds mobile units to the simulation, spawning on the next frame simulated.
+        Unlike attempt_spawn no resources are spent, so any number of units can be tried for either player.
+
+        Args:
+            * unit_type: The type of mobile unit to add
+            * locations: A single location or list of locations to add units at
+            * player_index: The player controlling the units, 0 for you 1 for the enemy
+            * num: The number of units to add at each location
+            * target_edge: The edge the units head for, induced from their location if None
+
+        Returns:
+            The number of units added
+
+        """
+        if type(locations[0]) == int:
+            locations = [locations]
+        game_map = self.__game_map
+        added = 0
+        for location in locations:
+            x, y = map(int, location)
+            if not game_map.in_arena_bounds([x, y]) or self.game_state.contains_stationary_unit([x, y]):
+                self.game_state.warn("Could not add a {} to the simulation at {}.".format(unit_type, location))
+                continue
+            for _ in range(num):
+                unit = GameUnit(unit_type, self.game_state.config, player_index, None, x, y)
+                if unit.stationary:
+                    self.game_state.warn("Simulator.add_unit only adds mobile units, not {}.".format(unit_type))
+                    return added
+                game_map[x, y] = game_map[x, y] + [unit]
+                self.__add_mobile_unit(unit, target_edge)
+                added += 1
+        return added
+
+    def run(self, max_frames=1000):
+        """Simulates frames until every mobile unit has breached or been destroyed
+
+        Args:
+            * max_frames: The most frames to simulate, in case some unit can never finish
+
+        Returns:
+            The SimulationResult
+
+        """
+        while self.__mobile_units and self.frame < max_frames:
+            self.step()
+        return self.result
+
+    def step(self):
+        """Simulates a single frame
+
+        Returns:
+            The SimulationResult so far
+
+        """
+        self.__shield()
+        self.__move()
+        self.__attack()
+        self.__remove_dead()
+        self.frame += 1
+        self.result.frames = self.frame
+        return self.result
+
+    def get_mobile_units(self):
+        """The mobile units still on the board, in the order they were created"""
+        return list(self.__mobile_units)
+
+    def __add_structure(self, unit):
+        size = self.__size
+        if unit.damage_i + unit.damage_f > 0:
+            self.__attackers.append(unit)
+            locations = self.__game_map._locations_in_range([unit.x, unit.y], unit.attackRange)
+            self.__ranges[unit] = frozenset(x * size + y for x, y in locations)
+        if unit.shieldPerUnit > 0 and unit.shieldRange > 0:
+            self.__supports.append(unit)
+            locations = self.__game_map._locations_in_range([unit.x, unit.y], unit.shieldRange)
+            row = unit.y if unit.player_index == 0 else size - 1 - unit.y
+            self.__shields[unit] = (frozenset(x * size + y for x, y in locations), unit.shieldPerUnit + unit.spec.shieldBonusPerY * row)
+
+    def __add_mobile_unit(self, unit, target_edge):
+        if target_edge is None:
+            target_edge = self.game_state.get_target_edge([unit.x, unit.y])
+        self.__mobile_units.append(unit)
+        self.__spawn_frames[unit] = self.frame
+        self.__periods[unit] = max(1, int(round(1 / unit.speed))) if unit.speed > 0 else 0
+        self.__steps[unit] = 0
+        self.__targets[unit] = self.__edge_tiles[target_edge]
+        self.session.add_unit(unit, [unit.x, unit.y], target_edge)
+
+    def __shield(self):
+        size = self.__size
+        for support in self.__supports:
+            tiles, amount = self.__shields[support]
+            for unit in self.__mobile_units:
+                if unit.player_index == support.player_index and unit.x * size + unit.y in tiles and (support, unit) not in self.__shielded:
+                    self.__shielded.add((support, unit))
+                    unit.health += amount
+
+    def __move(self):
+        size = self.__size
+        for unit in list(self.__mobile_units):
+            period = self.__periods[unit]
+            if unit.health <= 0 or not period or (self.frame - self.__spawn_frames[unit]) % period:
+                continue
+            next_move = self.session.next_move(unit)
+            if next_move is None:
+                if unit.x * size + unit.y in self.__targets[unit]:
+                    self.__breach(unit)
+                else:
+                    self.__self_destruct(unit)
+                continue
+            self.__game_map._move_unit(unit, next_move)
+            self.session.move_unit(unit, next_move)
+            self.__steps[unit] += 1
+            if unit.x * size + unit.y in self.__targets[unit]:
+                self.__breach(unit)
+
+    def __attack(self):
+        size = self.__size
+        occupied = [set(), set()]
+        for unit in self.__mobile_units:
+            if unit.health > 0:
+                occupied[unit.player_index].add(unit.x * size + unit.y)
+        game_state = self.game_state
+        for attacker in self.__attackers:
+            # Most structures only hit mobile units, so skip them when no enemy is in range
+            if attacker.damage_f == 0 and self.__ranges[attacker].isdisjoint(occupied[1 - attacker.player_index]):
+                continue
+            self.__attack_target(attacker, game_state.get_target(attacker))
+        for attacker in list(self.__mobile_units):
+            self.__attack_target(attacker, game_state.get_target(attacker))
+
+    def __attack_target(self, attacker, target):
+        if target is not None:
+            self.__damage(attacker.player_index, target, attacker.damage_f if target.stationary else attacker.damage_i)
+
+    def __damage(self, player_index, target, damage):
+        if damage <= 0:
+            return
+        alive = target.health > 0
+        target.health -= damage
+        self.result.damage_dealt[player_index] += damage
+        if target.stationary:
+            self.result.structure_damage[player_index] += damage
+        if alive and target.health <= 0:
+            self.__dead.append(target)
+            self.__game_map._take_unit(target)
+
+    def __breach(self, unit):
+        player_index = unit.player_index
+        result = self.result
+        result.breaches[player_index] += 1
+        result.breach_locations[player_index].append([unit.x, unit.y])
+        result.player_damage[1 - player_index] += unit.spec.playerBreachDamage
+        result.sp_gained[player_index] += unit.spec.metalForBreach
+        self.__remove_mobile_unit(unit)
+
+    def __self_destruct(self, unit):
+        spec = unit.spec
+        if self.__steps[unit] >= spec.selfDestructStepsRequired:
+            for location in self.__game_map._locations_in_range([unit.x, unit.y], spec.selfDestructRange):
+                for target in self.__game_map[location]:
+                    if target.player_index != unit.player_index:
+                        damage = spec.selfDestructDamageTower if target.stationary else spec.selfDestructDamageWalker
+                        self.__damage(unit.player_index, target, damage)
+        self.result.units_lost[unit.player_index] += 1
+        self.__remove_mobile_unit(unit)
+
+    def __remove_mobile_unit(self, unit):
+        self.__mobile_units.remove(unit)
+        self.session.remove_unit(unit)
+        if unit.health > 0:
+            self.__game_map._take_unit(unit)
+
+    def __remove_dead(self):
+        if not self.__dead:
+            return
+        result = self.result
+        for unit in self.__dead:
+            if unit.stationary:
+                result.structures_lost[unit.player_index] += 1
+                result.destroyed_structures.append(unit)
+                self.session.remove_structure([unit.x, unit.y])
+            elif unit in self.__mobile_units:
+                result.units_lost[unit.player_index] += 1
+                self.session.remove_unit(unit)
+        self.__dead = []
+        self.__mobile_units = [unit for unit in self.__mobile_units if unit.health > 0]
+        self.__attackers = [unit for unit in self.__attackers if unit.health > 0]
+        self.__supports = [unit for unit in self.__supports if unit.health > 0]
+
+
+def _pick(candidates, keys):
+    """Narrows down the candidates of each row to the best ones by a series of tie breaking keys
+
+    Args:
+        * candidates: A boolean array, True where a column can be chosen
+        * keys: A list of arrays shaped like candidates, the smallest value wins and ties go to the next key
+
+    Returns:
+        A boolean array of the columns still tied after every key, and whether each row had any candidate
+
+    """
+    mask = candidates.copy()
+    for values in keys:
+        values = np.where(mask, values, np.inf)
+        mask &= values == values.min(axis=1, keepdims=True)
+    return mask, candidates.any(axis=1)
+
+
+class BatchResult:
+    """The outcomes of a BatchSimulator, one entry per candidate deployment in each array
+
+    Attributes :
+        * candidates (list): The candidate deployments, in the order they were given
+        * breaches (array): The number of units that reached their target edge
+        * player_damage (array): The health the enemy lost to those breaches
+        * sp_gained (array): The SP earned from those breaches
+        * damage_dealt (array): The damage dealt to enemy structures, counting attacks and self destructs
+        * structures_destroyed (array): The number of enemy structures destroyed
+        * units_lost (array): The number of units destroyed or self destructed
+        * frames (array): The number of frames until the last unit of the candidate finished
+
+    """
+    def __init__(self, candidates):
+        count = len(candidates)
+        self.candidates = candidates
+        self.breaches = np.zeros(count, dtype=np.int32)
+        self.player_damage = np.zeros(count)
+        self.sp_gained = np.zeros(count)
+        self.damage_dealt = np.zeros(count)
+        self.structures_destroyed = np.zeros(count, dtype=np.int32)
+        self.units_lost = np.zeros(count, dtype=np.int32)
+        self.frames = np.zeros(count, dtype=np.int32)
+
+    def table(self):
+        """The results as a list with one dict per candidate, in the order the candidates were given"""
+        rows = []
+        for index, candidate in enumerate(self.candidates):
+            rows.append({
+                "candidate": candidate,
+                "breaches": int(self.breaches[index]),
+                "player_damage": float(self.player_damage[index]),
+                "sp_gained": float(self.sp_gained[index]),
+                "damage_dealt": float(self.damage_dealt[index]),
+                "structures_destroyed": int(self.structures_destroyed[index]),
+                "units_lost": int(self.units_lost[index]),
+                "frames": int(self.frames[index]),
+            })
+        return rows
+
+
+class BatchSimulator:
+    """Simulates many candidate attacks of yours against the same board at once, in lockstep with NumPy arrays
+
+    Each candidate is a list of (unit_type, location, num) deployments, for example
+    [(SCOUT, [13, 0], 5), (DEMOLISHER, [14, 0], 2)]. Every candidate starts from the structures of the same
+    GameState and follows the same rules as Simulator: shields, movement every 1/speed frames, breaches,
+    self destructs, attacks by get_target priority and path repair when a structure is destroyed.
+
+    Only your units move, so enemy mobile units and any mobile units already on the map are left out. When
+    several identical units are equally good targets the most recently created one is hit, which matches
+    Simulator for units that spawned together. Requires NumPy.
+
+    Attributes :
+        * game_state (:obj: GameState): The board every candidate is simulated on. It is not changed.
+        * candidates (list): The candidate deployments
+        * frame (int): The number of the next frame to simulate
+        * result (:obj: BatchResult): The outcome of every candidate so far
+
+    """
+    def __init__(self, game_state, candidates):
+        """Sets up every candidate deployment
+
+        Args:
+            * game_state: The GameState the action phase starts from
+            * candidates: A list of candidate deployments, each a list of (unit_type, location, num)
+
+        """
+        if np is None:
+            raise ImportError("BatchSimulator requires NumPy")
+        self.game_state = game_state
+        self.candidates = candidates
+        self.frame = 0
+        self.result = BatchResult(candidates)
+        game_map = game_state.game_map
+        size = game_map.ARENA_SIZE
+        self.__size = size
+        self.__hit_radius = game_map.hit_radius
+        self.__edge_tiles = [set(x * size + y for x, y in edge) for edge in game_map.get_edges()]
+        self.__base_session = PathingSession(game_state)
+        self.__sessions = {}
+        self.__route_ids = {}
+        self.__routes = []
+        self.__route_length = None
+        self.__setup_structures(game_map)
+        self.__setup_units(candidates)
+
+    def run(self, max_frames=1000):
+        """Simulates frames until every unit of every candidate has finished
+
+        Args:
+            * max_frames: The most frames to simulate, in case some unit can never finish
+
+        Returns:
+            The BatchResult
+
+        """
+        while self.__alive.any() and self.frame < max_frames:
+            self.step()
+        return self.result
+
+    def step(self):
+        """Simulates a single frame of every candidate
+
+        Returns:
+            The BatchResult so far
+
+        """
+        self.result.frames[self.__alive.any(axis=1)] = self.frame + 1
+        self.__shield()
+        self.__move()
+        self.__attack()
+        self.__remove_dead()
+        self.frame += 1
+        return self.result
+
+    def __setup_structures(self, game_map):
+        size = self.__size
+        structures = sorted([unit for unit in game_map.get_all_units() if unit.stationary], key=_creation_order)
+        enemies = [unit for unit in structures if unit.player_index == 1]
+        self.__structure_locations = [[unit.x, unit.y] for unit in enemies]
+        self.__sx = np.array([unit.x for unit in enemies], dtype=np.float64)
+        self.__sy = np.array([unit.y for unit in enemies], dtype=np.float64)
+        self.__s_x_distance = np.abs(game_map.HALF_ARENA - 0.5 - self.__sx)
+        count = len(self.candidates)
+        self.__s_health = np.tile(np.array([unit.health for unit in enemies], dtype=np.float64), (count, 1))
+        self.__s_alive = np.ones((count, len(enemies)), dtype=bool)
+        self.__turrets = [(index, unit.damage_i, (unit.attackRange + self.__hit_radius) ** 2) for index, unit in enumerate(enemies) if unit.damage_i > 0]
+        self.__supports = []
+        for unit in structures:
+            if unit.player_index == 0 and unit.shieldPerUnit > 0 and unit.shieldRange > 0:
+                tiles = np.zeros(size * size, dtype=bool)
+                for x, y in game_map._locations_in_range([unit.x, unit.y], unit.shieldRange):
+                    tiles[x * size + y] = True
+                self.__supports.append((tiles, unit.shieldPerUnit + unit.spec.shieldBonusPerY * unit.y))
+
+    def __setup_units(self, candidates):
+        from .unit import get_unit_specs
+        game_state = self.game_state
+        specs = get_unit_specs(game_state.config)
+        count = len(candidates)
+        units = []
+        for candidate in candidates:
+            candidate_units = []
+            for unit_type, location, num in candidate:
+                x, y = map(int, location)
+                spec = specs[unit_type][0]
+                if spec.stationary or not game_state.game_map.in_arena_bounds([x, y]) or game_state.contains_stationary_unit([x, y]):
+                    game_state.warn("Could not add a {} to the batch at {}.".format(unit_type, location))
+                    continue
+                route_id = self.__get_route_id(x, y, game_state.get_target_edge([x, y]))
+                candidate_units.extend([(spec, route_id)] * num)
+            units.append(candidate_units)
+        width = max([len(candidate_units) for candidate_units in units] + [0])
+        shape = (count, width)
+        self.__alive = np.zeros(shape, dtype=bool)
+        self.__health = np.zeros(shape)
+        self.__period = np.ones(shape, dtype=np.int32)
+        self.__damage_f = np.zeros(shape)
+        self.__range2 = np.zeros(shape)
+        self.__route = np.zeros(shape, dtype=np.int32)
+        self.__position = np.zeros(shape, dtype=np.int32)
+        self.__steps = np.zeros(shape, dtype=np.int32)
+        self.__edge = np.zeros(shape, dtype=np.int32)
+        self.__specs = [[spec for spec, _ in candidate_units] for candidate_units in units]
+        for row, candidate_units in enumerate(units):
+            for column, (spec, route_id) in enumerate(candidate_units):
+                self.__alive[row, column] = spec.speed > 0
+                self.__health[row, column] = spec.max_health
+                self.__period[row, column] = max(1, int(round(1 / spec.speed))) if spec.speed > 0 else 1
+                self.__damage_f[row, column] = spec.damage_f
+                self.__range2[row, column] = (spec.attackRange + self.__hit_radius) ** 2
+                self.__route[row, column] = route_id
+                self.__edge[row, column] = self.__routes[route_id][2]
+        self.__shielded = [np.zeros(shape, dtype=bool) for _ in self.__supports]
+        self.__build_route_table()
+        self.__x, self.__y = self.__locate()
+        self.__previous_x, self.__previous_y = self.__x.copy(), self.__y.copy()
+
+    def __get_route_id(self, x, y, target_edge, session=None, previous=None):
+        """Adds the route a unit at [x, y] would follow, reusing the routes from spawn points on the starting board"""
+        key = (x, y, target_edge)
+        if session is None and key in self.__route_ids:
+            return self.__route_ids[key]
+        if session is None:
+            session = self.__base_session
+        session.add_unit(key, previous or [x, y], target_edge)
+        if previous and previous != [x, y]:
+            session.move_unit(key, [x, y])
+        path = session.get_path(key)
+        session.remove_unit(key)
+        end = path[-1]
+        breaches = end[0] * self.__size + end[1] in self.__edge_tiles[target_edge]
+        self.__routes.append((path, breaches, target_edge))
+        if session is self.__base_session:
+            self.__route_ids[key] = len(self.__routes) - 1
+        return len(self.__routes) - 1
+
+    def __build_route_table(self):
+        """Adds the routes created since the last call to the padded route arrays"""
+        built = len(self.__route_length) if self.__route_length is not None else 0
+        paths = [path for path, _, _ in self.__routes[built:]]
+        if not paths:
+            if not built:
+                self.__route_x = self.__route_y = np.zeros((0, 1))
+                self.__route_length = np.zeros(0, dtype=np.int32)
+                self.__route_breaches = np.zeros(0, dtype=bool)
+            return
+        length = max(len(path) for path in paths)
+        if built and self.__route_x.shape[1] < length:
+            padding = ((0, 0), (0, length - self.__route_x.shape[1]))
+            self.__route_x = np.pad(self.__route_x, padding, mode="edge")
+            self.__route_y = np.pad(self.__route_y, padding, mode="edge")
+        length = max(length, self.__route_x.shape[1]) if built else length
+        route_x = np.empty((len(paths), length))
+        route_y = np.empty((len(paths), length))
+        for index, path in enumerate(paths):
+            route_x[index, :len(path)] = [x for x, _ in path]
+            route_y[index, :len(path)] = [y for _, y in path]
+            route_x[index, len(path):] = path[-1][0]
+            route_y[index, len(path):] = path[-1][1]
+        lengths = np.array([len(path) for path in paths], dtype=np.int32)
+        breaches = np.array([breaches for _, breaches, _ in self.__routes[built:]], dtype=bool)
+        if built:
+            self.__route_x = np.concatenate([self.__route_x, route_x])
+            self.__route_y = np.concatenate([self.__route_y, route_y])
+            self.__route_length = np.concatenate([self.__route_length, lengths])
+            self.__route_breaches = np.concatenate([self.__route_breaches, breaches])
+        else:
+            self.__route_x, self.__route_y, self.__route_length, self.__route_breaches = route_x, route_y, lengths, breaches
+
+    def __locate(self):
+        return self.__route_x[self.__route, self.__position], self.__route_y[self.__route, self.__position]
+
+    def __shield(self):
+        if not self.__supports:
+            return
+        tiles = (self.__x * self.__size + self.__y).astype(np.intp)
+        for (support_tiles, amount), shielded in zip(self.__supports, self.__shielded):
+            new = support_tiles[tiles] & self.__alive & ~shielded
+            self.__health += new * amount
+            shielded |= new
+
+    def __move(self):
+        moving = self.__alive & (self.frame % self.__period == 0)
+        at_end = self.__position == self.__route_length[self.__route] - 1
+        self_destructing = moving & at_end
+        stepping = moving & ~at_end
+        self.__previous_x = np.where(stepping, self.__x, self.__previous_x)
+        self.__previous_y = np.where(stepping, self.__y, self.__previous_y)
+        self.__position += stepping
+        self.__steps += stepping
+        self.__x, self.__y = self.__locate()
+        breaching = stepping & (self.__position == self.__route_length[self.__route] - 1) & self.__route_breaches[self.__route]
+        result = self.result
+        for row, column in zip(*np.nonzero(breaching)):
+            spec = self.__specs[row][column]
+            result.breaches[row] += 1
+            result.player_damage[row] += spec.playerBreachDamage
+            result.sp_gained[row] += spec.metalForBreach
+        self.__alive &= ~breaching
+        for row, column in zip(*np.nonzero(self_destructing)):
+            self.__self_destruct(row, column)
+
+    def __self_destruct(self, row, column):
+        spec = self.__specs[row][column]
+        self.__alive[row, column] = False
+        self.result.units_lost[row] += 1
+        if self.__steps[row, column] < spec.selfDestructStepsRequired or spec.selfDestructDamageTower <= 0:
+            return
+        distance2 = (self.__sx - self.__x[row, column]) ** 2 + (self.__sy - self.__y[row, column]) ** 2
+        hit = (distance2 < (spec.selfDestructRange + self.__hit_radius) ** 2) & (self.__s_health[row] > 0)
+        self.__s_health[row, hit] -= spec.selfDestructDamageTower
+        self.result.damage_dealt[row] += spec.selfDestructDamageTower * hit.sum()
+
+    def __attack(self):
+        x, y = self.__x, self.__y
+        targetable = self.__alive & (self.__health > 0)
+        x_distance = np.abs(self.game_state.HALF_ARENA - 0.5 - x)
+        for index, damage, range2 in self.__turrets:
+            attacking = self.__s_alive[:, index]
+            distance2 = (x - self.__sx[index]) ** 2 + (y - self.__sy[index]) ** 2
+            candidates = targetable & (distance2 < range2) & attacking[:, None]
+            if not candidates.any():
+                continue
+            # Nearest, then lowest health, then highest y for an enemy turret, then furthest from the middle
+            chosen, has_target = _pick(candidates, [distance2, self.__health, -y, -x_distance])
+            columns = chosen.shape[1] - 1 - np.argmax(chosen[:, ::-1], axis=1)
+            rows = np.flatnonzero(has_target)
+            self.__health[rows, columns[rows]] -= damage
+            targetable[rows, columns[rows]] = self.__health[rows, columns[rows]] > 0
+        structure_x_distance = self.__s_x_distance[None, :]
+        for column in range(self.__alive.shape[1]):
+            attacking = self.__alive[:, column] & (self.__damage_f[:, column] > 0)
+            if not attacking.any():
+                continue
+            standing = self.__s_health > 0
+            distance2 = (self.__sx[None, :] - x[:, column, None]) ** 2 + (self.__sy[None, :] - y[:, column, None]) ** 2
+            candidates = standing & (distance2 < self.__range2[:, column, None]) & attacking[:, None]
+            if not candidates.any():
+                continue
+            chosen, has_target = _pick(candidates, [distance2, self.__s_health, np.broadcast_to(self.__sy, distance2.shape), -np.broadcast_to(structure_x_distance, distance2.shape)])
+            columns = np.argmax(chosen, axis=1)
+            rows = np.flatnonzero(has_target)
+            damage = self.__damage_f[rows, column]
+            self.__s_health[rows, columns[rows]] -= damage
+            self.result.damage_dealt[rows] += damage
+
+    def __remove_dead(self):
+        dying = self.__alive & (self.__health <= 0)
+        self.result.units_lost += dying.sum(axis=1).astype(np.int32)
+        self.__alive &= ~dying
+        destroyed = self.__s_alive & (self.__s_health <= 0)
+        if not destroyed.any():
+            return
+        self.__s_alive &= ~destroyed
+        self.result.structures_destroyed += destroyed.sum(axis=1).astype(np.int32)
+        for row in np.flatnonzero(destroyed.any(axis=1)):
+            session = self.__sessions.get(row)
+            if session is None:
+                session = PathingSession(self.game_state)
+                self.__sessions[row] = session
+            for index in np.flatnonzero(destroyed[row]):
+                session.remove_structure(self.__structure_locations[index])
+            # Units that arrived at the same tile from the same direction share their new route
+            route_ids = {}
+            for column in np.flatnonzero(self.__alive[row]):
+                key = (int(self.__x[row, column]), int(self.__y[row, column]), int(self.__previous_x[row, column]), int(self.__previous_y[row, column]), int(self.__edge[row, column]))
+                if key not in route_ids:
+                    route_ids[key] = self.__get_route_id(key[0], key[1], key[4], session, [key[2], key[3]])
+                self.__route[row, column] = route_ids[key]
+                self.__position[row, column] = 0
+        self.__build_route_table()
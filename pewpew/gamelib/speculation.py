@@ -0,0 +1,125 @@
+import threading
+import traceback
+
+from .game_state import UPGRADE_INDEX
+from .util import debug_write
+
+
+def board_key(config, state):
+    """A key for the structures in a turn or action frame state, decoded from json.
+    Two states get the same key when they have the same structures, owners and upgrades in the same places.
+
+    Args:
+        * config: The game config
+        * state: The state dict of a turn or an action frame
+
+    Returns:
+        A frozenset that can be compared between states
+
+    """
+    type_indexes = [index for index, unit_information in enumerate(config["unitInformation"])
+                    if unit_information.get("unitCategory") == 0]
+    type_indexes.append(UPGRADE_INDEX)
+    key = []
+    for player_index, player_units in enumerate([state["p1Units"], state["p2Units"]]):
+        for type_index in type_indexes:
+            if type_index < len(player_units):
+                key.extend((player_index, type_index, unit[0], unit[1]) for unit in player_units[type_index])
+    return frozenset(key)
+
+
+class Speculation:
+    """Work started on a background thread during the action phase, for the turn that follows it
+
+    AlgoCore starts one whenever the structures on the board change during an action phase, as long as the
+    strategy overrides on_speculate. When the next turn arrives it is kept if the turn starts with the same
+    structures, and cancelled otherwise. The work itself runs in the strategy's on_speculate, which should
+    check cancelled() between steps since a thread cannot be stopped from outside.
+
+    Example:
+        def on_speculate(self, game_state, speculation):
+            paths = {}
+            for location in self.enemy_spawns:
+                if speculation.cancelled():
+                    break
+                paths[tuple(location)] = game_state.find_path_to_edge(location)
+            return paths
+
+        def on_turn(self, turn_state):
+            paths = self.speculation.result() if self.speculation else None
+
+    Attributes :
+        * game_state (:obj: GameState): The board the work started from, decoded from an action frame
+        * key (frozenset): The board_key of that action frame
+        * error (str): The traceback if the work raised an exception, otherwise None
+
+    """
+    def __init__(self, function, game_state, key):
+        """Starts function(game_state, speculation) on a daemon thread
+
+        Args:
+            * function: The work to run
+            * game_state: The board to run it on, which the work is free to change
+            * key: The board_key of the state game_state was decoded from
+
+        """
+        self.game_state = game_state
+        self.key = key
+        self.error = None
+        self.__result = None
+        self.__cancelled = threading.Event()
+        self.__done = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, args=(function,), daemon=True)
+        self.__thread.start()
+
+    def __run(self, function):
+        try:
+            self.__result = function(self.game_state, self)
+        except Exception:
+            self.error = traceback.format_exc()
+            debug_write("Speculative work failed:\n{}".format(self.error))
+        finally:
+            self.__done.set()
+
+    def cancel(self):
+        """Asks the work to stop and drops its result"""
+        self.__cancelled.set()
+
+    def cancelled(self):
+        """True once the work has been cancelled"""
+        return self.__cancelled.is_set()
+
+    def done(self):
+        """True once the work has returned or failed"""
+        return self.__done.is_set()
+
+    def reconcile(self, config, state):
+        """Cancels the work unless the given state has the same structures as the board it started from
+
+        Args:
+            * config: The game config
+            * state: The state dict of the turn that arrived
+
+        Returns:
+            True if the work still applies
+
+        """
+        if self.key != board_key(config, state):
+            self.cancel()
+        return not self.cancelled()
+
+    def result(self, timeout=0):
+        """The value returned by the work
+
+        Args:
+            * timeout: The longest time in seconds to wait for unfinished work
+
+        Returns:
+            The value, or None if the work was cancelled, failed or has not finished
+
+        """
+        if timeout > 0:
+            self.__done.wait(timeout)
+        if self.cancelled() or not self.done():
+            return None
+        return self.__result
@@ -1,3 +1,6 @@
+from collections import namedtuple
+from operator import attrgetter
+
 def is_stationary(unit_type, structure_types):
     """
         Args:
@@ -9,6 +12,73 @@ def is_stationary(unit_type, structure_types):
     return unit_type in structure_types
 
 
+# UnitSpec fields read straight from the config, with the config key and default of each
+_SPEC_KEYS = [
+    ("speed", "speed", 0),
+    ("damage_f", "attackDamageTower", 0),
+    ("damage_i", "attackDamageWalker", 0),
+    ("attackRange", "attackRange", 0),
+    ("shieldRange", "shieldRange", 0),
+    ("max_health", "startHealth", 0),
+    ("shieldPerUnit", "shieldPerUnit", 0),
+    ("shieldBonusPerY", "shieldBonusPerY", 0),
+    ("selfDestructDamageWalker", "selfDestructDamageWalker", 0),
+    ("selfDestructDamageTower", "selfDestructDamageTower", 0),
+    ("selfDestructRange", "selfDestructRange", 0),
+    ("selfDestructStepsRequired", "selfDestructStepsRequired", 0),
+    ("playerBreachDamage", "playerBreachDamage", 0),
+    ("metalForBreach", "metalForBreach", 0),
+]
+
+class UnitSpec(namedtuple("UnitSpec", ["unit_type", "upgraded", "stationary"] + [field for field, _, _ in _SPEC_KEYS] + ["cost"])):
+    """The fixed stats of a unit type, either before or after upgrading. Shared by every unit of that type.
+
+    The fields match the GameUnit attributes of the same name, except cost which is a tuple. The shield bonus,
+    self destruct and breach fields are named after their config keys.
+    """
+    __slots__ = ()
+
+_UNIT_SPECS = {}
+
+def _upgrade_spec(spec, type_config):
+    """The UnitSpec a unit with the given stats has after upgrading, keeping any stat the upgrade does not set"""
+    upgrade_config = type_config.get("upgrade") or {}
+    return spec._replace(upgraded=True, cost=(upgrade_config.get("cost1", 0) + spec.cost[0], upgrade_config.get("cost2", 0) + spec.cost[1]),
+                         **{field: upgrade_config.get(key, getattr(spec, field)) for field, key, _ in _SPEC_KEYS})
+
+def _spec_property(field):
+    """A GameUnit stat read from its spec. Setting it gives that unit its own copy of the spec."""
+    def set(self, value):
+        self.spec = self.spec._replace(**{field: value})
+    return property(attrgetter("spec." + field), set)
+
+def get_unit_specs(config):
+    """Gets the UnitSpec table of a config, compiling it the first time the config is seen
+
+    Args:
+        config: The game config
+
+    Returns:
+        A dict from unit type to a (base, upgraded) pair of UnitSpecs
+
+    """
+    entry = _UNIT_SPECS.get(id(config))
+    if entry is not None and entry[0] is config:
+        return entry[1]
+    specs = {}
+    for type_config in config["unitInformation"]:
+        if "shorthand" not in type_config or "unitCategory" not in type_config:
+            continue
+        base = UnitSpec(type_config["shorthand"], False, type_config["unitCategory"] == 0,
+                        *[type_config.get(key, default) for _, key, default in _SPEC_KEYS],
+                        cost=(type_config.get("cost1", 0), type_config.get("cost2", 0)))
+        specs[base.unit_type] = (base, _upgrade_spec(base, type_config))
+    if len(_UNIT_SPECS) >= 8:
+        _UNIT_SPECS.clear()
+    _UNIT_SPECS[id(config)] = (config, specs)
+    return specs
+
+
 class GameUnit:
     """Holds information about a Unit. 
 
@@ -18,6 +88,8 @@ class GameUnit:
         * player_index (integer): The player that controls this unit. 0 for you, 1 for your opponent.
         * x (integer): The x coordinate of the unit
         * y (integer): The y coordinate of the unit
+        * spec (:obj: UnitSpec): The shared stats of this unit's type, which the attributes below are read from.
+          Setting one of those attributes gives the unit its own copy of the spec with the new value.
         * stationary (bool): Whether or not this unit is a structures
         * speed (float): A unit will move once every 1/speed frames
         * damage_f (int): The amount of damage this mobile unit will deal to enemy structures.
@@ -30,9 +102,13 @@ class GameUnit:
         * shieldPerUnit (float): how much shield is given per unit
         * pending_removal (boolean): If this unit is marked for removal by its owner
         * upgraded (boolean): If this unit is upgraded
+        * unit_id (string): The id the engine gave this unit, None for units created by the algo
 
     """
-    def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1):
+    # __dict__ lets strategies keep their own attributes on a unit, and is only allocated for units that get one
+    __slots__ = ("unit_type", "config", "player_index", "pending_removal", "upgraded", "x", "y", "spec", "health", "unit_id", "__dict__")
+
+    def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1, unit_id=None):
         """ Initialize unit variables using args passed
 
         """
@@ -43,37 +119,39 @@ class GameUnit:
         self.upgraded = False
         self.x = x
         self.y = y
-        self.__serialize_type()
-        self.health = self.max_health if not health else health
-
-    def __serialize_type(self):
-        from .game_state import STRUCTURE_TYPES, UNIT_TYPE_TO_INDEX, SUPPORT
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        self.stationary = type_config["unitCategory"] == 0
-        self.speed = type_config.get("speed", 0)
-        self.damage_f = type_config.get("attackDamageTower", 0)
-        self.damage_i = type_config.get("attackDamageWalker", 0)
-        self.attackRange = type_config.get("attackRange", 0)
-        self.shieldRange = type_config.get("shieldRange", 0)
-        self.max_health = type_config.get("startHealth", 0)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
-        self.cost = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
+        self.unit_id = unit_id
+        entry = _UNIT_SPECS.get(id(config))
+        specs = entry[1] if entry is not None and entry[0] is config else get_unit_specs(config)
+        self.spec = specs[unit_type][0]
+        self.health = self.spec.max_health if not health else health
+
+    stationary = _spec_property("stationary")
+    speed = _spec_property("speed")
+    damage_f = _spec_property("damage_f")
+    damage_i = _spec_property("damage_i")
+    attackRange = _spec_property("attackRange")
+    shieldRange = _spec_property("shieldRange")
+    max_health = _spec_property("max_health")
+    shieldPerUnit = _spec_property("shieldPerUnit")
 
+    @property
+    def cost(self):
+        return list(self.spec.cost)
+
+    @cost.setter
+    def cost(self, value):
+        self.spec = self.spec._replace(cost=tuple(value))
 
     def upgrade(self):
-        from .game_state import UNIT_TYPE_TO_INDEX
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]].get("upgrade", {})
-        self.speed = type_config.get("speed", self.speed)
-        self.damage_f = type_config.get("attackDamageTower", self.damage_f)
-        self.damage_i = type_config.get("attackDamageWalker", self.damage_i)
-        self.attackRange = type_config.get("attackRange", self.attackRange)
-        self.shieldRange = type_config.get("shieldRange", self.shieldRange)
-        self.max_health = type_config.get("startHealth", self.max_health)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", self.shieldPerUnit)
-        self.cost = [type_config.get("cost1", 0) + self.cost[0], type_config.get("cost2", 0) + self.cost[1]]
+        base, upgraded = get_unit_specs(self.config)[self.unit_type]
+        if self.spec is base:
+            self.spec = upgraded
+        else:
+            # The unit has stats of its own, so upgrade those
+            type_config = next(type_config for type_config in self.config["unitInformation"] if type_config.get("shorthand") == self.unit_type)
+            self.spec = _upgrade_spec(self.spec, type_config)
         self.upgraded = True
 
-
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
         removal = ", pending removal" if self.pending_removal else ""
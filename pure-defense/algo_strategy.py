@@ -13,7 +13,9 @@ modules yourself. Start by modifying the 'on_turn' function.
 
 Advanced strategy tips: 
 
-  - You can analyze action frames by modifying on_action_frame function
+  - You can react to action frame events by subscribing a handler with
+  AlgoCore.subscribe_frame_events, like on_breach below. Overriding
+  on_action_frame instead gives you every frame as a decoded dict.
 
   - The GameState.map object can be manually manipulated to create hypothetical 
   board states. Though, we recommended making a copy of the map to preserve 
@@ -44,6 +46,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         SP = 0
         # This is a good place to do initial setup
         self.scored_on_locations = []
+        self.subscribe_frame_events("breach", self.on_breach)
 
     def on_turn(self, turn_state):
         """
@@ -106,8 +109,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         shortFinder = gamelib.ShortestPathFinder()
         shortFinder.initialize_map(game_state.game_map)
 
-        for i in range(len(enemy_starting)):
-            path = shortFinder.navigate_multiple_endpoints(enemy_starting[i], our_starting, game_state)
+        for path in shortFinder.navigate_multiple_starts(enemy_starting, our_starting, game_state):
 
             if not path:
                 continue
@@ -225,7 +227,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         """
         This function builds reactive defenses based on where the enemy scored on us from.
         We can track where the opponent scored by looking at events in action frames 
-        as shown in the on_action_frame function
+        as shown in the on_breach function
         """
         for location in self.scored_on_locations:
             # Build turret one space above so that it doesn't block our own edge spawn locations
@@ -284,13 +286,14 @@ class AlgoStrategy(gamelib.AlgoCore):
         estimate the path's damage risk.
         """
         damages = []
-        # Get the damage estimate each path will take
-        for location in location_options:
-            path = game_state.find_path_to_edge(location)
+        threat_map = game_state.get_threat_map()
+        turret_damage = gamelib.GameUnit(TURRET, game_state.config).damage_i
+        # Get the damage estimate each path will take, pathing all of the options at once
+        for path in game_state.find_paths_to_edges(location_options):
             damage = 0
             for path_location in path:
                 # Get number of enemy turrets that can attack each location and multiply by turret damage
-                damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(TURRET, game_state.config).damage_i
+                damage += threat_map.get_attacker_count(path_location, 0) * turret_damage
             damages.append(damage)
         
         # Now just return the location that takes the least damage
@@ -312,17 +315,13 @@ class AlgoStrategy(gamelib.AlgoCore):
                 filtered.append(location)
         return filtered
 
-    def on_action_frame(self, turn_string):
+    def on_breach(self, breaches, turn_info):
         """
-        This is the action frame of the game. This function could be called 
-        hundreds of times per turn and could slow the algo down so avoid putting slow code here.
-        Processing the action frames is complicated so we only suggest it if you have time and experience.
+        This is called for every action frame in which a unit scores, with the breach events of that frame.
+        It is subscribed to in on_game_start, so frames without breaches are never decoded.
         Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
         """
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
-        events = state["events"]
-        breaches = events["breach"]
         for breach in breaches:
             location = breach[0]
             unit_owner_self = True if breach[4] == 1 else False
@@ -13,9 +13,27 @@ Investigating it is useful for any player that wants to access information about
 The AlgoCore class in algocore.py handles communication with the game engine, and forms the bones of an algo. AlgoStrategy inherits from it. 
 Investigating it is useful for advanced players interested in getting data from the action phase or communicating directly with the game engine. \n
 
+The BuildPlanner class in build_planner.py chooses which wanted structures and upgrades to build with the SP available, and adds them in one batch. 
+Investigating it is useful for players who want to weigh their defensive builds instead of walking a fixed list. \n
+
+The LiveBoard class in live_board.py keeps the structures on the board across turns by applying action frame events. 
+Investigating it is useful for players who want threat maps and cached paths to carry over from one turn to the next. \n
+
 The Navigation class in navigation.py contains functions related to pathfinding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
+The PlacementEvaluator class in placement.py scores many hypothetical structure placements by the enemy paths they produce. 
+Investigating it is useful for players who want to search over defensive layouts instead of hard coding them. \n
+
+The Speculation class in speculation.py runs the on_speculate hook of AlgoCore on a background thread during the action phase. 
+Investigating it is useful for players who want to move work off the time between receiving a turn and submitting it. \n
+
+The TurnBudget class in turn_budget.py tracks the time left in a turn, and AnytimeSearch keeps the best plan found before it runs out. 
+Investigating it is useful for players who want to search for as long as the turn allows without missing a submit. \n
+
+The WorkerPool class in worker_pool.py keeps worker processes alive for the whole game and spreads work over them each turn. 
+Investigating it is useful for players who want to use every core for pathing, placement scoring or simulation. \n
+
 util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
 """
 
@@ -24,7 +42,12 @@ from .util import debug_write
 from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
+from .build_planner import BuildPlanner
+from .live_board import LiveBoard
+from .placement import PlacementEvaluator
+from .turn_budget import TurnBudget, AnytimeSearch
+from .worker_pool import WorkerPool
 from .navigation import ShortestPathFinder
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["algocore", "build_planner", "game_state", "game_map", "live_board", "navigation", "placement", "replay", "simulator", "speculation", "threat_map", "turn_budget", "unit", "unit_store", "util", "worker_pool"]
  
\ No newline at end of file
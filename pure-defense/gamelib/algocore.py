@@ -1,7 +1,11 @@
 import json
 
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .speculation import Speculation, board_key
+from .turn_budget import TurnBudget
+from .unit import get_unit_specs
+from .worker_pool import WorkerPool
+from .util import get_command, debug_write, BANNER_TEXT, send_command, decode_events, peek_turn_info
 
 class AlgoCore(object):
     """
@@ -10,10 +14,19 @@ class AlgoCore(object):
 
     Attributes :
         * config (JSON): json object containing information about the game
+        * turn_budget (:obj: TurnBudget): The time left to submit the current turn. Its clock starts when the turn message arrives.
+        * worker_processes (int): Set this in your __init__ to start that many worker processes with the config, 0 for none
+        * worker_pool (:obj: WorkerPool): The worker processes, started before on_game_start if worker_processes is set
+        * speculation (:obj: Speculation): The work on_speculate started during the last action phase, while it still applies
 
     """
     def __init__(self):
         self.config = None
+        self.turn_budget = TurnBudget()
+        self.worker_processes = 0
+        self.worker_pool = None
+        self.speculation = None
+        self.__frame_handlers = {}
 
     def on_game_start(self, config):
         """
@@ -26,7 +39,7 @@ class AlgoCore(object):
     def on_turn(self, game_state):
         """
         This step function is called at the start of each turn.
-        It is passed the current game state, which can be used to initiate a new GameState object. 
+        It is passed the current game state, already decoded from json, which can be used to initiate a new GameState object. 
         By default, it sends empty commands to the game engine. \n
         algo_strategy.py inherits from AlgoCore and overrides this on turn function. 
         Adjusting the on_turn function in algo_strategy is the main way to adjust your algo's logic. 
@@ -38,11 +51,60 @@ class AlgoCore(object):
         """
         After each deploy phase, the game engine will run the action phase of the round.
         The action phase is made up of a sequence of distinct frames. 
-        Each of these frames is sent to the algo in order. 
+        Each of these frames is sent to the algo in order, already decoded from json. 
         They can be handled in this function. 
+        Decoding every frame is slow, so if you only need some of the events use subscribe_frame_events instead.
         """
         pass
 
+    def subscribe_frame_events(self, event_type, handler):
+        """
+        Calls handler(events, turn_info) for every action frame in which events of the given type happen,
+        such as "breach", "death", "damage" or "spawn". events is the list of those events in the frame and turn_info
+        is the frame's turnInfo. Only those events are decoded, and frames without them are skipped from the raw text,
+        which is much faster than decoding whole frames in on_action_frame.
+        """
+        self.__frame_handlers.setdefault(event_type, []).append(handler)
+
+    def __handle_action_frame(self, config, message, turn_info):
+        """Passes an action frame to the event handlers, on_action_frame and on_speculate, decoding only what they need"""
+        if self.__frame_handlers:
+            for event_type, events in decode_events(message, self.__frame_handlers).items():
+                for handler in self.__frame_handlers[event_type]:
+                    handler(events, turn_info)
+        handles_frames = type(self).on_action_frame is not AlgoCore.on_action_frame
+        # Structures only change on the first frame, when they are placed, and on frames where units die
+        speculates = type(self).on_speculate is not AlgoCore.on_speculate and (
+            turn_info[2] == 0 or decode_events(message, ["death"]))
+        if not handles_frames and not speculates:
+            return
+        state = json.loads(message)
+        if handles_frames:
+            self.on_action_frame(state)
+        if speculates:
+            self.__speculate(config, state)
+
+    def on_speculate(self, game_state, speculation):
+        """
+        Override this to do work for the next turn while the action phase plays out, such as finding enemy paths,
+        building a threat map or scoring placements. It runs on a background thread with the board of the latest
+        action frame whenever the structures on it change. Check speculation.cancelled() between steps and return
+        early if it is set. \n
+        When the next turn starts with the same structures, on_turn can read the returned value with
+        self.speculation.result(). Otherwise the work is cancelled and self.speculation is None.
+        """
+        return None
+
+    def __speculate(self, config, state):
+        """Starts on_speculate on the board of an action frame, unless the running work already has the same structures"""
+        key = board_key(config, state)
+        if self.speculation is not None:
+            if self.speculation.key == key and not self.speculation.cancelled():
+                return
+            self.speculation.cancel()
+        game_state = GameState(config, state)
+        game_state.suppress_warnings(True)
+        self.speculation = Speculation(self.on_speculate, game_state, key)
 
     def start(self):
         """ 
@@ -52,31 +114,53 @@ class AlgoCore(object):
         The algo continues this loop until it recieves the "End" turn message from the game.
         """
         debug_write(BANNER_TEXT)
+        try:
+            self.__read_messages()
+        finally:
+            # Also runs when get_command exits because the engine closed stdin
+            if self.speculation is not None:
+                self.speculation.cancel()
+            if self.worker_pool is not None:
+                self.worker_pool.close()
 
+    def __read_messages(self):
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
             game_state_string = get_command()
+            received = self.turn_budget.clock()
             if "replaySave" in game_state_string:
                 """
                 This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
                 """
                 parsed_config = json.loads(game_state_string)
+                get_unit_specs(parsed_config)
+                self.turn_budget = TurnBudget.from_config(parsed_config, self.turn_budget.safety_margin)
+                if self.worker_processes and self.worker_pool is None:
+                    self.worker_pool = WorkerPool(parsed_config, self.worker_processes)
                 self.on_game_start(parsed_config)
             elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
+                turn_info = peek_turn_info(game_state_string)
+                stateType = int(turn_info[0])
                 if stateType == 0:
                     """
                     This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
                     deploy phase. Printing is handled by the provided functions.
                     """
-                    self.on_turn(game_state_string)
+                    self.turn_budget.start(received)
+                    state = json.loads(game_state_string)
+                    if self.speculation is not None and not self.speculation.reconcile(parsed_config, state):
+                        self.speculation = None
+                    self.on_turn(state)
+                    if self.speculation is not None:
+                        # Whatever on_turn did not use is stale once the turn is submitted
+                        self.speculation.cancel()
+                        self.speculation = None
                 elif stateType == 1:
                     """
                     If stateType == 1, this game_state_string string represents a single frame of an action phase
                     """
-                    self.on_action_frame(game_state_string)
+                    self.__handle_action_frame(parsed_config, game_state_string, turn_info)
                 elif stateType == 2:
                     """
                     This is the end game message. This means the game is over so break and finish the program.
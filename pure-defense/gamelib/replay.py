@@ -0,0 +1,219 @@
+import glob
+import json
+import os
+import sys
+import time
+
+from .game_state import UPGRADE_INDEX, GameState
+from .simulator import Simulator
+
+
+def load_replay(path):
+    """Reads a replay file saved by the engine
+
+    Args:
+        * path: The path of a .replay file
+
+    Returns:
+        The config and the list of frames, each frame decoded from one line of json
+
+    """
+    with open(path) as replay:
+        lines = [json.loads(line) for line in replay if line.strip()]
+    return lines[0], lines[1:]
+
+
+def get_action_phases(frames):
+    """Splits the frames of a replay into action phases
+
+    Args:
+        * frames: The frames of a replay, as returned by load_replay
+
+    Returns:
+        A list of (start_frame, action_frames) pairs, where start_frame is the state at the start of the turn
+        and action_frames are the recorded frames of that turn's action phase in order
+
+    """
+    phases = []
+    start_frame = None
+    for frame in frames:
+        phase, turn, frame_number = frame["turnInfo"][:3]
+        if phase == 0:
+            start_frame = frame
+        elif phase == 1 and start_frame is not None and start_frame["turnInfo"][1] == turn:
+            if frame_number == 0:
+                phases.append((start_frame, []))
+            if phases and phases[-1][0] is start_frame:
+                phases[-1][1].append(frame)
+    return phases
+
+
+def build_action_phase_state(config, start_frame, first_action_frame):
+    """Rebuilds the board the action phase of a turn starts from
+
+    The units of the turn start state get every unit spawned, upgraded or removed in the first action frame,
+    with the id the engine gave it. Like the engine, an upgraded structure takes the id of its upgrade and the
+    upgraded starting health.
+
+    Args:
+        * config: The config of the replay
+        * start_frame: The frame at the start of the turn
+        * first_action_frame: Frame 0 of the turn's action phase
+
+    Returns:
+        A state dict that can be passed to GameState
+
+    """
+    state = json.loads(json.dumps(start_frame))
+    for (x, y), type_index, unit_id, player in first_action_frame["events"]["spawn"]:
+        units = state["p1Units" if player == 1 else "p2Units"]
+        while len(units) <= type_index:
+            units.append([])
+        if type_index == UPGRADE_INDEX:
+            for type_units, unit_information in zip(units, config["unitInformation"]):
+                for unit in type_units:
+                    if unit[:2] == [x, y] and unit_information.get("unitCategory") == 0:
+                        unit[2] = unit_information.get("upgrade", {}).get("startHealth", unit_information.get("startHealth", 0))
+                        unit[3] = unit_id
+            health = 0.0
+        else:
+            health = config["unitInformation"][type_index].get("startHealth", 0)
+        units[type_index].append([x, y, health, unit_id])
+    return state
+
+
+def get_frame_units(config, frame):
+    """The units recorded in a frame
+
+    Returns:
+        A dict from unit id to (x, y, health, player_index) for every unit except removals and upgrades
+
+    """
+    units = {}
+    for player_index, key in enumerate(["p1Units", "p2Units"]):
+        for type_index, type_units in enumerate(frame[key]):
+            if "unitCategory" not in config["unitInformation"][type_index]:
+                continue
+            for x, y, health, unit_id in type_units:
+                units[unit_id] = (x, y, round(health, 3), player_index)
+    return units
+
+
+def get_simulated_units(simulator):
+    """The units on the board of a Simulator, in the same form as get_frame_units"""
+    units = {}
+    for unit in simulator.game_state.game_map.get_all_units():
+        units[unit.unit_id] = (unit.x, unit.y, round(unit.health, 3), unit.player_index)
+    return units
+
+
+def diff_units(expected, actual):
+    """Describes the differences between two dicts returned by get_frame_units
+
+    Returns:
+        A list of strings, empty if the units match
+
+    """
+    differences = []
+    for unit_id in sorted(set(expected) | set(actual), key=str):
+        if unit_id not in actual:
+            differences.append("unit {} missing, expected at {} with {} health".format(unit_id, list(expected[unit_id][:2]), expected[unit_id][2]))
+        elif unit_id not in expected:
+            differences.append("unit {} should be gone, found at {} with {} health".format(unit_id, list(actual[unit_id][:2]), actual[unit_id][2]))
+        elif expected[unit_id] != actual[unit_id]:
+            differences.append("unit {} expected at {} with {} health, found at {} with {} health".format(
+                unit_id, list(expected[unit_id][:2]), expected[unit_id][2], list(actual[unit_id][:2]), actual[unit_id][2]))
+    return differences
+
+
+class ReplayReport:
+    """How closely the Simulator reproduced the action phases of one replay
+
+    Attributes :
+        * path (str): The replay file
+        * phases (int): The number of action phases with mobile units that were simulated
+        * frames (int): The number of frames simulated
+        * seconds (float): The time spent building and simulating the action phases
+        * divergences (list): A (turn, frame, differences) tuple for each action phase that diverged, where frame
+          is the first frame that did not match and differences is a list of strings describing it
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self.phases = 0
+        self.frames = 0
+        self.seconds = 0.0
+        self.divergences = []
+
+    def frames_per_second(self):
+        """The simulation throughput over this replay"""
+        return self.frames / self.seconds if self.seconds > 0 else 0.0
+
+    def __repr__(self):
+        return "{}: {} action phases, {} frames, {} diverged, {:.0f} frames/s".format(
+            os.path.basename(self.path), self.phases, self.frames, len(self.divergences), self.frames_per_second())
+
+
+def check_replay(path):
+    """Simulates every action phase of a replay that has mobile units and compares each frame with the recording.
+    Positions, health and breaches are compared every frame. A phase stops at its first divergence.
+
+    Args:
+        * path: The path of a .replay file
+
+    Returns:
+        A ReplayReport
+
+    """
+    config, frames = load_replay(path)
+    report = ReplayReport(path)
+    for start_frame, action_frames in get_action_phases(frames):
+        spawns = action_frames[0]["events"]["spawn"]
+        if not any(config["unitInformation"][type_index].get("unitCategory") == 1 for _, type_index, _, _ in spawns):
+            continue
+        report.phases += 1
+        started = time.perf_counter()
+        game_state = GameState(config, build_action_phase_state(config, start_frame, action_frames[0]))
+        game_state.suppress_warnings(True)
+        simulator = Simulator(game_state)
+        turn = start_frame["turnInfo"][1]
+        for frame_number, frame in enumerate(action_frames):
+            breaches = list(simulator.result.breaches)
+            simulator.step()
+            report.frames += 1
+            differences = diff_units(get_frame_units(config, frame), get_simulated_units(simulator))
+            recorded_breaches = [0, 0]
+            for event in frame["events"]["breach"]:
+                recorded_breaches[event[-1] - 1] += 1
+            simulated_breaches = [simulator.result.breaches[index] - breaches[index] for index in range(2)]
+            if recorded_breaches != simulated_breaches:
+                differences.append("expected {} breaches, simulated {}".format(recorded_breaches, simulated_breaches))
+            if differences:
+                report.divergences.append((turn, frame_number, differences))
+                break
+        report.seconds += time.perf_counter() - started
+    return report
+
+
+def main(args):
+    """Checks every replay given on the command line, or in the given directories, and prints a report
+
+    Example:
+        python -m gamelib.replay ../replays
+
+    """
+    paths = []
+    for arg in args:
+        paths.extend(sorted(glob.glob(os.path.join(arg, "*.replay"))) if os.path.isdir(arg) else [arg])
+    diverged = 0
+    for path in paths:
+        report = check_replay(path)
+        print(report)
+        for turn, frame_number, differences in report.divergences:
+            print("    turn {} frame {}: {}".format(turn, frame_number, "; ".join(differences[:3])))
+        diverged += len(report.divergences)
+    return 1 if diverged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
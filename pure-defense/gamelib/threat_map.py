@@ -0,0 +1,136 @@
+class ThreatMap:
+    """Holds the damage per frame that structures deal at every tile of the board
+
+    Values are stored for each defending player, so threat_map.get_damage(location, 0) is the damage
+    a unit of yours would take at location each frame, matching game_state.get_attackers(location, 0).
+    Only structures are counted, mobile units on the map are ignored.
+
+    Attributes :
+        * game_map (:obj: GameMap): The map the threats are read from
+        * structure_hash (int): The structure_hash of game_map when the threat map was last brought up to date
+        * mobile_damage (list): mobile_damage[player_index][x * ARENA_SIZE + y] is the damage per frame a mobile unit of that player takes at [x, y]
+        * structure_damage (list): The same as mobile_damage, for a structure of that player
+        * attacker_counts (list): The same as mobile_damage, for the number of structures that can attack a mobile unit of that player
+
+    """
+    def __init__(self, game_map):
+        """Computes the threat of every structure on a map
+
+        Args:
+            * game_map: The GameMap to read structures from
+
+        """
+        self.game_map = game_map
+        self.rebuild()
+
+    def rebuild(self):
+        """Recomputes every tile from the structures currently on the map"""
+        size = self.game_map.ARENA_SIZE
+        self.mobile_damage = [[0] * (size * size), [0] * (size * size)]
+        self.structure_damage = [[0] * (size * size), [0] * (size * size)]
+        self.attacker_counts = [[0] * (size * size), [0] * (size * size)]
+        self.__sources = {}
+        for location in self.game_map.get_mask_locations(self.game_map.get_structure_mask()):
+            self.__add_source(location)
+        self.structure_hash = self.game_map.structure_hash
+
+    def copy(self, game_map):
+        """Copies the threat map for a copy of its game_map
+
+        Args:
+            * game_map: The GameMap the copy reads from, normally the result of game_map.copy()
+
+        Returns:
+            A new ThreatMap with the same values
+
+        """
+        other = ThreatMap.__new__(ThreatMap)
+        other.game_map = game_map
+        other.mobile_damage = [list(values) for values in self.mobile_damage]
+        other.structure_damage = [list(values) for values in self.structure_damage]
+        other.attacker_counts = [list(values) for values in self.attacker_counts]
+        other.__sources = dict(self.__sources)
+        other.structure_hash = self.structure_hash
+        return other
+
+    def update_location(self, location):
+        """Re-reads the structure at a location after it was spawned, upgraded or removed
+
+        Args:
+            * location: The location whose structure changed
+
+        """
+        x, y = location
+        source = self.__sources.pop(int(x) * self.game_map.ARENA_SIZE + int(y), None)
+        if source is not None:
+            self.__apply(source, -1)
+        self.__add_source(location)
+        self.structure_hash = self.game_map.structure_hash
+
+    def get_damage(self, location, player_index):
+        """The damage per frame a mobile unit of a player would take at a location
+
+        Args:
+            * location: The location of a hypothetical unit
+            * player_index: The player controlling the unit, 0 for you 1 for the enemy
+
+        Returns:
+            The summed damage of every enemy structure in range
+
+        """
+        return self.__lookup(self.mobile_damage, location, player_index)
+
+    def get_structure_damage(self, location, player_index):
+        """The damage per frame a structure of a player would take at a location"""
+        return self.__lookup(self.structure_damage, location, player_index)
+
+    def get_attacker_count(self, location, player_index):
+        """The number of enemy structures that can attack a mobile unit of a player at a location"""
+        return self.__lookup(self.attacker_counts, location, player_index)
+
+    def get_path_damage(self, path, player_index):
+        """The damage per frame a mobile unit would take, summed over every tile of a path
+
+        Args:
+            * path: A list of locations, such as one returned by game_state.find_path_to_edge
+            * player_index: The player controlling the unit, 0 for you 1 for the enemy
+
+        Returns:
+            The summed damage, 0 for a missing path
+
+        """
+        if not path:
+            return 0
+        damage = 0
+        for location in path:
+            damage += self.__lookup(self.mobile_damage, location, player_index)
+        return damage
+
+    def __lookup(self, values, location, player_index):
+        x, y = location
+        size = self.game_map.ARENA_SIZE
+        if not (0 <= x < size and 0 <= y < size):
+            return 0
+        return values[player_index][int(x) * size + int(y)]
+
+    def __add_source(self, location):
+        for unit in self.game_map[location]:
+            if unit.stationary and unit.damage_i + unit.damage_f > 0:
+                tiles = []
+                for target in self.game_map._locations_in_range(location, unit.attackRange):
+                    if self.game_map.distance_between_locations(location, target) <= unit.attackRange:
+                        tiles.append(target[0] * self.game_map.ARENA_SIZE + target[1])
+                source = (1 - unit.player_index, unit.damage_i, unit.damage_f, tiles)
+                self.__sources[int(location[0]) * self.game_map.ARENA_SIZE + int(location[1])] = source
+                self.__apply(source, 1)
+                return
+
+    def __apply(self, source, sign):
+        player_index, damage_i, damage_f, tiles = source
+        mobile_damage = self.mobile_damage[player_index]
+        structure_damage = self.structure_damage[player_index]
+        attacker_counts = self.attacker_counts[player_index]
+        for tile in tiles:
+            mobile_damage[tile] += sign * damage_i
+            structure_damage[tile] += sign * damage_f
+            attacker_counts[tile] += sign
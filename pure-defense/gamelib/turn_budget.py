@@ -0,0 +1,130 @@
+import time
+
+
+class TurnBudget:
+    """Tracks the time left before the current turn must be submitted
+
+    AlgoCore keeps one as self.turn_budget and starts its clock the moment a turn message arrives, so
+    strategy code can keep improving a plan until the budget runs out and still submit in time.
+    remaining() already leaves out the safety margin, which covers submitting the turn and timing noise.
+
+    Example:
+        search = gamelib.AnytimeSearch(self.turn_budget)
+        for depth in search.iterations():
+            plan, score = plan_attack(game_state, depth)
+            search.offer(plan, score)
+        game_state.attempt_spawn(*search.best_plan)
+
+    Attributes :
+        * seconds (float): The time allowed for a turn
+        * safety_margin (float): The time kept back at the end of the turn
+        * started (float): The clock reading when the turn started, None before the first turn
+
+    """
+    def __init__(self, seconds=5.0, safety_margin=0.5, clock=time.monotonic):
+        """Sets up a budget, which starts counting at start()
+
+        Args:
+            * seconds: The time allowed for a turn
+            * safety_margin: The time to keep back at the end of the turn
+            * clock: A function returning the current time in seconds, only meant to be replaced in tests
+
+        """
+        self.seconds = seconds
+        self.safety_margin = safety_margin
+        self.clock = clock
+        self.started = None
+
+    @classmethod
+    def from_config(cls, config, safety_margin=0.5):
+        """A budget matching the soft turn time limit of a game config, waitTimeBotSoft, or 5 seconds if it is missing"""
+        milliseconds = config.get("timingAndReplay", {}).get("waitTimeBotSoft", 5000)
+        return cls(milliseconds / 1000.0, safety_margin)
+
+    def start(self, now=None):
+        """Starts timing a turn
+
+        Args:
+            * now: The clock reading when the turn message arrived, the current time if None
+
+        """
+        self.started = self.clock() if now is None else now
+
+    def elapsed(self):
+        """The time since the turn started"""
+        if self.started is None:
+            return 0.0
+        return self.clock() - self.started
+
+    def remaining(self):
+        """The time left to work before the safety margin, never below 0"""
+        return max(0.0, self.seconds - self.safety_margin - self.elapsed())
+
+    def expired(self):
+        """True once the working time is used up"""
+        return self.remaining() <= 0
+
+    def has_time_for(self, seconds):
+        """True if a piece of work taking the given time would finish before the safety margin"""
+        return self.remaining() >= seconds
+
+    def iterations(self, max_iterations=None):
+        """Yields 0, 1, 2, ... for as long as another iteration is expected to finish in time.
+        Each iteration is expected to take as long as the slowest one so far, so the loop stops
+        before starting an iteration that would overrun instead of after.
+
+        Args:
+            * max_iterations: Stop after this many iterations even if time is left, no limit if None
+
+        """
+        slowest = 0.0
+        iteration = 0
+        while (max_iterations is None or iteration < max_iterations) and self.has_time_for(slowest) and not self.expired():
+            started = self.clock()
+            yield iteration
+            slowest = max(slowest, self.clock() - started)
+            iteration += 1
+
+
+class AnytimeSearch:
+    """Keeps the best plan found so far while a search runs against a TurnBudget
+
+    Attributes :
+        * budget (:obj: TurnBudget): The budget the search stops at
+        * best_plan: The plan with the best score offered so far, None until a plan is offered
+        * best_score: The score of best_plan
+        * iterations_run (int): The number of iterations started
+
+    """
+    def __init__(self, budget, maximize=True):
+        """Starts an empty search
+
+        Args:
+            * budget: The TurnBudget to stop at
+            * maximize: True if higher scores are better, False if lower scores are better
+
+        """
+        self.budget = budget
+        self.maximize = maximize
+        self.best_plan = None
+        self.best_score = None
+        self.iterations_run = 0
+
+    def offer(self, plan, score):
+        """Keeps a plan if it beats the best so far
+
+        Returns:
+            True if the plan became the best plan
+
+        """
+        if self.best_score is None or (score > self.best_score if self.maximize else score < self.best_score):
+            self.best_plan = plan
+            self.best_score = score
+            return True
+        return False
+
+    def iterations(self, max_iterations=None):
+        """Yields iteration numbers while the budget allows, see TurnBudget.iterations"""
+        for iteration in self.budget.iterations(max_iterations):
+            self.iterations_run += 1
+            yield iteration
@@ -0,0 +1,224 @@
+import multiprocessing
+import traceback
+from multiprocessing.connection import wait
+
+from .game_state import REMOVE_INDEX, UPGRADE_INDEX, GameState
+from .unit import get_unit_specs
+from .util import debug_write
+
+
+def encode_board(game_state):
+    """Packs the resources and units of a GameState into a small tuple that is cheap to send to another process.
+    Spawns, upgrades and removals already attempted this turn are included.
+
+    Args:
+        * game_state: The GameState to encode
+
+    Returns:
+        A tuple that decode_board turns back into an equivalent GameState
+
+    """
+    from .game_state import UNIT_TYPE_TO_INDEX
+    units = tuple((UNIT_TYPE_TO_INDEX[unit.unit_type], unit.player_index, unit.x, unit.y, unit.health, unit.unit_id, unit.upgraded, unit.pending_removal)
+                  for unit in game_state.game_map.get_all_units())
+    stats = tuple((health, resources["SP"], resources["MP"], time) for health, resources, time in zip(
+        [game_state.my_health, game_state.enemy_health], game_state._player_resources, [game_state.my_time, game_state.enemy_time]))
+    return (game_state.turn_number, stats, units)
+
+
+def decode_board(config, board):
+    """Rebuilds a GameState from the result of encode_board
+
+    Args:
+        * config: The game config
+        * board: A tuple returned by encode_board
+
+    Returns:
+        A new GameState
+
+    """
+    turn_number, stats, units = board
+    type_count = len(config["unitInformation"])
+    state = {
+        "turnInfo": [0, turn_number, -1],
+        "p1Stats": list(stats[0]),
+        "p2Stats": list(stats[1]),
+        "p1Units": [[] for _ in range(type_count)],
+        "p2Units": [[] for _ in range(type_count)],
+    }
+    for type_index, player_index, x, y, health, unit_id, upgraded, pending_removal in units:
+        player_units = state["p1Units" if player_index == 0 else "p2Units"]
+        player_units[type_index].append([x, y, health, unit_id])
+        if pending_removal:
+            player_units[REMOVE_INDEX].append([x, y, 0.0, unit_id])
+        if upgraded:
+            player_units[UPGRADE_INDEX].append([x, y, 0.0, unit_id])
+    return GameState(config, state)
+
+
+def _worker_main(connection, config):
+    """The loop run by each worker process. Keeps the config and the latest board between tasks."""
+    get_unit_specs(config)
+    game_state = None
+    while True:
+        try:
+            message = connection.recv()
+        except (EOFError, OSError):
+            break
+        if message[0] == "board":
+            game_state = decode_board(config, message[1])
+            game_state.suppress_warnings(True)
+        elif message[0] == "task":
+            _, task_id, function, item = message
+            try:
+                connection.send((task_id, True, function(game_state.fork(), item)))
+            except Exception:
+                connection.send((task_id, False, traceback.format_exc()))
+        else:
+            break
+    connection.close()
+
+
+class WorkerPool:
+    """A pool of worker processes that stay alive for the whole game
+
+    Each worker receives the config once when it starts. Every turn, set_board sends the workers a compact
+    encoding of the board, after which map can fan work such as pathfinding, placement scoring or simulation
+    out over every core. With 0 processes, map runs the work in this process instead.
+
+    Example:
+        def breaches(game_state, location):
+            simulator = gamelib.Simulator(game_state)
+            simulator.add_unit(SCOUT, location, num=5)
+            return simulator.run().breaches[0]
+
+        self.worker_pool.set_board(game_state)
+        results = self.worker_pool.map(breaches, spawn_locations)
+
+    Functions passed to map must be defined at the top level of a module so they can be sent to the workers.
+    If a worker process dies, the pool stops the others and runs the work in this process from then on.
+
+    Attributes :
+        * config (JSON): The game config the workers were started with
+        * processes (int): The number of worker processes
+
+    """
+    def __init__(self, config, processes=None):
+        """Starts the workers
+
+        Args:
+            * config: The game config
+            * processes: The number of workers, one less than the number of cores if None
+
+        """
+        if processes is None:
+            processes = max(0, multiprocessing.cpu_count() - 1)
+        self.config = config
+        self.processes = processes
+        self.__game_state = None
+        self.__workers = []
+        for _ in range(processes):
+            parent_connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker_main, args=(child_connection, config), daemon=True)
+            process.start()
+            child_connection.close()
+            self.__workers.append((process, parent_connection))
+
+    def set_board(self, game_state):
+        """Sends the board that following calls to map work on. Call it once a turn, or again after changing the board.
+
+        Args:
+            * game_state: The GameState to send
+
+        """
+        self.__game_state = game_state
+        if self.__workers:
+            board = encode_board(game_state)
+            try:
+                for _, connection in self.__workers:
+                    connection.send(("board", board))
+            except OSError:
+                self.__fall_back()
+
+    def map(self, function, items):
+        """Calls function(game_state, item) for every item, spread over the workers
+
+        Each call gets its own fork of the board sent by set_board, so it may spawn or simulate freely.
+
+        Args:
+            * function: A function defined at the top level of a module
+            * items: The second argument of each call
+
+        Returns:
+            The results in the same order as items
+
+        """
+        items = list(items)
+        if self.__game_state is None:
+            raise RuntimeError("WorkerPool.map was called before set_board")
+        if not self.__workers:
+            return [function(self.__game_state.fork(), item) for item in items]
+        results = [None] * len(items)
+        pending = iter(enumerate(items))
+        busy = {}
+        failure = None
+        broken = False
+        for _, connection in self.__workers:
+            if not self.__send_next(connection, function, pending, busy):
+                broken = True
+                failure = "A worker process stopped unexpectedly"
+                break
+        while busy:
+            for connection in wait(list(busy)):
+                try:
+                    task_id, succeeded, result = connection.recv()
+                except (EOFError, OSError):
+                    # The worker died. The others still finish their tasks, so no stale results are left in their pipes
+                    del busy[connection]
+                    if failure is None:
+                        failure = "A worker process stopped unexpectedly"
+                    broken = True
+                    continue
+                del busy[connection]
+                if succeeded:
+                    results[task_id] = result
+                elif failure is None:
+                    failure = result
+                if failure is None and not self.__send_next(connection, function, pending, busy):
+                    broken = True
+                    failure = "A worker process stopped unexpectedly"
+        if broken:
+            self.__fall_back()
+        if failure is not None:
+            raise RuntimeError("A worker task failed:\n{}".format(failure))
+        return results
+
+    def __send_next(self, connection, function, pending, busy):
+        """Sends the next task to a worker, returning False if the worker is gone"""
+        for task_id, item in pending:
+            try:
+                connection.send(("task", task_id, function, item))
+            except OSError:
+                return False
+            busy[connection] = task_id
+            break
+        return True
+
+    def __fall_back(self):
+        debug_write("A worker process stopped, so the WorkerPool will run work in this process from now on")
+        self.close()
+
+    def close(self):
+        """Stops the workers. The pool keeps working in this process afterwards."""
+        for process, connection in self.__workers:
+            try:
+                connection.send(("close",))
+            except (OSError, ValueError):
+                pass
+            connection.close()
+        for process, _ in self.__workers:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+        self.__workers = []
+        self.processes = 0
@@ -12,7 +12,9 @@ modules yourself. Start by modifying the 'on_turn' function.
 
 Advanced strategy tips: 
 
-  - You can analyze action frames by modifying on_action_frame function
+  - You can react to action frame events by subscribing a handler with
+  AlgoCore.subscribe_frame_events, like on_breach below. Overriding
+  on_action_frame instead gives you every frame as a decoded dict.
 
   - The GameState.map object can be manually manipulated to create hypothetical 
   board states. Though, we recommended making a copy of the map to preserve 
@@ -46,8 +48,16 @@ class AlgoStrategy(gamelib.AlgoCore):
         SP = 0
         # This is a good place to do initial setup
         self.scored_on_locations = []
+        self.subscribe_frame_events("breach", self.on_breach)
         self.template = [] # Template for strategy
         self.initialize_template()
+        # The template is compiled once. "priority" builds it in order, like attempting each item in turn
+        self.template_planner = gamelib.BuildPlanner(config, "priority")
+        for item in self.template:
+            if item["struct"] == UPGRADE:
+                self.template_planner.add_upgrade(item["pos"])
+            else:
+                self.template_planner.add(item["struct"], item["pos"])
         self.attack_type = SCOUT
         self.attack_direction = LEFTRIGHT
         # If a structure gets below X% health, replace. Currently high value because it will sustain more dmg before getting actually removed
@@ -161,15 +171,7 @@ class AlgoStrategy(gamelib.AlgoCore):
                 game_state.attempt_remove(loc)
 
         # 2. Build out initial template
-        for item in self.template:
-
-            if game_state.get_resource(SP) == 0:
-                return
-
-            if item["struct"] == UPGRADE:
-                game_state.attempt_upgrade(item["pos"])
-            else:
-                game_state.attempt_spawn(item["struct"], item["pos"])
+        self.template_planner.build(game_state)
 
         if game_state.get_resource(SP) == 0:
             return
@@ -238,18 +240,16 @@ class AlgoStrategy(gamelib.AlgoCore):
     def attack(self, game_state):
         # if self.attackNextTurn:
             # We attacking - count dmg
-        leftAttack = sum(
-            [x.damage_i for x in game_state.get_attackers([1, 13], 0)])
-        rightAttack = sum(
-            [x.damage_i for x in game_state.get_attackers([26, 13], 0)])
+        leftAttack = game_state.get_threat_map().get_damage([1, 13], 0)
+        rightAttack = game_state.get_threat_map().get_damage([26, 13], 0)
         leftZone = [[4, 18], [3, 17], [4, 17], [2, 16], [3, 16], [4, 16], [1, 15], [
             2, 15], [3, 15], [4, 15], [0, 14], [1, 14], [2, 14], [3, 14], [4, 14]]
         rightZone = [[23, 18], [23, 17], [24, 17], [23, 16], [24, 16], [25, 16], [23, 15], [
             24, 15], [25, 15], [26, 15], [23, 14], [24, 14], [25, 14], [26, 14], [27, 14]]
-        leftZone = sum(
-            [0 if not game_state.contains_stationary_unit(x) else 1 for x in leftZone])
-        rightZone = sum(
-            [0 if not game_state.contains_stationary_unit(x) else 1 for x in rightZone])
+        leftZone = game_state.game_map.count_structures(
+            game_state.game_map.get_zone_mask(leftZone))
+        rightZone = game_state.game_map.count_structures(
+            game_state.game_map.get_zone_mask(rightZone))
         if (leftAttack == rightAttack):
             # Randomly choose
             # Count structures in immediate area to test if theres a counter
@@ -356,7 +356,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         """
         This function builds reactive defenses based on where the enemy scored on us from.
         We can track where the opponent scored by looking at events in action frames 
-        as shown in the on_action_frame function
+        as shown in the on_breach function
         """
         for location in self.scored_on_locations:
             # Build turret one space above so that it doesn't block our own edge spawn locations
@@ -415,13 +415,14 @@ class AlgoStrategy(gamelib.AlgoCore):
         estimate the path's damage risk.
         """
         damages = []
-        # Get the damage estimate each path will take
-        for location in location_options:
-            path = game_state.find_path_to_edge(location)
+        threat_map = game_state.get_threat_map()
+        turret_damage = gamelib.GameUnit(TURRET, game_state.config).damage_i
+        # Get the damage estimate each path will take, pathing all of the options at once
+        for path in game_state.find_paths_to_edges(location_options):
             damage = 0
             for path_location in path:
                 # Get number of enemy turrets that can attack each location and multiply by turret damage
-                damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(TURRET, game_state.config).damage_i
+                damage += threat_map.get_attacker_count(path_location, 0) * turret_damage
             damages.append(damage)
         
         # Now just return the location that takes the least damage
@@ -443,17 +444,13 @@ class AlgoStrategy(gamelib.AlgoCore):
                 filtered.append(location)
         return filtered
 
-    def on_action_frame(self, turn_string):
+    def on_breach(self, breaches, turn_info):
         """
-        This is the action frame of the game. This function could be called 
-        hundreds of times per turn and could slow the algo down so avoid putting slow code here.
-        Processing the action frames is complicated so we only suggest it if you have time and experience.
+        This is called for every action frame in which a unit scores, with the breach events of that frame.
+        It is subscribed to in on_game_start, so frames without breaches are never decoded.
         Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
         """
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
-        events = state["events"]
-        breaches = events["breach"]
         for breach in breaches:
             location = breach[0]
             unit_owner_self = True if breach[4] == 1 else False
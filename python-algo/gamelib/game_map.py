@@ -1,7 +1,97 @@
+import copy
 import math
+import random
 from .unit import GameUnit
 from .util import debug_write
 
+_ZOBRIST_KEYS = {}
+
+def get_zobrist_keys(arena_size):
+    """Gets the random 64 bit keys used to hash structure layouts, keys[x][y] for each tile.
+    The keys are seeded so that every process computes the same hash for the same layout.
+    """
+    keys = _ZOBRIST_KEYS.get(arena_size)
+    if keys is None:
+        rng = random.Random(arena_size)
+        keys = [[rng.getrandbits(64) for _ in range(arena_size)] for _ in range(arena_size)]
+        _ZOBRIST_KEYS[arena_size] = keys
+    return keys
+
+_RANGE_STENCILS = {}
+_FILLED_STENCILS = set()
+
+def get_range_stencil(arena_size, radius, hit_radius):
+    """Gets the shared table of locations in range for one radius.
+    table[x * arena_size + y] is a tuple of the (x, y) tuples in range of [x, y], or None until it is first needed.
+    """
+    key = (arena_size, radius, hit_radius)
+    table = _RANGE_STENCILS.get(key)
+    if table is None:
+        table = [None] * (arena_size * arena_size)
+        _RANGE_STENCILS[key] = table
+    return table
+
+_TILE_INDEXES = {}
+
+def _on_diamond(x, y, arena_size):
+    """True if [x, y] is on the diamond shaped board, worked out from the board's shape"""
+    half_board = arena_size // 2
+    row_size = y + 1 if y < half_board else arena_size - y
+    return half_board - row_size <= x <= half_board + row_size - 1
+
+class TileIndex:
+    """The fixed table of tiles on the diamond shaped board, shared by every GameMap of the same size
+
+    Tiles are identified by the tile ID x * arena_size + y, the same IDs used by structure_bits, PathGrid and ThreatMap,
+    so anything precomputed per tile can be stored in a flat list indexed by tile ID.
+
+    Attributes :
+        * arena_size (int): The size of the arena
+        * locations (tuple): An (x, y) tuple for each tile on the board, ordered by y then x. GameMap iterates in this order.
+        * tile_ids (tuple): The tile ID of each entry of locations
+        * in_bounds (bytes): in_bounds[tile_id] is 1 if the tile is on the board
+        * half_masks (tuple): Bitboards of the bottom half of the board, yours, and the top half, the enemy's
+        * quadrant_masks (tuple): Bitboards of the four quadrants, indexed by GameMap.TOP_RIGHT, TOP_LEFT, BOTTOM_LEFT and BOTTOM_RIGHT
+        * edges (tuple): The (x, y) tuples along each of the four edges, indexed the same way, in the order of GameMap.get_edges
+        * edge_tiles (tuple): A frozenset of the tile IDs along each of the four edges
+
+    """
+    def __init__(self, arena_size):
+        half_board = arena_size // 2
+        self.arena_size = arena_size
+        self.locations = tuple((x, y) for y in range(arena_size) for x in range(arena_size) if _on_diamond(x, y, arena_size))
+        self.tile_ids = tuple(x * arena_size + y for x, y in self.locations)
+        in_bounds = bytearray(arena_size * arena_size)
+        half_masks = [0, 0]
+        quadrant_masks = [0, 0, 0, 0]
+        for (x, y), tile_id in zip(self.locations, self.tile_ids):
+            in_bounds[tile_id] = 1
+            top = y >= half_board
+            half_masks[top] |= 1 << tile_id
+            # The order of GameMap.TOP_RIGHT, TOP_LEFT, BOTTOM_LEFT and BOTTOM_RIGHT
+            quadrant = (0 if x >= half_board else 1) if top else (2 if x < half_board else 3)
+            quadrant_masks[quadrant] |= 1 << tile_id
+        self.in_bounds = bytes(in_bounds)
+        self.half_masks = tuple(half_masks)
+        self.quadrant_masks = tuple(quadrant_masks)
+        self.edges = (
+            tuple((half_board + num, arena_size - 1 - num) for num in range(half_board)),
+            tuple((half_board - 1 - num, arena_size - 1 - num) for num in range(half_board)),
+            tuple((half_board - 1 - num, num) for num in range(half_board)),
+            tuple((half_board + num, num) for num in range(half_board)))
+        self.edge_tiles = tuple(frozenset(x * arena_size + y for x, y in edge) for edge in self.edges)
+
+    def __len__(self):
+        return len(self.locations)
+
+def get_tile_index(arena_size):
+    """Gets the TileIndex for a board size, building it the first time it is needed"""
+    tile_index = _TILE_INDEXES.get(arena_size)
+    if tile_index is None:
+        tile_index = TileIndex(arena_size)
+        _TILE_INDEXES[arena_size] = tile_index
+    return tile_index
+
 class GameMap:
     """Holds data about the current game map and provides functions
     useful for getting information related to the map.
@@ -18,8 +108,17 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * structure_hash (int): A Zobrist hash of the tiles holding structures. It is kept up to date by add_unit,
+          remove_unit and assignments to game_map[x, y], but not by editing the list of units at a location in place.
+        * structure_bits ([int, int]): A bitboard per player of the tiles holding that player's structures. Bit
+          x * ARENA_SIZE + y stands for [x, y]. Kept up to date the same way as structure_hash.
+        * type_bits (dict): A bitboard per structure type of the tiles holding a structure of that type, for both players
+        * hit_radius (float): The getHitRadius from the config, added to every range
+        * tiles (:obj: TileIndex): The tiles on the board with their tile IDs and half and quadrant bitboards
 
     """
+    ARENA_SIZE = 28
+
     def __init__(self, config):
         """Initializes constants and game map
 
@@ -29,14 +128,20 @@ class GameMap:
         """
         self.config = config
         self.enable_warnings = True
-        self.ARENA_SIZE = 28
         self.HALF_ARENA = int(self.ARENA_SIZE / 2)
         self.TOP_RIGHT = 0
         self.TOP_LEFT = 1
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
+        self.tiles = get_tile_index(self.ARENA_SIZE)
         self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        self.__zobrist_keys = get_zobrist_keys(self.ARENA_SIZE)
+        self.structure_hash = 0
+        self.structure_bits = [0, 0]
+        self.type_bits = {}
+        self.hit_radius = config["unitInformation"][0]['getHitRadius']
+        self.__stencils = {}
+        self.__build_config_stencils()
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
@@ -44,28 +149,21 @@ class GameMap:
             return self.__map[x][y]
         self._invalid_coordinates(location)
 
+    def _units_at(self, location):
+        """The units at a location already known to be on the board, skipping the bounds check of game_map[x, y]"""
+        return self.__map[location[0]][location[1]]
+
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+            x, y = location
+            self.__map[x][y] = val
+            self.__update_tile(x, y)
             return
         self._invalid_coordinates(location)
 
     def __iter__(self):
-        self.__start = [13,0]
-        return self
-    
-    def __next__(self):
-        location = self.__start
-        if location == [15,27]:
-            raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        """Iterates over every location on the board, row by row from the bottom. Each loop gets its own iterator, so loops can be nested."""
+        return ([x, y] for x, y in self.tiles.locations)
 
     def __empty_grid(self):
         grid = []
@@ -75,6 +173,191 @@ class GameMap:
                 grid[x].append([])
         return grid
 
+    def __has_structure(self, x, y):
+        for unit in self.__map[x][y]:
+            if unit.stationary:
+                return True
+        return False
+
+    def __update_tile(self, x, y):
+        """Brings structure_hash and the bitboards up to date with the units at [x, y]"""
+        bit = 1 << (x * self.ARENA_SIZE + y)
+        had_structure = (self.structure_bits[0] | self.structure_bits[1]) & bit
+        self.structure_bits[0] &= ~bit
+        self.structure_bits[1] &= ~bit
+        for unit_type in self.type_bits:
+            self.type_bits[unit_type] &= ~bit
+        has_structure = False
+        for unit in self.__map[x][y]:
+            if unit.stationary:
+                self.__set_structure_bit(unit, bit)
+                has_structure = True
+        if bool(had_structure) != has_structure:
+            self.structure_hash ^= self.__zobrist_keys[x][y]
+
+    def __set_structure_bit(self, unit, bit):
+        self.structure_bits[unit.player_index] |= bit
+        self.type_bits[unit.unit_type] = self.type_bits.get(unit.unit_type, 0) | bit
+
+    def tile_bit(self, location):
+        """The bitboard with only the bit for a location set"""
+        x, y = location
+        return 1 << (int(x) * self.ARENA_SIZE + int(y))
+
+    def get_zone_mask(self, locations):
+        """Builds a bitboard from a list of locations, for use with count_structures
+
+        Args:
+            locations: A list of locations on the board
+
+        Returns:
+            A bitboard with the bit of every location set
+
+        """
+        mask = 0
+        for x, y in locations:
+            mask |= 1 << (int(x) * self.ARENA_SIZE + int(y))
+        return mask
+
+    def get_structure_mask(self, player_index=None, unit_type=None):
+        """The bitboard of tiles holding structures
+
+        Args:
+            player_index: Only count structures of this player, both players if None
+            unit_type: Only count structures of this type, every type if None
+
+        Returns:
+            A bitboard of the matching tiles
+
+        """
+        if player_index is None:
+            mask = self.structure_bits[0] | self.structure_bits[1]
+        else:
+            mask = self.structure_bits[player_index]
+        if unit_type is not None:
+            mask &= self.type_bits.get(unit_type, 0)
+        return mask
+
+    def has_structure(self, location, player_index=None, unit_type=None):
+        """Checks if a structure is at a location using the bitboards
+
+        Args:
+            location: The location to check
+            player_index: Only look for structures of this player, either player if None
+            unit_type: Only look for structures of this type, any type if None
+
+        Returns:
+            True if a matching structure is at the location, False otherwise
+
+        """
+        return bool(self.get_structure_mask(player_index, unit_type) & self.tile_bit(location))
+
+    def count_structures(self, zone_mask=None, player_index=None, unit_type=None):
+        """Counts structures, optionally only those inside a zone
+
+        Args:
+            zone_mask: A bitboard from get_zone_mask. The whole board if None.
+            player_index: Only count structures of this player, both players if None
+            unit_type: Only count structures of this type, every type if None
+
+        Returns:
+            The number of matching structures
+
+        """
+        mask = self.get_structure_mask(player_index, unit_type)
+        if zone_mask is not None:
+            mask &= zone_mask
+        return bin(mask).count("1")
+
+    def get_mask_locations(self, mask):
+        """The locations whose bits are set in a bitboard"""
+        locations = []
+        while mask:
+            low_bit = mask & -mask
+            tile = low_bit.bit_length() - 1
+            locations.append([tile // self.ARENA_SIZE, tile % self.ARENA_SIZE])
+            mask ^= low_bit
+        return locations
+
+    def get_bitboards(self):
+        """A hashable snapshot of the structure layout, including owners and types
+
+        Returns:
+            A tuple of the bitboard of each player followed by sorted (unit_type, bitboard) pairs
+
+        """
+        return (self.structure_bits[0], self.structure_bits[1]) + tuple(sorted((unit_type, mask) for unit_type, mask in self.type_bits.items() if mask))
+
+    def copy(self):
+        """Copies the map in a few microseconds. The lists of units at each location are shared
+        until either map changes them: add_unit, remove_unit and game_map[x, y] = units always store
+        a new list rather than editing the shared one. The units themselves are shared.
+
+        Returns:
+            A new GameMap with the same units and bitboards
+
+        """
+        other = GameMap.__new__(GameMap)
+        other.__dict__.update(self.__dict__)
+        other.__map = [list(column) for column in self.__map]
+        other.structure_bits = list(self.structure_bits)
+        other.type_bits = dict(self.type_bits)
+        return other
+
+    def get_all_units(self):
+        """Gets every unit on the map
+
+        Returns:
+            A list of GameUnits, ordered by x then y
+
+        """
+        units = []
+        for column in self.__map:
+            for location_units in column:
+                if location_units:
+                    units.extend(location_units)
+        return units
+
+    def compute_structure_hash(self):
+        """Computes the structure hash from scratch. structure_hash should always be equal to this.
+
+        Returns:
+            The Zobrist hash of the tiles currently holding structures
+
+        """
+        structure_hash = 0
+        for x in range(self.ARENA_SIZE):
+            for y in range(self.ARENA_SIZE):
+                if self.__has_structure(x, y):
+                    structure_hash ^= self.__zobrist_keys[x][y]
+        return structure_hash
+
+    def _place_unit(self, unit):
+        """Puts an existing GameUnit on the map at its own location, used when parsing the game state"""
+        x, y = unit.x, unit.y
+        if unit.stationary:
+            bit = 1 << (x * self.ARENA_SIZE + y)
+            if not (self.structure_bits[0] | self.structure_bits[1]) & bit:
+                self.structure_hash ^= self.__zobrist_keys[x][y]
+            self.__set_structure_bit(unit, bit)
+        self.__map[x][y].append(unit)
+
+    def _move_unit(self, unit, location):
+        """Moves a mobile GameUnit that is on the map to a new location and updates its x and y.
+        The unit goes first at its new location, so among equal targets the latest arrival is attacked first, as in the engine.
+        """
+        x, y = unit.x, unit.y
+        self.__map[x][y] = [other for other in self.__map[x][y] if other is not unit]
+        unit.x, unit.y = location
+        self.__map[unit.x][unit.y] = [unit] + self.__map[unit.x][unit.y]
+
+    def _take_unit(self, unit):
+        """Takes one GameUnit off the map, leaving any other units at its location"""
+        x, y = unit.x, unit.y
+        self.__map[x][y] = [other for other in self.__map[x][y] if other is not unit]
+        if unit.stationary:
+            self.__update_tile(x, y)
+
     def _invalid_coordinates(self, location):
         self.warn("{} is out of bounds.".format(str(location)))
 
@@ -89,19 +372,14 @@ class GameMap:
         
         """
         x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
-
-        return bottom_half_check or top_half_check
+        size = self.ARENA_SIZE
+        if 0 <= x < size and 0 <= y < size:
+            try:
+                return self.tiles.in_bounds[x * size + y] == 1
+            except TypeError:
+                # Not whole numbers, so not a tile
+                pass
+        return _on_diamond(x, y, size)
 
     def get_edge_locations(self, quadrant_description):
         """Takes in an edge description and returns a list of locations.
@@ -127,35 +405,34 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
-    
-    def add_unit(self, unit_type, location, player_index=0):
+        return [[[x, y] for x, y in edge] for edge in self.tiles.edges]
+
+    def is_on_edge(self, location, edges):
+        """Checks if a location on the board is on one of the given edges, without building the edge lists
+
+        Args:
+            location: A map location
+            edges: A list of edge constants, such as [game_map.BOTTOM_LEFT, game_map.BOTTOM_RIGHT]
+
+        Returns:
+            True if the location is on one of the edges
+
+        """
+        tile_id = location[0] * self.ARENA_SIZE + location[1]
+        edge_tiles = self.tiles.edge_tiles
+        for edge in edges:
+            if tile_id in edge_tiles[edge]:
+                return True
+        return False
+
+    def add_unit(self, unit_type, location, player_index=0, num=1):
         """Add a single GameUnit to the map at the given location.
 
         Args:
             unit_type: The type of the new unit. Use the constants provided in algo_strategy.
             location: A list of two integers representing the [x,y] coordinate of the new unit
             player_index: The index corresponding to the player controlling the new unit, 0 for you 1 for the enemy
+            num: The number of mobile units to add at once. Only one structure is ever added.
 
         This function does not affect your turn and only changes the data stored in GameMap. The intended use of this function
         is to allow you to create arbitrary gamestates. Using this function on the game_map provided with game_state will 
@@ -169,9 +446,10 @@ class GameMap:
         x, y = location
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
         if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+            self.__map[x][y] = self.__map[x][y] + [new_unit] + [copy.copy(new_unit) for _ in range(num - 1)]
         else:
             self.__map[x][y] = [new_unit]
+            self.__update_tile(x, y)
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -187,6 +465,38 @@ class GameMap:
         
         x, y = location
         self.__map[x][y] = []
+        self.__update_tile(x, y)
+
+    def __build_config_stencils(self):
+        """Fills the range tables for every attack and shield range in the config, once per process"""
+        radii = set()
+        for unit_information in self.config["unitInformation"]:
+            for information in [unit_information, unit_information.get("upgrade", {})]:
+                for key in ["attackRange", "shieldRange"]:
+                    if key in information:
+                        radii.add(information[key])
+        for radius in radii:
+            if (self.ARENA_SIZE, radius, self.hit_radius) in _FILLED_STENCILS:
+                continue
+            table = self.__get_stencil(radius)
+            search_radius = math.ceil(radius)
+            offsets = []
+            for i in range(-search_radius, search_radius + 1):
+                for j in range(-search_radius, search_radius + 1):
+                    if math.sqrt(i**2 + j**2) < radius + self.hit_radius:
+                        offsets.append((i, j))
+            for x in range(self.ARENA_SIZE):
+                for y in range(self.ARENA_SIZE):
+                    if self.in_arena_bounds([x, y]):
+                        table[x * self.ARENA_SIZE + y] = tuple((x + i, y + j) for i, j in offsets if self.in_arena_bounds([x + i, y + j]))
+            _FILLED_STENCILS.add((self.ARENA_SIZE, radius, self.hit_radius))
+
+    def __get_stencil(self, radius):
+        table = self.__stencils.get(radius)
+        if table is None:
+            table = get_range_stencil(self.ARENA_SIZE, radius, self.hit_radius)
+            self.__stencils[radius] = table
+        return table
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -199,6 +509,27 @@ class GameMap:
             The locations that are within our search area
 
         """
+        return [[x, y] for x, y in self._locations_in_range(location, radius)]
+
+    def _locations_in_range(self, location, radius):
+        """The locations in range as (x, y) tuples, for callers that only read them.
+        Locations on the board come from a table shared by every GameMap instead of a new list.
+        """
+        x, y = location
+        if type(x) is int and type(y) is int and 0 <= x < self.ARENA_SIZE and 0 <= y < self.ARENA_SIZE:
+            table = self.__stencils.get(radius)
+            if table is None:
+                table = self.__get_stencil(radius)
+            locations = table[x * self.ARENA_SIZE + y]
+            if locations is not None:
+                return locations
+            if self.in_arena_bounds(location) and 0 <= radius <= self.ARENA_SIZE:
+                locations = tuple(map(tuple, self.__scan_locations_in_range(location, radius)))
+                table[x * self.ARENA_SIZE + y] = locations
+                return locations
+        return self.__scan_locations_in_range(location, radius)
+
+    def __scan_locations_in_range(self, location, radius):
         if radius < 0 or radius > self.ARENA_SIZE:
             self.warn("Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}".format(radius, self.ARENA_SIZE))
         if not self.in_arena_bounds(location):
@@ -207,7 +538,7 @@ class GameMap:
         x, y = location
         locations = []
         search_radius = math.ceil(radius)
-        getHitRadius = self.config["unitInformation"][0]['getHitRadius']
+        getHitRadius = self.hit_radius
         for i in range(int(x - search_radius), int(x + search_radius + 1)):
             for j in range(int(y - search_radius), int(y + search_radius + 1)):
                 new_location = [i, j]
@@ -1,24 +1,500 @@
 import heapq
-import math
 import sys
-import queue
+import threading
+from array import array
+from collections import deque, OrderedDict
 from .util import debug_write
 
-class Node:
-    """A pathfinding node
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class PathGrid:
+    """The fixed layout of the board, shared by every pathfinding buffer
+
+    Tiles are identified by the integer tile ID x * arena_size + y, so per tile data can be
+    kept in flat preallocated buffers rather than nested lists of objects.
+
+    Attributes :
+        * arena_size (int): The size of the arena
+        * in_bounds (bytearray): in_bounds[tile] is 1 if the tile is on the diamond shaped board
+        * tiles (list): The IDs of every tile on the board
+        * neighbors (list): neighbors[tile] is a tuple of the IDs of adjacent tiles on the board, in the order of ShortestPathFinder._get_neighbors
+
+    """
+    def __init__(self, in_arena_bounds, arena_size=28):
+        self.arena_size = arena_size
+        self.in_bounds = bytearray(arena_size * arena_size)
+        for x in range(arena_size):
+            for y in range(arena_size):
+                if in_arena_bounds([x, y]):
+                    self.in_bounds[x * arena_size + y] = 1
+        self.tiles = [tile for tile in range(arena_size * arena_size) if self.in_bounds[tile]]
+        self.neighbors = [()] * (arena_size * arena_size)
+        for tile in self.tiles:
+            x, y = self.location(tile)
+            adjacent = []
+            for nx, ny in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+                if 0 <= nx < arena_size and 0 <= ny < arena_size and self.in_bounds[nx * arena_size + ny]:
+                    adjacent.append(nx * arena_size + ny)
+            self.neighbors[tile] = tuple(adjacent)
+
+    def contains(self, location):
+        """True if the location is on the board"""
+        x, y = location
+        return 0 <= x < self.arena_size and 0 <= y < self.arena_size and self.in_bounds[x * self.arena_size + y] == 1
+
+    def tile_id(self, location):
+        return location[0] * self.arena_size + location[1]
+
+    def location(self, tile):
+        return [tile // self.arena_size, tile % self.arena_size]
+
+_GRIDS = {}
+
+def wavefront_pathlengths(open_tiles, end_tiles, idealness):
+    """Computes DistanceField pathlengths for a stack of boards at once with NumPy
+
+    Each wavefront step expands every frontier of every board by one tile using shifted
+    boolean masks. Pockets that cannot reach an endpoint are then flooded from their most
+    ideal tile, exactly like DistanceField.rebuild.
+
+    Args:
+        * open_tiles: A boolean array of shape (boards, ARENA_SIZE, ARENA_SIZE), True for pathable tiles
+        * end_tiles: A boolean array of shape (ARENA_SIZE, ARENA_SIZE), True for endpoints
+        * idealness: An integer array of shape (ARENA_SIZE, ARENA_SIZE), see DistanceField.idealness
+
+    Returns:
+        An int16 array of shape (boards, ARENA_SIZE, ARENA_SIZE) with pathlengths indexed [board, x, y], -1 where blocked
+
+    """
+    pathlength = np.full(open_tiles.shape, -1, dtype=np.int16)
+    _expand_wavefront(pathlength, open_tiles & end_tiles, open_tiles)
+
+    boards = open_tiles.shape[0]
+    flat_idealness = np.where(open_tiles, idealness, -1).reshape(boards, -1)
+    remaining = open_tiles & (pathlength == -1)
+    while remaining.any():
+        candidates = np.where(remaining.reshape(boards, -1), flat_idealness, -1)
+        ideal = candidates.argmax(axis=1)
+        seeds = np.zeros(candidates.shape, dtype=bool)
+        has_pocket = candidates[np.arange(boards), ideal] >= 0
+        seeds[np.arange(boards)[has_pocket], ideal[has_pocket]] = True
+        _expand_wavefront(pathlength, seeds.reshape(open_tiles.shape), open_tiles)
+        remaining = open_tiles & (pathlength == -1)
+    return pathlength
+
+def _expand_wavefront(pathlength, seeds, open_tiles):
+    """Floods outwards from seeds through open tiles that have no pathlength yet"""
+    pathlength[seeds] = 0
+    unvisited = open_tiles & (pathlength == -1)
+    frontier = seeds
+    distance = 0
+    while frontier.any():
+        distance += 1
+        reached = np.zeros_like(frontier)
+        reached[..., 1:] |= frontier[..., :-1]
+        reached[..., :-1] |= frontier[..., 1:]
+        reached[..., 1:, :] |= frontier[..., :-1, :]
+        reached[..., :-1, :] |= frontier[..., 1:, :]
+        reached &= unvisited
+        unvisited &= ~reached
+        pathlength[reached] = distance
+        frontier = reached
+
+def get_path_grid(game_map):
+    """Gets the PathGrid for the board of a GameMap, building it the first time it is needed"""
+    grid = _GRIDS.get(game_map.ARENA_SIZE)
+    if grid is None:
+        grid = PathGrid(game_map.in_arena_bounds, game_map.ARENA_SIZE)
+        _GRIDS[game_map.ARENA_SIZE] = grid
+    return grid
+
+class DistanceField:
+    """Validated pathlengths from every pathable tile towards one set of endpoints
+
+    Every pocket of connected, unblocked tiles is solved exactly as a unit starting
+    inside it would solve it: pockets touching an endpoint hold the distance to the
+    nearest endpoint, other pockets hold the distance to their most ideal self destruct tile.
+    This makes one field valid for every start location targeting the same endpoints.
+
+    Attributes :
+        * grid (:obj: PathGrid): The board layout the field is built on
+        * end_points (list): The endpoints this field leads to
+        * direction ([int, int]): The direction of the target edge, see ShortestPathFinder._get_direction_from_endpoints
+        * blocked (set): The IDs of tiles containing structures when the field was last updated
+        * pathlength (array): pathlength[tile] is the distance of a tile from its target, -1 if blocked or off the board
+        * backend (str): "python" for a breadth first search when rebuilding, or "numpy" to use wavefront_pathlengths
+
+    """
+    def __init__(self, end_points, grid, backend="python"):
+        self.grid = grid
+        self.backend = backend
+        size = grid.arena_size
+        half_arena = int(size / 2)
+        self.end_points = [list(point) for point in end_points if grid.contains(point)]
+        self.direction = [1, 1]
+        if end_points[0][0] < half_arena:
+            self.direction[0] = -1
+        if end_points[0][1] < half_arena:
+            self.direction[1] = -1
+
+        self._ends = bytearray(size * size)
+        for point in self.end_points:
+            self._ends[grid.tile_id(point)] = 1
+        self.idealness = [0] * (size * size)
+        for tile in grid.tiles:
+            x, y = grid.location(tile)
+            if self._ends[tile]:
+                self.idealness[tile] = sys.maxsize
+                continue
+            idealness = 28 * y if self.direction[1] == 1 else 28 * (27 - y)
+            idealness += x if self.direction[0] == 1 else (27 - x)
+            self.idealness[tile] = idealness
+
+        self.blocked = set()
+        self._open = bytearray(grid.in_bounds)
+        self.pathlength = None
+
+    def is_pathable(self, location):
+        """True if the location is on the board and not blocked"""
+        return self.grid.contains(location) and self._open[self.grid.tile_id(location)] == 1
+
+    def get_pathlength(self, location):
+        """The distance from a location to its target, -1 if it is blocked or off the board"""
+        if not self.grid.contains(location):
+            return -1
+        return self.pathlength[self.grid.tile_id(location)]
+
+    def update(self, blocked, rebuild_threshold=8):
+        """Brings the field in line with a new set of blocked tiles
+
+        Args:
+            * blocked: A set of the IDs of tiles containing structures
+            * rebuild_threshold: If more tiles than this changed, the field is rebuilt instead of patched
+
+        Returns:
+            The number of tiles that changed since the last update, or -1 if the field was rebuilt
+
+        """
+        if self.pathlength is None:
+            self.rebuild(blocked)
+            return -1
+        added = blocked - self.blocked
+        removed = self.blocked - blocked
+        changes = len(added) + len(removed)
+        if changes > rebuild_threshold:
+            self.rebuild(blocked)
+            return -1
+        for tile in removed:
+            self._unblock(tile)
+        for tile in added:
+            self._block(tile)
+        return changes
+
+    def rebuild(self, blocked):
+        """Recomputes every pathlength from scratch"""
+        grid = self.grid
+        self.blocked = set(blocked)
+        self._open = bytearray(grid.in_bounds)
+        for tile in self.blocked:
+            self._open[tile] = 0
+        if self.backend == "numpy":
+            size = grid.arena_size
+            open_tiles = np.frombuffer(bytes(self._open), dtype=np.uint8).astype(bool).reshape(1, size, size)
+            end_tiles = np.frombuffer(bytes(self._ends), dtype=np.uint8).astype(bool).reshape(size, size)
+            idealness = np.array(self.idealness, dtype=np.int64).reshape(size, size)
+            self.pathlength = array('h', wavefront_pathlengths(open_tiles, end_tiles, idealness).tobytes())
+            return
+        self.pathlength = array('h', [-1]) * len(self._open)
+        seeds = [grid.tile_id(point) for point in self.end_points]
+        seeds = [tile for tile in seeds if self._open[tile]]
+        for tile in seeds:
+            self.pathlength[tile] = 0
+        self._flood(seeds)
+        self._settle_orphans([tile for tile in grid.tiles if self._open[tile] and self.pathlength[tile] == -1])
+
+    def copy(self):
+        """A copy of this field that can be changed without affecting the original"""
+        field = DistanceField.__new__(DistanceField)
+        field.__dict__.update(self.__dict__)
+        field.blocked = set(self.blocked)
+        field._open = bytearray(self._open)
+        field.pathlength = array('h', self.pathlength)
+        return field
+
+    def add_structure(self, location):
+        """Marks a location as blocked, repairing only the tiles whose route went through it
+
+        Returns:
+            The set of IDs of tiles whose pathlength changed
+
+        """
+        if not self.grid.contains(location):
+            return set()
+        return self._block(self.grid.tile_id(location))
+
+    def remove_structure(self, location):
+        """Marks a location as pathable, merging the pockets around it if needed
+
+        Returns:
+            The set of IDs of tiles whose pathlength changed
+
+        """
+        if not self.grid.contains(location):
+            return set()
+        return self._unblock(self.grid.tile_id(location))
+
+    def _block(self, tile):
+        if tile in self.blocked:
+            return set()
+        pathlength = self.pathlength
+        neighbors = self.grid.neighbors
+        is_open = self._open
+        distance = pathlength[tile]
+        self.blocked.add(tile)
+        is_open[tile] = 0
+        pathlength[tile] = -1
+
+        if distance == 0 and not self._ends[tile]:
+            # This was the self destruct target of its pocket, every tile in the pocket needs a new target
+            pocket = self._collect([n for n in neighbors[tile] if is_open[n]])
+            for other in pocket:
+                pathlength[other] = -1
+            self._settle_orphans(pocket)
+            pocket.add(tile)
+            return pocket
+
+        # Find the tiles that can no longer get one step closer without passing through this one
+        affected = set()
+        candidates = deque(n for n in neighbors[tile] if pathlength[n] == distance + 1)
+        while candidates:
+            current = candidates.popleft()
+            if current in affected:
+                continue
+            current_distance = pathlength[current]
+            supported = False
+            for neighbor in neighbors[current]:
+                if pathlength[neighbor] == current_distance - 1 and is_open[neighbor] and neighbor not in affected:
+                    supported = True
+                    break
+            if supported:
+                continue
+            affected.add(current)
+            for neighbor in neighbors[current]:
+                if pathlength[neighbor] == current_distance + 1 and neighbor not in affected:
+                    candidates.append(neighbor)
+        if not affected:
+            return {tile}
+
+        for current in affected:
+            pathlength[current] = -1
+        frontier = []
+        for current in affected:
+            for neighbor in neighbors[current]:
+                if pathlength[neighbor] != -1:
+                    frontier.append((pathlength[neighbor], neighbor))
+        self._relax(frontier)
+        self._settle_orphans([current for current in affected if pathlength[current] == -1])
+        affected.add(tile)
+        return affected
+
+    def _unblock(self, tile):
+        if tile not in self.blocked:
+            return set()
+        pathlength = self.pathlength
+        self.blocked.discard(tile)
+        self._open[tile] = 1
+        neighbors = [n for n in self.grid.neighbors[tile] if self._open[n]]
+
+        # Every neighbor belongs to a pocket identified by the tile its pathlengths lead to
+        reaches_edge = self._ends[tile] == 1
+        roots = set()
+        for neighbor in neighbors:
+            root = self._root(neighbor)
+            if self._ends[root]:
+                reaches_edge = True
+            else:
+                roots.add(root)
+        if reaches_edge:
+            winner = None
+        else:
+            winner = max(roots | {tile}, key=self.idealness.__getitem__)
+
+        # Pockets that now head for a different target are recomputed entirely
+        changed = {tile}
+        for root in roots:
+            if root != winner:
+                for other in self._collect([root], tile):
+                    pathlength[other] = -1
+                    changed.add(other)
+
+        if self._ends[tile] or winner == tile:
+            pathlength[tile] = 0
+        else:
+            pathlength[tile] = min(pathlength[n] for n in neighbors if pathlength[n] != -1) + 1
+        changed.update(self._relax([(pathlength[tile], tile)]))
+        return changed
+
+    def _root(self, tile):
+        """Follows decreasing pathlengths to the target of this tile's pocket"""
+        pathlength = self.pathlength
+        neighbors = self.grid.neighbors
+        distance = pathlength[tile]
+        while distance > 0:
+            for neighbor in neighbors[tile]:
+                if pathlength[neighbor] == distance - 1 and self._open[neighbor]:
+                    tile = neighbor
+                    distance -= 1
+                    break
+        return tile
+
+    def _collect(self, starts, excluded=-1):
+        """Every unblocked tile connected to starts, not passing through excluded"""
+        neighbors = self.grid.neighbors
+        is_open = self._open
+        seen = set(starts)
+        frontier = list(starts)
+        while frontier:
+            tile = frontier.pop()
+            for neighbor in neighbors[tile]:
+                if is_open[neighbor] and neighbor != excluded and neighbor not in seen:
+                    seen.add(neighbor)
+                    frontier.append(neighbor)
+        return seen
+
+    def _flood(self, seeds):
+        """Breadth first search from tiles whose pathlength is already set"""
+        pathlength = self.pathlength
+        neighbors = self.grid.neighbors
+        is_open = self._open
+        current = deque(seeds)
+        popleft = current.popleft
+        append = current.append
+        while current:
+            tile = popleft()
+            distance = pathlength[tile] + 1
+            for neighbor in neighbors[tile]:
+                if pathlength[neighbor] == -1 and is_open[neighbor]:
+                    pathlength[neighbor] = distance
+                    append(neighbor)
+
+    def _relax(self, frontier):
+        """Propagates pathlengths outwards from tiles at mixed distances, lowering any that improve
+
+        Returns:
+            The set of tiles whose pathlength was set
+
+        """
+        pathlength = self.pathlength
+        neighbors = self.grid.neighbors
+        is_open = self._open
+        changed = set()
+        heapq.heapify(frontier)
+        while frontier:
+            distance, tile = heapq.heappop(frontier)
+            if pathlength[tile] != distance:
+                continue
+            distance += 1
+            for neighbor in neighbors[tile]:
+                if is_open[neighbor] and (pathlength[neighbor] == -1 or pathlength[neighbor] > distance):
+                    pathlength[neighbor] = distance
+                    changed.add(neighbor)
+                    heapq.heappush(frontier, (distance, neighbor))
+        return changed
+
+    def _settle_orphans(self, tiles):
+        """Gives each pocket among tiles with no pathlength its own self destruct target"""
+        pathlength = self.pathlength
+        for tile in tiles:
+            if pathlength[tile] != -1:
+                continue
+            ideal = max(self._collect([tile]), key=self.idealness.__getitem__)
+            pathlength[ideal] = 0
+            self._flood([ideal])
+
+class PathCache:
+    """A bounded, least recently used cache of paths, shared by every ShortestPathFinder in the process by default
+
+    Paths are keyed by the GameMap.structure_hash of the board they were found on, the start location
+    and the endpoints. Results therefore carry over between turns, GameState objects and lookahead
+    branches that share a structure layout. The cache can be used from several threads.
 
     Attributes :
-        * visited_idealness (bool): Have we visited this node during the idealness search step?
-        * visited_validate (bool): Have we visited this node during the validation step?
-        * blocked (bool): Is there a structures at this node's location
-        * pathlength: The distance between this node and the target location
+        * maxsize (int): The number of paths kept before the least recently used ones are evicted
+        * hits (int): The number of lookups answered from the cache
+        * misses (int): The number of lookups that were not in the cache
+        * evictions (int): The number of paths dropped to stay within maxsize
 
     """
-    def __init__(self):
-        self.visited_idealness = False
-        self.visited_validate = False
-        self.blocked = False
-        self.pathlength = -1
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._paths = OrderedDict()
+        # Speculative work on a background thread shares this cache with the main thread
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._paths)
+
+    def get(self, key):
+        """Gets a copy of a cached path, or None if it is not cached"""
+        with self._lock:
+            path = self._paths.get(key)
+            if path is None:
+                self.misses += 1
+                return None
+            self._paths.move_to_end(key)
+            self.hits += 1
+        return [list(location) for location in path]
+
+    def put(self, key, path):
+        """Caches a path, evicting the least recently used paths if the cache is full"""
+        path = tuple(tuple(location) for location in path)
+        with self._lock:
+            self._paths[key] = path
+            self._paths.move_to_end(key)
+            self._evict()
+
+    def resize(self, maxsize):
+        """Changes the maximum number of cached paths"""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        """Drops every cached path and resets the statistics"""
+        with self._lock:
+            self._paths.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """Gets the cache statistics
+
+        Returns:
+            A dict with the current size, maxsize, hits, misses, evictions and hit_rate
+
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._paths),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def _evict(self):
+        while len(self._paths) > self.maxsize:
+            self._paths.popitem(last=False)
+            self.evictions += 1
+
+PATH_CACHE = PathCache()
 
 """
 This class helps with pathfinding. We guarantee the results will
@@ -28,18 +504,37 @@ code to maximise time efficiency
 class ShortestPathFinder:
     """Handles pathfinding
 
+    One DistanceField is kept for each set of endpoints. A field is reused until the
+    structures on the map change, and is then patched around the changed tiles rather than rebuilt.
+
+    Finished paths are also stored in a PathCache, shared across the whole process unless another cache is given.
+
+    Fields are rebuilt with a plain breadth first search by default. Passing backend="numpy"
+    rebuilds them with wavefront_pathlengths instead. On a single 28x28 board the Python search
+    is usually faster, NumPy pays off when many boards are solved together.
+
     Attributes :
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
+        * backend (str): "python" or "numpy", how distance fields are rebuilt
+        * path_cache (:obj: PathCache): Where finished paths are cached, None to disable caching
 
         * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
+        * game_map (:obj: DistanceField): The field used by the most recent query
 
     """
-    def __init__(self):
+    def __init__(self, backend="python", path_cache=PATH_CACHE):
         self.HORIZONTAL = 1
         self.VERTICAL = 2
+        if backend == "numpy" and np is None:
+            debug_write("NumPy is not installed, falling back to the python pathfinding backend")
+            backend = "python"
+        self.backend = backend
+        self.path_cache = path_cache
         self.initialized = False
+        self.game_map = None
+        self._fields = {}
+        self._field_hashes = {}
 
     def initialize_map(self, game_state):
         """Initializes the map
@@ -47,10 +542,8 @@ class ShortestPathFinder:
         Args:
             game_state: A GameState object representing the gamestate we want to traverse
         """
-        #Initialize map 
         self.initialized = True
         self.game_state = game_state
-        self.game_map = [[Node() for x in range(self.game_state.ARENA_SIZE)] for y in range(self.game_state.ARENA_SIZE)]
 
     def navigate_multiple_endpoints(self, start_point, end_points, game_state):
         """Finds the path a unit would take to reach a set of endpoints
@@ -65,49 +558,95 @@ class ShortestPathFinder:
             Note that this path can change if a tower is destroyed during pathing, or if you or your enemy places structures.
 
         """
-        if game_state.contains_stationary_unit(start_point):
+        if game_state.contains_stationary_unit(start_point) or not game_state.game_map.in_arena_bounds(start_point):
             return
 
-        #Initialize map 
-        self.initialize_map(game_state)
-        #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
-        #Do pathfinding
-        ideal_endpoints = self._idealness_search(start_point, end_points)
-        self._validate(ideal_endpoints, end_points)
-        return self._get_path(start_point, end_points)
-
-    def _idealness_search(self, start, end_points):
-        """
-        Finds the most ideal tile in our 'pocket' of pathable space. 
-        The edge if it is available, or the best self destruct location otherwise
+        return self.navigate_multiple_starts([start_point], end_points, game_state)[0]
+
+    def navigate_multiple_starts(self, start_points, end_points, game_state):
+        """Finds the paths units at several start points would take to reach the same set of endpoints.
+        The pathfinding is shared, so this costs about as much as a single call to navigate_multiple_endpoints.
+
+        Args:
+            * start_points: A list of starting locations
+            * end_points: The end points of the units, should be a list of edge locations
+            * game_state: The current game state
+
+        Returns:
+            A list with the path for each start point, in the same order. Blocked start points get None.
+
         """
-        current = queue.Queue()
-        current.put(start)
-        best_idealness = self._get_idealness(start, end_points)
-        self.game_map[start[0]][start[1]].visited_idealness = True
-        most_ideal = start
+        self.initialize_map(game_state)
+        end_key = tuple(tuple(point) for point in end_points)
+        structure_hash = game_state.game_map.structure_hash
+        paths = [None] * len(start_points)
+        missing = []
+        for index, start_point in enumerate(start_points):
+            if self.path_cache is not None:
+                paths[index] = self.path_cache.get((structure_hash, tuple(start_point), end_key))
+            if paths[index] is None:
+                missing.append(index)
+        if not missing:
+            return paths
+
+        self.game_map = self.get_distance_field(end_points, game_state)
+        for index in missing:
+            start_point = start_points[index]
+            if self.game_map.is_pathable(start_point):
+                paths[index] = self._get_path(start_point, end_points)
+                if self.path_cache is not None:
+                    self.path_cache.put((structure_hash, tuple(start_point), end_key), paths[index])
+        return paths
+
+    def get_distance_field(self, end_points, game_state):
+        """Gets the up to date DistanceField for a set of endpoints
 
-        while not current.empty():
-            search_location = current.get()
-            for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
-                    continue
+        Args:
+            * end_points: The end points of the unit, should be a list of edge locations
+            * game_state: The current game state
 
-                x, y = neighbor
-                current_idealness = self._get_idealness(neighbor, end_points)
+        Returns:
+            A DistanceField matching the structures currently on the map
 
-                if current_idealness > best_idealness:
-                    best_idealness = current_idealness
-                    most_ideal = neighbor
+        """
+        key = tuple(tuple(point) for point in end_points)
+        field = self._fields.get(key)
+        if field is None:
+            field = DistanceField(end_points, get_path_grid(game_state.game_map), self.backend)
+            self._fields[key] = field
+        structure_hash = game_state.game_map.structure_hash
+        if self._field_hashes.get(key) != structure_hash:
+            field.update(self._get_blocked(game_state, field.grid))
+            self._field_hashes[key] = structure_hash
+        return field
+
+    def path_from_field(self, start_point, field, game_state):
+        """Finds the path a unit would take through a given DistanceField, such as a modified copy of a cached one
+
+        Args:
+            * start_point: The starting location of the unit
+            * field: A DistanceField
+            * game_state: The current game state
 
-                if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
-                    self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
+        Returns:
+            The path a unit at start_point would take, or None if start_point is blocked
 
-        return most_ideal
+        """
+        if not field.is_pathable(start_point):
+            return
+        self.initialize_map(game_state)
+        self.game_map = field
+        return self._get_path(start_point, field.end_points)
+
+    def _get_blocked(self, game_state, grid):
+        """The set of IDs of tiles containing a structure, read from the structure bitboards"""
+        mask = game_state.game_map.get_structure_mask()
+        blocked = set()
+        while mask:
+            low_bit = mask & -mask
+            blocked.add(low_bit.bit_length() - 1)
+            mask ^= low_bit
+        return blocked
 
     def _get_neighbors(self, location):
         """Get the locations adjacent to a location
@@ -119,7 +658,7 @@ class ShortestPathFinder:
         """Prints a message to the games debug output
 
         Args:
-            * end_points: A set of endpoints, should be an edge 
+            * end_points: A set of endpoints, should be an edge
 
         Returns:
             A direction [x,y] representing the edge. For example, [1,1] for the top right and [-1, 1] for the top left
@@ -134,68 +673,8 @@ class ShortestPathFinder:
             direction[1] = -1
         return direction
 
-    def _get_idealness(self, location, end_points):
-        """Get the idealness of a tile, the reachable tile the unit most wants to path to.
-        Better self destruct locations are more ideal. The endpoints are perfectly ideal. 
-
-        Returns:
-            A location the unit will attempt to reach
-        """
-        if location in end_points:
-            return sys.maxsize
-
-        direction = self._get_direction_from_endpoints(end_points)
-
-        idealness = 0
-        if direction[1] == 1:
-            idealness += 28 * location[1]
-        else: 
-            idealness += 28 * (27 - location[1])
-        if direction[0] == 1:
-            idealness += location[0]
-        else: 
-            idealness += (27 - location[0])
-
-        return idealness
-
-    def _validate(self, ideal_tile, end_points):
-        """Breadth first search of the grid, setting the pathlengths of each node
-
-        """
-        #VALDIATION
-        #Add our most ideal tiles to current
-        current = queue.Queue()
-        if ideal_tile in end_points:
-            for location in end_points:
-               current.put(location)
-               #Set current pathlength to 0
-               self.game_map[location[0]][location[1]].pathlength = 0
-               self.game_map[location[0]][location[1]].visited_validate = True
-        else:
-            current.put(ideal_tile)
-            self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
-            self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
-
-        #While current is not empty
-        while not current.empty():
-            current_location = current.get()
-            current_node = self.game_map[current_location[0]][current_location[1]]
-            for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
-                    continue
-
-                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
-                if not neighbor_node.visited_validate and not current_node.blocked:
-                    neighbor_node.pathlength = current_node.pathlength + 1
-                    neighbor_node.visited_validate = True
-                    current.put(neighbor)
-
-        #debug_write("Print after validate")
-        #self.print_map()
-        return
-
     def _get_path(self, start_point, end_points):
-        """Once all nodes are validated, and a target is found, the unit can path to its target
+        """Walks down the distance field in game_map from start_point until it reaches a tile with pathlength 0
 
         """
         #GET THE PATH
@@ -203,10 +682,8 @@ class ShortestPathFinder:
         current = start_point
         move_direction = 0
 
-        while not self.game_map[current[0]][current[1]].pathlength == 0:
-            #debug_write("current tile {} has cost {}".format(current, self.game_map[current[0]][current[1]].pathlength))
+        while not self.game_map.get_pathlength(current) == 0:
             next_move = self._choose_next_move(current, move_direction, end_points)
-            #debug_write(next_move)
 
             if current[0] == next_move[0]:
                 move_direction = self.VERTICAL
@@ -214,32 +691,31 @@ class ShortestPathFinder:
                 move_direction = self.HORIZONTAL
             path.append(next_move)
             current = next_move
-        
-        #debug_write(path)
+
         return path
-  
+
     def _choose_next_move(self, current_point, previous_move_direction, end_points):
         """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
         """
         neighbors = self._get_neighbors(current_point)
-        #debug_write("Unit at {} previously moved {} and has these neighbors {}".format(current_point, previous_move_direction, neighbors))
+        size = self.game_map.grid.arena_size
+        pathlength = self.game_map.pathlength
+        is_open = self.game_map._open
 
         ideal_neighbor = current_point
-        best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
+        best_pathlength = pathlength[current_point[0] * size + current_point[1]]
         for neighbor in neighbors:
-            #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+            x, y = neighbor
+            if x < 0 or y < 0 or x >= size or y >= size or not is_open[x * size + y]:
                 continue
 
             new_best = False
-            x, y = neighbor
-            current_pathlength = self.game_map[x][y].pathlength
+            current_pathlength = pathlength[x * size + y]
 
             #Filter by pathlength
             if current_pathlength > best_pathlength:
                 continue
             elif current_pathlength < best_pathlength:
-                #debug_write("Contender has better pathlength at {} vs champs {}".format(current_pathlength, best_pathlength))
                 new_best = True
 
             #Filter by direction based on prev move
@@ -249,7 +725,6 @@ class ShortestPathFinder:
             ideal_neighbor = neighbor
             best_pathlength = current_pathlength
 
-        #debug_write("Gave unit at {} new tile {}".format(current_point, ideal_neighbor))
         return ideal_neighbor
 
     def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, end_points):
@@ -261,26 +736,26 @@ class ShortestPathFinder:
         if previous_move_direction == self.HORIZONTAL and not new_tile[0] == prev_best[0]:
             #We want to go up now. If we have not changed our y, we are not going up
             if prev_tile[1] == new_tile[1]:
-                return False 
+                return False
             return True
         if previous_move_direction == self.VERTICAL and not new_tile[1] == prev_best[1]:
             if prev_tile[0] == new_tile[0]:
                 #debug_write("contender {} has the same x coord as prev tile {} so we will keep best move {}".format(new_tile, prev_tile, prev_best))
                 return False
             return True
-        if previous_move_direction == 0: 
-            if prev_tile[1] == new_tile[1]: 
+        if previous_move_direction == 0:
+            if prev_tile[1] == new_tile[1]:
                 return False
             return True
-        
-        #To make it here, both moves are on the same axis 
+
+        #To make it here, both moves are on the same axis
         direction = self._get_direction_from_endpoints(end_points)
         if new_tile[1] == prev_best[1]: #If they both moved horizontal...
             if direction[0] == 1 and new_tile[0] > prev_best[0]: #If we moved right and right is our direction, we moved towards our direction
-                return True 
+                return True
             if direction[0] == -1 and new_tile[0] < prev_best[0]: #If we moved left and left is our direction, we moved towards our direction
-                return True 
-            return False 
+                return True
+            return False
         if new_tile[0] == prev_best[0]: #If they both moved vertical...
             if direction[1] == 1 and new_tile[1] > prev_best[1]: #If we moved up and up is our direction, we moved towards our direction
                 return True
@@ -293,15 +768,15 @@ class ShortestPathFinder:
         """Prints an ASCII version of the current game map for debug purposes
 
         """
-        if not self.initialized:
-            debug_write("Attempted to print_map before pathfinder initialization. Use 'this_object.initialize_map(game_state)' to initialize the map first")
+        if not self.initialized or self.game_map is None:
+            debug_write("Attempted to print_map before pathfinder initialization. Use 'this_object.navigate_multiple_endpoints(start_point, end_points, game_state)' to build a map first")
             return
 
         for y in range(28):
             for x in range(28):
-                node = self.game_map[x][28 - y - 1]
-                if not node.blocked and not node.pathlength == -1:
-                    self._print_justified(node.pathlength)
+                pathlength = self.game_map.get_pathlength([x, 28 - y - 1])
+                if not pathlength == -1:
+                    self._print_justified(pathlength)
                 else:
                     sys.stderr.write("   ")
             debug_write("")
@@ -314,3 +789,173 @@ class ShortestPathFinder:
             sys.stderr.write(" ")
         sys.stderr.write(str(number))
         sys.stderr.write(" ")
+
+
+class PathingSession:
+    """Follows mobile units through the action phase while structures are built or destroyed
+
+    The session starts from the structures of a GameState and keeps its own copies of the distance
+    fields, so events never touch the state or its cached paths. Adding or removing a structure only
+    repairs the tiles whose route changed, and only units next to those tiles have their next move
+    recomputed.
+
+    Units are identified by any hashable id, such as the unit id strings found in action frames.
+
+    Attributes :
+        * game_state (:obj: GameState): The board the session started from
+        * units (dict): Maps each unit id to its current [x, y] location
+
+    """
+    def __init__(self, game_state):
+        """Starts a session from the structures of a GameState
+
+        Args:
+            * game_state: The GameState the action phase starts from
+
+        """
+        self.game_state = game_state
+        self.units = {}
+        self._finder = ShortestPathFinder(path_cache=None)
+        self._finder.initialize_map(game_state)
+        self._grid = get_path_grid(game_state.game_map)
+        self._fields = {}
+        self._added = set()
+        self._removed = set()
+        self._directions = {}
+        self._end_keys = {}
+        self._next_moves = {}
+
+    def add_unit(self, unit_id, location, target_edge=None):
+        """Starts following a unit
+
+        Args:
+            * unit_id: A hashable id for the unit
+            * location: The unit's current location
+            * target_edge: The edge the unit wants to reach, induced from location if None
+
+        Returns:
+            The unit's next move, or None if it is already at its target
+
+        """
+        if target_edge is None:
+            target_edge = self.game_state.get_target_edge(location)
+        end_points = self.game_state.game_map.get_edge_locations(target_edge)
+        end_key = tuple(tuple(point) for point in end_points)
+        if end_key not in self._fields:
+            field = self.game_state._shortest_path_finder.get_distance_field(end_points, self.game_state).copy()
+            for added in self._added:
+                field.add_structure(added)
+            for removed in self._removed:
+                field.remove_structure(removed)
+            self._fields[end_key] = field
+        self.units[unit_id] = list(location)
+        self._end_keys[unit_id] = end_key
+        self._directions[unit_id] = 0
+        self._next_moves[unit_id] = self._find_next_move(unit_id)
+        return self._next_moves[unit_id]
+
+    def remove_unit(self, unit_id):
+        """Stops following a unit, for example once it breaches or is destroyed"""
+        self.units.pop(unit_id, None)
+        self._end_keys.pop(unit_id, None)
+        self._directions.pop(unit_id, None)
+        self._next_moves.pop(unit_id, None)
+
+    def next_move(self, unit_id):
+        """The location a unit will move to next, or None if it has reached its target"""
+        return self._next_moves[unit_id]
+
+    def advance(self, unit_id):
+        """Moves a unit to its next move
+
+        Returns:
+            The unit's new location
+
+        """
+        next_move = self._next_moves[unit_id]
+        if next_move is not None:
+            self.move_unit(unit_id, next_move)
+        return self.units[unit_id]
+
+    def move_unit(self, unit_id, location):
+        """Records that a unit moved, for example from the move events of an action frame
+
+        Args:
+            * unit_id: The id of the unit
+            * location: The unit's new location, adjacent to its old one
+
+        Returns:
+            The unit's next move from its new location
+
+        """
+        current = self.units[unit_id]
+        if current[0] == location[0] and current[1] != location[1]:
+            self._directions[unit_id] = self._finder.VERTICAL
+        elif current[0] != location[0]:
+            self._directions[unit_id] = self._finder.HORIZONTAL
+        self.units[unit_id] = list(location)
+        self._next_moves[unit_id] = self._find_next_move(unit_id)
+        return self._next_moves[unit_id]
+
+    def get_path(self, unit_id):
+        """The remaining path of a unit from its current location if nothing else changes"""
+        field = self._fields[self._end_keys[unit_id]]
+        self._finder.game_map = field
+        path = [self.units[unit_id]]
+        direction = self._directions[unit_id]
+        while field.get_pathlength(path[-1]) > 0:
+            current = path[-1]
+            next_move = self._finder._choose_next_move(current, direction, field.end_points)
+            direction = self._finder.VERTICAL if current[0] == next_move[0] else self._finder.HORIZONTAL
+            path.append(next_move)
+        return path
+
+    def add_structure(self, location):
+        """Records a structure being built
+
+        Returns:
+            A dict from unit id to new next move, for every unit whose next move changed
+
+        """
+        location = tuple(location)
+        self._removed.discard(location)
+        self._added.add(location)
+        return self._apply(lambda field: field.add_structure(location))
+
+    def remove_structure(self, location):
+        """Records a structure being destroyed or removed
+
+        Returns:
+            A dict from unit id to new next move, for every unit whose next move changed
+
+        """
+        location = tuple(location)
+        self._added.discard(location)
+        self._removed.add(location)
+        return self._apply(lambda field: field.remove_structure(location))
+
+    def _apply(self, change):
+        changed = {}
+        for end_key, field in self._fields.items():
+            changed[end_key] = change(field)
+        updated = {}
+        for unit_id, location in self.units.items():
+            tiles = changed[self._end_keys[unit_id]]
+            if not tiles:
+                continue
+            tile = self._grid.tile_id(location)
+            if tile not in tiles and tiles.isdisjoint(self._grid.neighbors[tile]):
+                continue
+            next_move = self._find_next_move(unit_id)
+            if next_move != self._next_moves[unit_id]:
+                self._next_moves[unit_id] = next_move
+                updated[unit_id] = next_move
+        return updated
+
+    def _find_next_move(self, unit_id):
+        field = self._fields[self._end_keys[unit_id]]
+        location = self.units[unit_id]
+        if field.get_pathlength(location) <= 0:
+            return None
+        self._finder.game_map = field
+        return self._finder._choose_next_move(location, self._directions[unit_id], field.end_points)
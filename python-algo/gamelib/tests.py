@@ -1,7 +1,37 @@
 import unittest
 import json
+import random
+import glob
+import os
+import io
+import sys
+import threading
+from .algocore import AlgoCore
+from .build_planner import BuildPlanner
 from .game_state import GameState
+from .live_board import LiveBoard
 from .unit import GameUnit
+from .navigation import DistanceField, PathCache, PathingSession, ShortestPathFinder, get_path_grid, np
+from .placement import PlacementEvaluator
+from .simulator import BatchSimulator, Simulator
+from .speculation import Speculation, board_key
+from .threat_map import ThreatMap
+from .replay import check_replay, get_action_phases, load_replay
+from .turn_budget import AnytimeSearch, TurnBudget
+from .util import decode_events, peek_turn_info
+from .worker_pool import WorkerPool, decode_board, encode_board
+
+REPLAYS = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "..", "replays", "*.replay")))
+
+def path_length(game_state, location):
+    # Used by test_worker_pool, which needs a function the workers can import
+    return len(game_state.find_path_to_edge(location))
+
+def exit_on_none(game_state, item):
+    # Used by test_worker_pool to kill the worker running it
+    if item is None:
+        os._exit(1)
+    return item
 
 class BasicTests(unittest.TestCase):
 
@@ -275,3 +305,617 @@ class BasicTests(unittest.TestCase):
         actual = game.project_future_MP(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} MP {} turns from now, got {}".format(expected, turns, actual))
 
+    def test_path_to_edge(self):
+        game = self.make_turn_0_map()
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual([13, 0], path[0], "Paths should begin at the start location")
+        self.assertIn(path[-1], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), "An open board should let us reach the far edge")
+        self.assertEqual(29, len(path), "Wrong path length across an empty board")
+
+    def test_path_cache_updates(self):
+        game = self.make_turn_0_map()
+        path = game.find_path_to_edge([13, 0])
+        field = game._shortest_path_finder.game_map
+        self.assertEqual(path, game.find_path_to_edge([13, 0]), "Repeating a query should give the same path")
+        self.assertIs(field, game._shortest_path_finder.game_map, "Repeat queries should reuse the cached field")
+
+        for x in range(0, 27):
+            game.game_map.add_unit("FF", [x, 13])
+            cached = game.find_path_to_edge([13, 0])
+            fresh = GameState(game.config, game.serialized_string)
+            for location in game.game_map:
+                if game.contains_stationary_unit(location):
+                    fresh.game_map.add_unit("FF", location)
+            self.assertEqual(fresh.find_path_to_edge([13, 0]), cached, "Patched fields should match a fresh pathfind")
+        self.assertNotIn(cached[-1], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), "A wall at y=13 should force a self destruct")
+        game.game_map.remove_unit([20, 13])
+        self.assertIn(game.find_path_to_edge([13, 0])[-1], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), "Removing a wall should reopen the edge")
+
+    def test_paths_to_edges(self):
+        game = self.make_turn_0_map()
+        for location in [[4, 12], [10, 10], [13, 8], [14, 8], [20, 11], [22, 14], [6, 17]]:
+            game.game_map.add_unit("FF", location)
+        starts = game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT) + game.game_map.get_edge_locations(game.game_map.BOTTOM_RIGHT) + [[10, 10]]
+        paths = game.find_paths_to_edges(starts)
+        self.assertEqual(len(starts), len(paths), "Should get one result per start location")
+        self.assertIsNone(paths[-1], "Blocked starts should not have a path")
+        for start, path in zip(starts[:-1], paths[:-1]):
+            self.assertEqual(game.find_path_to_edge(start), path, "Batched path from {} differs from a single pathfind".format(start))
+        self.assertEqual(game.find_path_to_edge([13, 0], game.game_map.TOP_LEFT), game.find_paths_to_edges([[13, 0]], game.game_map.TOP_LEFT)[0], "Target edge should be respected")
+
+    def test_path_grid(self):
+        game = self.make_turn_0_map()
+        grid = get_path_grid(game.game_map)
+        self.assertEqual(420, len(grid.tiles), "The diamond board should have 420 tiles")
+        self.assertEqual([13, 0], grid.location(grid.tile_id([13, 0])), "Tile IDs should round trip")
+        self.assertEqual([13 * 28 + 1, 14 * 28], list(grid.neighbors[grid.tile_id([13, 0])]), "Neighbors should skip tiles off the board")
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_numpy_fields(self):
+        game = self.make_turn_0_map()
+        grid = get_path_grid(game.game_map)
+        rng = random.Random(7)
+        for edge in game.game_map.get_edges():
+            for _ in range(10):
+                blocked = set(rng.sample(grid.tiles, rng.randint(0, 250)))
+                python_field = DistanceField(edge, grid)
+                numpy_field = DistanceField(edge, grid, "numpy")
+                python_field.rebuild(blocked)
+                numpy_field.rebuild(blocked)
+                self.assertEqual(python_field.pathlength, numpy_field.pathlength, "NumPy and python fields should match")
+
+        numpy_game = self.make_turn_0_map()
+        numpy_game._shortest_path_finder.backend = "numpy"
+        for location in [[4, 12], [10, 10], [13, 8], [14, 8], [20, 11]]:
+            game.game_map.add_unit("FF", location)
+            numpy_game.game_map.add_unit("FF", location)
+        starts = game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT)
+        self.assertEqual(game.find_paths_to_edges(starts), numpy_game.find_paths_to_edges(starts), "Backends should give the same paths")
+
+    def test_structure_hash(self):
+        game = self.make_turn_0_map()
+        self.assertEqual(0, game.game_map.structure_hash, "An empty board should hash to 0")
+        game.game_map.add_unit("FF", [13, 5])
+        game.game_map.add_unit("DF", [20, 18], 1)
+        game.game_map.add_unit("SI", [13, 0])
+        first_hash = game.game_map.structure_hash
+        self.assertEqual(game.game_map.compute_structure_hash(), first_hash, "Incremental hash should match a recomputed one")
+        game.game_map.add_unit("DF", [13, 5])
+        self.assertEqual(first_hash, game.game_map.structure_hash, "Replacing a structure should not change the layout")
+        game.game_map.remove_unit([13, 5])
+        game.game_map[13, 5] = [GameUnit("EF", game.config, 0, None, 13, 5)]
+        self.assertEqual(first_hash, game.game_map.structure_hash, "Assigning units should keep the hash up to date")
+        game.game_map.remove_unit([20, 18])
+        game.game_map.remove_unit([13, 5])
+        self.assertEqual(0, game.game_map.structure_hash, "Removing every structure should restore the empty hash")
+
+    def test_path_cache(self):
+        cache = PathCache(maxsize=3)
+        game = self.make_turn_0_map()
+        game._shortest_path_finder = ShortestPathFinder(path_cache=cache)
+        game.game_map.add_unit("FF", [13, 5])
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual(1, cache.misses, "The first query should miss")
+
+        other = self.make_turn_0_map()
+        other._shortest_path_finder = ShortestPathFinder(path_cache=cache)
+        other.game_map.add_unit("FF", [13, 5])
+        self.assertEqual(path, other.find_path_to_edge([13, 0]), "Cached paths should be shared between game states")
+        self.assertEqual(1, cache.hits, "The same layout in a new state should hit")
+
+        other.game_map.add_unit("FF", [13, 6])
+        other.find_path_to_edge([13, 0])
+        self.assertEqual(2, cache.misses, "Changing the layout should miss")
+        other.find_paths_to_edges([[14, 0], [12, 1], [15, 1]])
+        self.assertEqual(3, len(cache), "The cache should stay within maxsize")
+        self.assertEqual(2, cache.stats()["evictions"], "Two paths should have been evicted")
+
+    def test_placement_evaluator(self):
+        game = self.make_turn_0_map()
+        for location in [[3, 12], [13, 11], [14, 11], [24, 12]]:
+            game.game_map.add_unit("DF", location, 0)
+        layout = game.game_map.structure_hash
+        evaluator = PlacementEvaluator(game)
+        self.assertEqual(28, len(evaluator.start_locations), "Every enemy edge tile should be a start")
+        self.assertEqual(game.find_paths_to_edges(evaluator.start_locations), evaluator.baseline.paths, "Baseline paths should match the board")
+
+        candidates = [["FF", [12, 11]], ["DF", [15, 11]], ["FF", [13, 11]], ["SI", [13, 0]], ["FF", [2, 11]]]
+        results = evaluator.evaluate(candidates)
+        self.assertIsNone(results[2], "Occupied locations cannot be evaluated")
+        self.assertIsNone(results[3], "Only structures can be evaluated")
+        for (unit_type, location), result in zip(candidates, results):
+            if result is None:
+                continue
+            placed = self.make_turn_0_map()
+            for existing in [[3, 12], [13, 11], [14, 11], [24, 12]]:
+                placed.game_map.add_unit("DF", existing, 0)
+            placed.game_map.add_unit(unit_type, location, 0)
+            paths = placed.find_paths_to_edges(evaluator.start_locations)
+            self.assertEqual(paths, result.paths, "Placing {} at {} gave the wrong paths".format(unit_type, location))
+            threats = [sum(sum(unit.damage_i for unit in placed.get_attackers(tile, 1)) for tile in path) for path in paths]
+            self.assertEqual(threats, result.threats, "Placing {} at {} gave the wrong threat".format(unit_type, location))
+        self.assertEqual(layout, game.game_map.structure_hash, "Evaluating should not touch the board")
+
+    def test_pathing_session(self):
+        game = self.make_turn_0_map()
+        for x in range(28):
+            game.game_map.add_unit("FF", [x, 13], 0)
+        layout = game.game_map.structure_hash
+        session = PathingSession(game)
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual(path[1], session.add_unit("a", [13, 0]), "A new unit should follow the state's path")
+        self.assertEqual(path, session.get_path("a"))
+        for _ in range(5):
+            session.advance("a")
+        self.assertEqual(path[5], session.units["a"], "Advancing should walk along the path")
+
+        updated = session.remove_structure([13, 13])
+        self.assertIn("a", updated, "Opening a gap should change the unit's route")
+        self.assertEqual([14, 3], session.next_move("a"), "The unit should turn back towards the gap")
+        self.assertEqual({}, session.add_structure([2, 25]), "A far away structure should not change any route")
+        self.assertEqual(layout, game.game_map.structure_hash, "Sessions should not touch the board")
+
+        opened = self.make_turn_0_map()
+        for x in range(28):
+            if x != 13:
+                opened.game_map.add_unit("FF", [x, 13], 0)
+        opened.game_map.add_unit("FF", [2, 25], 0)
+        remaining = session.get_path("a")
+        self.assertEqual(len(opened.find_path_to_edge(path[5], opened.game_map.TOP_RIGHT)), len(remaining), "The remaining path should be a shortest path")
+        self.assertIn([13, 13], remaining, "The remaining path should use the gap")
+        session.remove_unit("a")
+        self.assertEqual({}, session.units)
+
+    def test_bitboards(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        game_map.add_unit("FF", [13, 5], 0)
+        game_map.add_unit("DF", [14, 5], 0)
+        game_map.add_unit("DF", [20, 18], 1)
+        game_map.add_unit("SI", [12, 5], 0)
+        self.assertTrue(game_map.has_structure([13, 5]))
+        self.assertFalse(game_map.has_structure([12, 5]), "Mobile units are not structures")
+        self.assertTrue(game_map.has_structure([20, 18], 1, "DF"))
+        self.assertFalse(game_map.has_structure([20, 18], 0))
+        self.assertEqual(2, game_map.count_structures(unit_type="DF"))
+        self.assertEqual(2, game_map.count_structures(player_index=0))
+        zone = game_map.get_zone_mask([[13, 5], [12, 5], [20, 18]])
+        self.assertEqual(2, game_map.count_structures(zone))
+        self.assertEqual([[13, 5], [14, 5], [20, 18]], game_map.get_mask_locations(game_map.get_structure_mask()))
+
+        copied = game_map.copy()
+        game_map.remove_unit([13, 5])
+        game_map[14, 5] = [GameUnit("EF", game.config, 1, None, 14, 5)]
+        self.assertFalse(game.contains_stationary_unit([13, 5]))
+        self.assertEqual(0, game_map.count_structures(player_index=0))
+        self.assertEqual(1, game_map.count_structures(player_index=1, unit_type="EF"))
+        self.assertEqual(0, game_map.count_structures(unit_type="FF"))
+        self.assertEqual([[14, 5], [20, 18]], game_map.get_mask_locations(game_map.get_structure_mask(1)))
+        self.assertEqual(3, copied.count_structures(), "Copies should keep their own bitboards")
+        self.assertTrue(copied.has_structure([13, 5]) and len(copied[13, 5]) == 1)
+        self.assertNotEqual(copied.get_bitboards(), game_map.get_bitboards())
+
+    def test_range_stencils(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        expected_13_13 = game_map.get_locations_in_range([13, 13], 3.5)
+        for radius in [0, 1.5, 2.5, 3.5, 4.5, 7]:
+            for location in [[13, 0], [0, 13], [13, 13], [20, 18], [27, 14]]:
+                x, y = location
+                expected = [[i, j] for i in range(x - 8, x + 9) for j in range(y - 8, y + 9)
+                            if game_map.in_arena_bounds([i, j]) and game_map.distance_between_locations(location, [i, j]) < radius + game_map.hit_radius]
+                self.assertEqual(expected, game_map.get_locations_in_range(location, radius), "Wrong tiles in range {} of {}".format(radius, location))
+        self.assertIs(game_map._locations_in_range([13, 13], 3.5), self.make_turn_0_map().game_map._locations_in_range([13, 13], 3.5), "Lookups should share one table")
+        locations = game_map.get_locations_in_range([13, 13], 3.5)
+        locations[0][1] += 1
+        locations.pop()
+        self.assertEqual(expected_13_13, game_map.get_locations_in_range([13, 13], 3.5), "Changing a result should not change the table")
+        self.assertEqual(37, len(game_map.get_locations_in_range([13.0, 13.0], 3.5)), "Float locations should still work")
+
+    def test_threat_map(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 11], 0)
+        game.game_map.add_unit("DF", [14, 16], 1)
+        game.game_map.add_unit("FF", [12, 11], 0)
+        game._player_resources[0]["SP"] = 30
+        threat_map = game.get_threat_map()
+
+        def check():
+            for location in game.game_map:
+                for player_index in [0, 1]:
+                    attackers = [unit for unit in game.get_attackers(location, player_index) if unit.stationary]
+                    self.assertEqual(sum(unit.damage_i for unit in attackers), threat_map.get_damage(location, player_index), "Wrong damage at {}".format(location))
+                    self.assertEqual(len(attackers), threat_map.get_attacker_count(location, player_index))
+
+        check()
+        self.assertGreater(threat_map.get_damage([14, 14], 0), 0, "The enemy turret should threaten the middle")
+        game.attempt_spawn("DF", [[15, 11], [3, 12]])
+        game.attempt_upgrade([13, 11])
+        self.assertIs(threat_map, game.get_threat_map(), "Spawns and upgrades should update the threat map in place")
+        check()
+        game.game_map.remove_unit([13, 11])
+        self.assertIs(threat_map, game.get_threat_map())
+        check()
+        path = game.find_path_to_edge([13, 27])
+        self.assertEqual(sum(threat_map.get_damage(location, 1) for location in path), threat_map.get_path_damage(path, 1))
+
+    def test_decoded_state(self):
+        game = self.make_turn_0_map()
+        turn = json.loads(game.serialized_string)
+        turn["p1Units"][0].append([13, 5, 60.0, "1"])
+        turn["p2Units"][2].append([14, 20, 75.0, "2"])
+        turn["p2Units"].append([[14, 20, 0.0, "3"]])
+        decoded = GameState(game.config, turn)
+        self.assertEqual(25.0, decoded.get_resource(decoded.SP))
+        self.assertIsNotNone(decoded._GameState__parsed_units, "Units should not be created before the map is used")
+        from_string = GameState(game.config, json.dumps(turn))
+        self.assertEqual(str(from_string.game_map[13, 5]), str(decoded.game_map[13, 5]))
+        self.assertTrue(decoded.game_map[14, 20][0].upgraded, "Upgrades should be applied when the map is built")
+        self.assertEqual(from_string.game_map.structure_hash, decoded.game_map.structure_hash)
+
+    def test_fork_and_trial(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 11], 0)
+        game.game_map.add_unit("DF", [14, 16], 1)
+        game._player_resources[0]["SP"] = 30
+        threat_map = game.get_threat_map()
+        layout = game.game_map.get_bitboards()
+        path = game.find_path_to_edge([13, 0])
+
+        forked = game.fork()
+        forked.attempt_spawn("FF", [[12, 11], [11, 11]])
+        forked.attempt_upgrade([13, 11])
+        forked.attempt_spawn("PI", [13, 0])
+        self.assertEqual(layout, game.game_map.get_bitboards(), "Forks should not change the original map")
+        self.assertFalse(game.game_map[13, 11][0].upgraded, "Forks should not upgrade the original's units")
+        self.assertEqual([], game.game_map[13, 0])
+        self.assertEqual(30, game.get_resource(game.SP))
+        self.assertEqual([], game._build_stack)
+        self.assertTrue(forked.game_map[13, 11][0].upgraded)
+        self.assertEqual(4, forked.game_map.count_structures())
+        self.assertEqual(15, forked.get_threat_map().get_damage([13, 12], 1), "Forks should have their own threat map")
+        self.assertEqual(5, threat_map.get_damage([13, 12], 1))
+        self.assertEqual(path, game.find_path_to_edge([13, 0]))
+
+        with game.trial():
+            game.attempt_spawn("FF", [[12, 11], [11, 11]])
+            with game.trial():
+                game.attempt_upgrade([13, 11])
+                self.assertEqual(15, threat_map.get_damage([13, 12], 1))
+            self.assertFalse(game.game_map[13, 11][0].upgraded, "Inner trials should roll back on their own")
+            self.assertEqual(5, threat_map.get_damage([13, 12], 1))
+            game.attempt_spawn("PI", [13, 0], 3)
+            self.assertEqual(3, len(game.game_map[13, 0]))
+        self.assertEqual(layout, game.game_map.get_bitboards(), "Trials should roll back spawns")
+        self.assertEqual(game.game_map.compute_structure_hash(), game.game_map.structure_hash)
+        self.assertEqual([], game.game_map[13, 0])
+        self.assertEqual(30, game.get_resource(game.SP))
+        self.assertEqual(([], []), (game._build_stack, game._deploy_stack))
+        self.assertIs(threat_map, game.get_threat_map())
+        self.assertEqual(5, threat_map.get_damage([13, 12], 1), "Trials should roll back the threat map")
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_unit_store(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 11], 0)
+        game.game_map.add_unit("DF", [14, 16], 1)
+        game.game_map.add_unit("DF", [15, 16], 1)
+        game.game_map.add_unit("FF", [12, 11], 0)
+        game.game_map.add_unit("PI", [13, 0], 0)
+        game.game_map[15, 16][0].upgrade()
+        game.game_map[12, 11][0].health = 10
+        store = game.get_unit_store()
+        self.assertEqual(5, len(store))
+        self.assertEqual(20, store.total_damage(1, "DF"), "An upgraded and a plain turret should sum their damage")
+        self.assertEqual([game.game_map[12, 11][0]], store.below_health_ratio(0.5))
+        self.assertEqual([game.game_map[14, 16][0]], store.units_in_zone([[14, 16], [13, 11]], 1))
+        self.assertEqual(1, int(store.select(stationary=False).sum()))
+
+    def test_unit_specs(self):
+        game = self.make_turn_0_map()
+        first = GameUnit("DF", game.config, 0, None, 13, 11)
+        second = GameUnit("DF", game.config, 1, None, 14, 16)
+        self.assertIs(first.spec, second.spec, "Units of one type should share their stats")
+        self.assertEqual([2.0, 0], first.cost)
+        first.upgrade()
+        self.assertTrue(first.upgraded and first.spec.upgraded)
+        self.assertEqual((15.0, 3.5, [6.0, 0]), (first.damage_i, first.attackRange, first.cost))
+        self.assertEqual((5.0, 2.5), (second.damage_i, second.attackRange), "Upgrading should not change other units")
+        self.assertEqual(first.max_health, first.health)
+
+        second.damage_i = 8.0
+        second.speed = 0.5
+        second.cost = [1.0, 0]
+        second.note = "left flank"
+        self.assertEqual((8.0, [1.0, 0], "left flank"), (second.damage_i, second.cost, second.note), "Stats and own attributes should be writable")
+        self.assertEqual(5.0, GameUnit("DF", game.config, 1).damage_i, "Setting a stat should only change that unit")
+        second.upgrade()
+        self.assertEqual((15.0, 0.5, [5.0, 0]), (second.damage_i, second.speed, second.cost), "Upgrading should keep stats the upgrade does not set")
+
+    def test_simulator(self):
+        game = self.make_turn_0_map()
+        path = game.find_path_to_edge([13, 0])
+        simulator = Simulator(game)
+        self.assertEqual(2, simulator.add_unit("PI", [13, 0], num=2))
+        simulator.step()
+        self.assertEqual([path[1], path[1]], [[unit.x, unit.y] for unit in simulator.get_mobile_units()], "Pings should move on the frame they spawn")
+        result = simulator.run()
+        self.assertEqual(len(path) - 1, result.frames)
+        self.assertEqual(([2, 0], [0, 2.0], [2.0, 0], [0, 0]), (result.breaches, result.player_damage, result.sp_gained, result.units_lost))
+        self.assertEqual([], game.game_map[13, 0], "Simulating should not change the game state")
+
+        for x in range(28):
+            game.game_map.add_unit("FF", [x, 14], 1)
+        end = game.find_path_to_edge([13, 0])[-1]
+        simulator = Simulator(game)
+        simulator.add_unit("PI", [13, 0])
+        result = simulator.run()
+        self.assertEqual(([0, 0], [1, 0]), (result.breaches, result.units_lost), "A ping with no way through should self destruct")
+        walls = [location for location in game.game_map.get_locations_in_range(end, 1.5) if location[1] == 14]
+        self.assertGreaterEqual(result.structure_damage[0], 15.0 * len(walls), "The self destruct should hit the walls next to it")
+        self.assertEqual(75.0, game.game_map[end[0], 14][0].health, "Damage should be dealt to copies of the units")
+
+        for location in game.game_map.get_locations_in_range(end, 2.5):
+            if location[1] == 15:
+                game.game_map.add_unit("DF", location, 1)
+        simulator = Simulator(game)
+        simulator.add_unit("PI", [13, 0])
+        result = simulator.run()
+        self.assertEqual([1, 0], result.units_lost)
+        self.assertGreaterEqual(result.damage_dealt[1], 15.0, "The turrets should destroy the ping")
+        self.assertLess(result.structure_damage[0], 15.0 * len(walls), "The ping should be destroyed before it self destructs")
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_batch_simulator(self):
+        game = self.make_turn_0_map()
+        for x in range(9, 19):
+            game.game_map.add_unit("FF", [x, 17], 1)
+        for location in [[11, 16], [13, 15], [16, 16], [20, 15]]:
+            game.game_map.add_unit("DF", location, 1)
+        game.game_map[13, 15][0].upgrade()
+        candidates = [[("PI", [13, 0], 3)], [("EI", [14, 0], 2), ("PI", [3, 10], 4)], [("SI", [20, 6], 1)], [("PI", [24, 10], 12)], []]
+        table = BatchSimulator(game, candidates).run().table()
+        self.assertEqual(len(candidates), len(table))
+        for candidate, row in zip(candidates, table):
+            simulator = Simulator(game)
+            for unit_type, location, num in candidate:
+                simulator.add_unit(unit_type, location, num=num)
+            result = simulator.run()
+            expected = (result.breaches[0], result.player_damage[1], result.structure_damage[0], result.structures_lost[1], result.units_lost[0], result.frames)
+            actual = (row["breaches"], row["player_damage"], row["damage_dealt"], row["structures_destroyed"], row["units_lost"], row["frames"])
+            self.assertEqual(expected, actual, "The batch should match the scalar simulator for {}".format(candidate))
+        self.assertEqual(0, table[-1]["frames"])
+
+    @unittest.skipUnless(REPLAYS, "No replays to check against")
+    def test_replays(self):
+        reports = [check_replay(path) for path in REPLAYS]
+        self.assertGreater(sum(report.frames for report in reports), 0)
+        for report in reports:
+            self.assertEqual([], report.divergences, "The simulator should reproduce {}".format(report.path))
+
+    def test_turn_budget(self):
+        now = [100.0]
+        budget = TurnBudget(5.0, 0.5, clock=lambda: now[0])
+        self.assertEqual(4.5, budget.remaining(), "The clock should not run before the turn starts")
+        budget.start()
+        now[0] += 1.0
+        self.assertEqual((1.0, 3.5), (budget.elapsed(), budget.remaining()))
+        self.assertTrue(budget.has_time_for(3.5) and not budget.has_time_for(3.6))
+
+        search = AnytimeSearch(budget)
+        for iteration in search.iterations():
+            now[0] += 1.0
+            search.offer("plan {}".format(iteration), -abs(iteration - 1))
+        self.assertEqual(3, search.iterations_run, "The search should stop before an iteration that would overrun")
+        self.assertEqual(("plan 1", 0), (search.best_plan, search.best_score))
+        self.assertFalse(budget.expired())
+        self.assertEqual(0, len(list(budget.iterations(max_iterations=0))))
+
+        game = self.make_turn_0_map()
+        self.assertEqual(5.0, TurnBudget.from_config(game.config).seconds)
+
+    def test_worker_pool(self):
+        game = self.make_turn_0_map()
+        game.attempt_spawn("FF", [[13, 13], [14, 13]])
+        game.attempt_upgrade([13, 13])
+        game.attempt_remove([14, 13])
+        copy = decode_board(game.config, encode_board(game))
+        self.assertEqual(encode_board(game), encode_board(copy), "A decoded board should encode the same way")
+        self.assertEqual(game.get_resource(game.SP), copy.get_resource(game.SP))
+
+        locations = [[x, 14] for x in range(2, 26)]
+        inline = WorkerPool(game.config, 0)
+        inline.set_board(game)
+        expected = inline.map(path_length, locations)
+        pool = WorkerPool(game.config, 2)
+        try:
+            pool.set_board(game)
+            self.assertEqual(expected, pool.map(path_length, locations), "Workers should match running inline")
+            with self.assertRaises(RuntimeError):
+                pool.map(path_length, [None])
+            self.assertEqual(2, pool.processes, "A failed task should not stop its worker")
+
+            with self.assertRaises(RuntimeError):
+                pool.map(exit_on_none, list(range(20)) + [None] + list(range(20)))
+            self.assertEqual(0, pool.processes, "The pool should stop its workers once one dies")
+            self.assertEqual(expected, pool.map(path_length, locations), "The pool should fall back to running inline")
+        finally:
+            pool.close()
+        self.assertEqual(0, pool.processes)
+
+    def test_speculation(self):
+        game = self.make_turn_0_map()
+        def make_state(phase, turn, walls):
+            return {"turnInfo": [phase, turn, 0 if phase else -1], "p1Stats": [30.0, 25.0, 5.0, 0], "p2Stats": [30.0, 25.0, 5.0, 0],
+                    "p1Units": [[[x, y, 75.0, str(x)] for x, y in walls], [], [], [], [], [], [], []], "p2Units": [[] for _ in range(8)],
+                    "events": {"selfDestruct": [], "breach": [], "damage": [], "shield": [], "move": [], "spawn": [], "death": [], "attack": [], "melee": []}}
+        walls = [[13, 12], [14, 12]]
+        self.assertEqual(board_key(game.config, make_state(1, 0, walls)), board_key(game.config, make_state(0, 1, walls[::-1])))
+        self.assertNotEqual(board_key(game.config, make_state(1, 0, walls)), board_key(game.config, make_state(0, 1, walls[:1])))
+
+        release = threading.Event()
+        def wait_for_release(game_state, speculation):
+            release.wait(5)
+            return len(game_state.game_map.get_all_units())
+        speculation = Speculation(wait_for_release, game, board_key(game.config, make_state(0, 0, [])))
+        self.assertIsNone(speculation.result(), "Unfinished work should have no result")
+        release.set()
+        self.assertEqual(0, speculation.result(timeout=5))
+        self.assertFalse(speculation.reconcile(game.config, make_state(0, 1, walls)), "A different board should cancel the work")
+        self.assertIsNone(speculation.result())
+
+        class SpeculatingAlgo(AlgoCore):
+            def on_speculate(self, game_state, speculation):
+                return [unit.x for unit in game_state.game_map.get_all_units()]
+            def on_turn(self, turn_state):
+                self.results.append(self.speculation.result(timeout=5) if self.speculation else None)
+                AlgoCore.on_turn(self, turn_state)
+        messages = [game.config, make_state(0, 0, []), make_state(1, 0, walls), make_state(0, 1, walls),
+                    make_state(1, 1, walls), make_state(1, 1, walls[:1]), make_state(0, 2, walls), {"turnInfo": [2, 2, 0]}]
+        algo = SpeculatingAlgo()
+        algo.results = []
+        stdin, stdout = sys.stdin, sys.stdout
+        sys.stdin, sys.stdout = io.StringIO("".join(json.dumps(message) + "\n" for message in messages)), io.StringIO()
+        try:
+            algo.start()
+        finally:
+            sys.stdin, sys.stdout = stdin, stdout
+        self.assertEqual([None, [13, 14], None], algo.results, "Only work done on the board the turn starts with should be used")
+        self.assertIsNone(algo.speculation)
+
+    def test_frame_events(self):
+        game = self.make_turn_0_map()
+        def make_frame(frame_number, breaches):
+            return {"p2Units": [[] for _ in range(8)], "turnInfo": [1, 0, frame_number, 20 + frame_number], "p1Units": [[] for _ in range(8)],
+                    "events": {"selfDestruct": [], "breach": breaches, "damage": [], "death": [[[3, 10], 3, "7", 1, False]]}}
+        breach = [[27, 13], 1.0, 3, "7", 1]
+        for separators in [(",", ":"), (", ", ": ")]:
+            message = json.dumps(make_frame(4, [breach]), separators=separators)
+            self.assertEqual([1, 0, 4, 24], peek_turn_info(message))
+            self.assertEqual({"breach": [breach]}, decode_events(message, ["breach", "damage", "spawn"]))
+        self.assertIsNone(peek_turn_info(json.dumps(game.config)))
+
+        algo = AlgoCore()
+        received = []
+        algo.subscribe_frame_events("breach", lambda events, turn_info: received.append((turn_info[2], events)))
+        messages = [game.config, make_frame(0, []), make_frame(1, [breach]), make_frame(2, []), {"turnInfo": [2, 1, 0]}]
+        stdin, stdout = sys.stdin, sys.stdout
+        sys.stdin, sys.stdout = io.StringIO("".join(json.dumps(message) + "\n" for message in messages)), io.StringIO()
+        try:
+            algo.start()
+        finally:
+            sys.stdin, sys.stdout = stdin, stdout
+        self.assertEqual([(1, [breach])], received, "Handlers should only see frames with their events")
+
+    def test_live_board(self):
+        game = self.make_turn_0_map()
+        def make_state(turn, walls):
+            return {"turnInfo": [0, turn, -1], "p1Stats": [30.0, 25.0, 5.0, 0], "p2Stats": [30.0, 25.0, 5.0, 0],
+                    "p1Units": [walls, [], [], [], [], [], [], []], "p2Units": [[] for _ in range(8)]}
+        board = LiveBoard(game.config)
+        game_state = board.reconcile(make_state(0, [[13, 12, 75.0, "1"], [14, 12, 75.0, "2"]]))
+        game_state.attempt_upgrade([13, 12])
+        board.apply_events("spawn", [[[13, 12], 7, "3", 1], [[15, 12], 0, "4", 1]])
+        board.apply_events("damage", [[[13, 12], 10.0, 0, "3", 1], [[15, 12], 5.0, 0, "4", 1], [[3, 3], 1.0, 3, "9", 2]])
+        board.apply_events("death", [[[14, 12], 0, "2", 1, False]])
+        self.assertFalse(board.game_map[14, 12], "The dead wall should be gone")
+        self.assertTrue(game_state.game_map[14, 12] and not game_state.game_map[15, 12], "The board handed to the turn should not change")
+
+        game_state = board.reconcile(make_state(1, [[13, 12, 140.0, "3"], [15, 12, 70.0, "4"]]))
+        self.assertEqual((1, []), (board.turns_kept, board.mismatches))
+        self.assertTrue(game_state.game_map[13, 12][0].upgraded)
+        self.assertEqual(game_state.game_map.compute_structure_hash(), game_state.game_map.structure_hash)
+        game_state = board.reconcile(make_state(2, [[13, 12, 140.0, "3"]]))
+        self.assertEqual([(2, ["unit 4 should be gone, found at [15, 12] with 70.0 health"])], board.mismatches)
+        self.assertEqual(["3"], [unit.unit_id for unit in board.game_map.get_all_units()], "The board should be rebuilt from the turn")
+
+    @unittest.skipUnless(REPLAYS, "No replays to check against")
+    def test_live_board_replays(self):
+        for path in REPLAYS:
+            config, frames = load_replay(path)
+            board = LiveBoard(config)
+            for start_frame, action_frames in get_action_phases(frames):
+                game_state = board.reconcile(start_frame)
+                self.assertEqual(game_state.get_threat_map().mobile_damage, ThreatMap(game_state.game_map).mobile_damage)
+                for frame in action_frames:
+                    for event_type in board.EVENT_TYPES:
+                        board.apply_events(event_type, frame["events"][event_type])
+            self.assertEqual([], board.mismatches, "Events should reproduce every turn of {}".format(path))
+
+    def test_tile_index(self):
+        game_map = self.make_turn_0_map().game_map
+        tiles = game_map.tiles
+        self.assertEqual(420, len(tiles))
+        self.assertEqual([[13, 0], [14, 0], [12, 1]], list(game_map)[:3], "Iteration should go row by row from the bottom")
+        self.assertEqual([list(location) for location in tiles.locations], list(game_map))
+        self.assertEqual([game_map.tile_bit(location) for location in tiles.locations], [1 << tile_id for tile_id in tiles.tile_ids])
+        self.assertEqual(420 * 420, sum(1 for _ in game_map for _ in game_map), "Nested loops over the map should each see every tile")
+
+        self.assertEqual(game_map.get_zone_mask([location for location in game_map if location[1] < game_map.HALF_ARENA]), tiles.half_masks[0])
+        self.assertEqual(tiles.half_masks[0] | tiles.half_masks[1], tiles.quadrant_masks[0] | tiles.quadrant_masks[1] | tiles.quadrant_masks[2] | tiles.quadrant_masks[3])
+        for quadrant, edge in enumerate(game_map.get_edges()):
+            self.assertEqual(0, game_map.get_zone_mask(edge) & ~tiles.quadrant_masks[quadrant], "Each edge should lie in its own quadrant")
+
+        for location, expected in [([13, 0], True), ([12, 0], False), ([-1, 13], False), ([0, 13], True), ([27, 14], True), ([28, 14], False), ([13.0, 0.0], True), ([13.5, 0], True)]:
+            self.assertEqual(expected, game_map.in_arena_bounds(location), "Wrong bounds for {}".format(location))
+
+    def test_bulk_spawn(self):
+        game = self.make_turn_0_map()
+        game._player_resources[0]["MP"] = 7.5
+        one_by_one = game.fork()
+        self.assertEqual(7, game.attempt_spawn("PI", [[13, 0], [14, 0]], 4), "Spawning should stop when MP runs out")
+        for location in [[13, 0]] * 4 + [[14, 0]] * 3:
+            one_by_one.attempt_spawn("PI", location)
+        self.assertEqual(one_by_one._deploy_stack, game._deploy_stack)
+        self.assertEqual(one_by_one.get_resources(), game.get_resources())
+        self.assertEqual((4, 3), (len(game.game_map[13, 0]), len(game.game_map[14, 0])))
+        self.assertEqual(7, len(set(map(id, game.game_map[13, 0] + game.game_map[14, 0]))), "Every unit should be its own object")
+
+        self.assertEqual(0, game.attempt_spawn("PI", [12, 1], 1), "Mobile units must be spawned on an edge")
+        self.assertEqual(1, game.attempt_spawn("FF", [12, 5], 3), "Only one structure fits on a tile")
+        self.assertTrue(game.game_map.is_on_edge([13.0, 0.0], [game.game_map.BOTTOM_LEFT]))
+        self.assertFalse(game.game_map.is_on_edge([13, 0], [game.game_map.BOTTOM_RIGHT, game.game_map.TOP_LEFT]))
+
+    def test_build_planner(self):
+        game = self.make_turn_0_map()
+        game.attempt_spawn("FF", [5, 13])
+        game._player_resources[0]["SP"] = 4.0
+
+        def add_builds(planner):
+            planner.add("EF", [13, 2], utility=5)
+            planner.add("DF", [[3, 12], [24, 12]], utility=3)
+            planner.add("DF", [5, 13], utility=10)
+            planner.add_upgrade([[5, 13], [9, 9]], utility=1)
+            planner.add("FF", [13, 20])
+
+        knapsack = BuildPlanner(game.config)
+        add_builds(knapsack)
+        priority = BuildPlanner(game.config, "priority")
+        add_builds(priority)
+        self.assertEqual(6, len(knapsack.builds), "Builds in enemy territory should be left out")
+
+        self.assertEqual([("DF", 3, 12), ("DF", 24, 12)], knapsack.plan(game), "Two turrets are worth more than the support")
+        self.assertEqual([("EF", 13, 2)], priority.plan(game), "Builds should be taken in order")
+        self.assertEqual([("DF", 3, 12), ("UP", 5, 13)], knapsack.plan(game, budget=3), "The wall is taken and can only be upgraded")
+        self.assertEqual(4.0, game.get_resource(game.SP), "Planning should not spend anything")
+
+        one_by_one = game.fork()
+        one_by_one.attempt_spawn("EF", [13, 2])
+        self.assertEqual([("EF", 13, 2)], priority.build(game))
+        self.assertEqual(one_by_one._build_stack, game._build_stack)
+        self.assertEqual(one_by_one.get_resources(), game.get_resources())
+        self.assertEqual(one_by_one.game_map.structure_hash, game.game_map.structure_hash)
+
+        game._player_resources[0]["SP"] = 9.0
+        game.attempt_upgrade([13, 2])
+        planned = knapsack.build(game)
+        self.assertEqual([("DF", 3, 12), ("DF", 24, 12), ("UP", 5, 13)], planned, "Nothing is built at [9, 9] to upgrade")
+        self.assertEqual(planned, game._build_stack[-3:], "The plan should be added to the build stack in one batch")
+        self.assertEqual(0.0, game.get_resource(game.SP))
+        self.assertTrue(game.game_map[5, 13][0].upgraded)
+        self.assertEqual([], knapsack.plan(game, budget=10), "Everything wanted is built")
+        game._player_resources[0]["SP"] = 2.0
+        self.assertEqual(2, game.add_builds([("UP", 9, 9), ("FF", 9, 9), ("UP", 9, 9)]), "Upgrades of empty tiles should be skipped")
+        self.assertEqual(0.0, game.get_resource(game.SP))
+        self.assertEqual([("FF", 9, 9), ("UP", 9, 9)], game._build_stack[-2:])
+
@@ -0,0 +1,125 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class UnitStore:
+    """A columnar snapshot of every unit on a GameMap, for answering bulk questions with NumPy
+
+    Row i of every column describes units[i]. The GameUnits stay the objects of record: the store is a
+    snapshot, so build a new one after changing the board. Requires NumPy.
+
+    Attributes :
+        * units (list): The GameUnit of each row
+        * arena_size (int): The size of the arena the units were read from
+        * x (array): The x coordinate of each unit
+        * y (array): The y coordinate of each unit
+        * type_index (array): The index of each unit's type in config["unitInformation"]
+        * player_index (array): The player controlling each unit, 0 for you 1 for the enemy
+        * health (array): The current health of each unit
+        * max_health (array): The starting health of each unit
+        * damage_i (array): The damage each unit deals to mobile units
+        * damage_f (array): The damage each unit deals to structures
+        * attack_range (array): The attack range of each unit
+        * stationary (array): True for structures
+        * upgraded (array): True for upgraded units
+        * pending_removal (array): True for structures their owner is removing
+
+    """
+    def __init__(self, game_map):
+        """Reads every unit on a map into columns
+
+        Args:
+            * game_map: The GameMap to read
+
+        """
+        if np is None:
+            raise ImportError("UnitStore requires NumPy")
+        from .game_state import UNIT_TYPE_TO_INDEX
+        self.arena_size = game_map.ARENA_SIZE
+        self.units = game_map.get_all_units()
+        units = self.units
+        count = len(units)
+        self.x = np.fromiter((unit.x for unit in units), dtype=np.int16, count=count)
+        self.y = np.fromiter((unit.y for unit in units), dtype=np.int16, count=count)
+        self.type_index = np.fromiter((UNIT_TYPE_TO_INDEX[unit.unit_type] for unit in units), dtype=np.int8, count=count)
+        self.player_index = np.fromiter((unit.player_index for unit in units), dtype=np.int8, count=count)
+        self.health = np.fromiter((unit.health for unit in units), dtype=np.float64, count=count)
+        self.max_health = np.fromiter((unit.max_health for unit in units), dtype=np.float64, count=count)
+        self.damage_i = np.fromiter((unit.damage_i for unit in units), dtype=np.float64, count=count)
+        self.damage_f = np.fromiter((unit.damage_f for unit in units), dtype=np.float64, count=count)
+        self.attack_range = np.fromiter((unit.attackRange for unit in units), dtype=np.float64, count=count)
+        self.stationary = np.fromiter((unit.stationary for unit in units), dtype=bool, count=count)
+        self.upgraded = np.fromiter((unit.upgraded for unit in units), dtype=bool, count=count)
+        self.pending_removal = np.fromiter((unit.pending_removal for unit in units), dtype=bool, count=count)
+
+    def __len__(self):
+        return len(self.units)
+
+    def select(self, player_index=None, unit_type=None, stationary=None):
+        """Builds a boolean row mask
+
+        Args:
+            * player_index: Only rows of this player, both players if None
+            * unit_type: Only rows of this unit type, every type if None
+            * stationary: Only structures if True, only mobile units if False, both if None
+
+        Returns:
+            A boolean array with one entry per row
+
+        """
+        mask = np.ones(len(self.units), dtype=bool)
+        if player_index is not None:
+            mask &= self.player_index == player_index
+        if unit_type is not None:
+            from .game_state import UNIT_TYPE_TO_INDEX
+            mask &= self.type_index == UNIT_TYPE_TO_INDEX[unit_type]
+        if stationary is not None:
+            mask &= self.stationary == stationary
+        return mask
+
+    def get_units(self, mask):
+        """The GameUnits of the rows set in a boolean row mask"""
+        return [self.units[row] for row in np.flatnonzero(mask)]
+
+    def zone_mask(self, locations):
+        """A boolean row mask of the units standing on any of the given locations"""
+        zone = np.zeros(self.arena_size * self.arena_size, dtype=bool)
+        for x, y in locations:
+            zone[int(x) * self.arena_size + int(y)] = True
+        return zone[self.x.astype(np.intp) * self.arena_size + self.y]
+
+    def total_damage(self, player_index=None, unit_type=None):
+        """The summed damage per frame to mobile units of every matching unit, for example every enemy turret"""
+        return float(self.damage_i[self.select(player_index, unit_type)].sum())
+
+    def below_health_ratio(self, ratio, player_index=None, unit_type=None):
+        """The structures whose health is below a fraction of their starting health
+
+        Args:
+            * ratio: The cutoff, for example 0.5 for structures under half health
+            * player_index: Only structures of this player, both players if None
+            * unit_type: Only structures of this type, every structure type if None
+
+        Returns:
+            A list of GameUnits
+
+        """
+        mask = self.select(player_index, unit_type, True)
+        mask &= self.health < ratio * self.max_health
+        return self.get_units(mask)
+
+    def units_in_zone(self, locations, player_index=None, unit_type=None):
+        """The units standing on any of the given locations
+
+        Args:
+            * locations: A list of locations
+            * player_index: Only units of this player, both players if None
+            * unit_type: Only units of this type, every type if None
+
+        Returns:
+            A list of GameUnits
+
+        """
+        return self.get_units(self.zone_mask(locations) & self.select(player_index, unit_type))
@@ -1,8 +1,11 @@
+import json
 import sys
 
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
 
+_DECODER = json.JSONDecoder()
+
 
 def get_command():
     """Gets input from stdin
@@ -39,3 +42,46 @@ def debug_write(*msg):
     #Printing to STDERR is okay and printed out by the game but doesn't effect turns.
     sys.stderr.write(", ".join(map(str, msg)).strip() + "\n")
     sys.stderr.flush()
+
+def peek_turn_info(message):
+    """Decodes the turnInfo of a message from the engine without decoding the rest of it
+
+    Args:
+        message: A message returned by get_command
+
+    Returns:
+        The turnInfo list, or None if the message has none
+
+    """
+    start = message.find('"turnInfo"')
+    if start < 0:
+        return None
+    return _DECODER.raw_decode(message, message.index("[", start))[0]
+
+def decode_events(message, event_types):
+    """Decodes some of the event lists of an action frame without decoding the rest of it.
+    An empty list is recognised from the text alone and skipped, so frames without the wanted events cost almost nothing.
+
+    Args:
+        message: An action frame returned by get_command
+        event_types: The names of the events to decode, such as "breach", "death", "damage" or "spawn"
+
+    Returns:
+        A dict from event name to its list of events, holding only the event types that occurred in the frame
+
+    """
+    events_start = message.find('"events"')
+    if events_start < 0:
+        return {}
+    found = {}
+    for event_type in event_types:
+        start = message.find('"{}"'.format(event_type), events_start)
+        if start < 0:
+            continue
+        start = message.index("[", start)
+        if message.startswith("[]", start):
+            continue
+        events = _DECODER.raw_decode(message, start)[0]
+        if events:
+            found[event_type] = events
+    return found